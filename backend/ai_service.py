@@ -1,149 +1,513 @@
 import os
 import json
-from typing import Dict, Any, Optional
-import google.generativeai as genai
-from PIL import Image
-import PyPDF2
+import time
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional, List, Tuple, get_args, get_origin, Union
+from pydantic import BaseModel, ValidationError
 from config import settings
+from model_registry import get_provider
+from pdf_utils import read_pdf_pages_in_pool, extract_pdf_page, count_pdf_pages
+from image_preprocessing import load_image_part, image_to_part
+from tolerant_json import IncrementalJSONParser
+from schemas import BillData
+from structuring import chunk_pages, merge_structured_chunks
+from model_router import Route, model_router
 
-# Configure Gemini
-genai.configure(api_key=settings.GOOGLE_API_KEY)
+STRUCTURING_INSTRUCTIONS = """
+        Expected fields for utility bills/receipts:
+        - vendor_name: Name of the vendor/company
+        - vendor_address: Address of the vendor
+        - document_type: Type of document (bill, receipt, invoice, etc.)
+        - document_number: Document/Invoice number
+        - date: Date on the document
+        - due_date: Due date (if applicable)
+        - total_amount: Total amount
+        - currency: Currency code (USD, EUR, etc.)
+        - tax_amount: Tax amount
+        - subtotal: Subtotal before tax
+        - line_items: List of line items with description and amount
+        - payment_method: Payment method (if mentioned)
+        - account_number: Account number (if applicable)
+        
+        Extract as many fields as possible. If a field is not found, use null.
+        Return ONLY valid JSON, no additional text.
+"""
+
+
+# Few tokenizers fit fewer characters than this in a token; texts short enough
+# at this rate fit a single structuring call without asking the model to count
+MIN_CHARS_PER_TOKEN = 2
+
+# Fields read from the first page for the provisional result of multi-page documents
+HEADER_FIELDS = [
+    "vendor_name", "vendor_address", "document_type", "document_number", "date",
+    "due_date", "total_amount", "currency", "account_number",
+]
+
+# on_stage(stage, done, total): progress of 'text' (pages) and 'structuring' (chunks)
+StageCallback = Callable[[str, int, int], None]
+
+
+def _response_schema(annotation: Any) -> Dict[str, Any]:
+    """Translate a Pydantic model/annotation into Gemini's response schema format"""
+    nullable = False
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        nullable = len(args) < len(get_args(annotation))
+        annotation = args[0]
+
+    if inspect.isclass(annotation) and issubclass(annotation, BaseModel):
+        schema = {
+            "type": "object",
+            "properties": {
+                name: _response_schema(field.annotation)
+                for name, field in annotation.model_fields.items()
+            }
+        }
+    elif get_origin(annotation) is list:
+        schema = {"type": "array", "items": _response_schema(get_args(annotation)[0])}
+    elif annotation in (int, float):
+        schema = {"type": "number"}
+    elif annotation is bool:
+        schema = {"type": "boolean"}
+    else:
+        schema = {"type": "string"}
+
+    if nullable:
+        schema["nullable"] = True
+    return schema
+
+
+BILL_RESPONSE_SCHEMA = _response_schema(BillData)
+
+
+def structuring_generation_config() -> Dict[str, Any]:
+    """Generation config for structuring calls"""
+    return {
+        "max_output_tokens": settings.STRUCTURING_MAX_OUTPUT_TOKENS,
+        "temperature": 0,
+        "response_mime_type": "application/json",
+        "response_schema": BILL_RESPONSE_SCHEMA
+    }
+
+
+class ProgressiveExtraction:
+    """
+    Runs the first-page header extraction alongside the full extraction and
+    hands its result to on_partial, unless the full result is already in.
+    """
+
+    def __init__(self, on_partial: Optional[Callable[[Dict[str, Any]], None]]):
+        self.on_partial = on_partial
+        self._lock = threading.Lock()
+        self._finished = False
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, function: Callable[..., Optional[Dict[str, Any]]], *args):
+        if self.on_partial is None or self._executor is not None:
+            return
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="header-extraction")
+        self._executor.submit(self._run, function, *args)
+
+    def _run(self, function, *args):
+        try:
+            header = function(*args)
+            # Holding the lock while saving means finish() waits for a save in progress
+            with self._lock:
+                if header and not self._finished:
+                    self.on_partial(header)
+        except Exception as e:
+            print(f"Error in first-page extraction: {e}")
+
+    def finish(self):
+        """Called before the full result is saved; header results arriving later are dropped"""
+        with self._lock:
+            self._finished = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
 
 
 class AIDocumentExtractor:
-    """AI service for extracting structured data from documents using Gemini"""
+    """AI service for extracting structured data from documents using the configured LLM provider"""
     
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+    def __init__(self, provider_name: Optional[str] = None, model_name: Optional[str] = None):
+        self.provider_name = provider_name
+        self.model_name = model_name
+
+    @property
+    def provider(self):
+        """Shared LLM provider, created on first use"""
+        return get_provider(self.provider_name)
     
     def extract_text_from_image(self, image_path: str) -> str:
-        """Extract text from image using Gemini Vision"""
+        """Extract text from image using the provider's vision model"""
         try:
-            image = Image.open(image_path)
-            response = self.model.generate_content([
+            return self.provider.generate([
                 "Extract all text from this image accurately.",
-                image
-            ])
-            return response.text
+                load_image_part(image_path)
+            ], model=self.model_name)
         except Exception as e:
             print(f"Error extracting text from image: {e}")
             return ""
     
+    def _ocr_pdf_page(self, pdf_path: str, page_index: int) -> str:
+        """OCR a single PDF page with the provider's vision model"""
+        prompt = "Extract all text from this PDF page accurately. Return only the text, no descriptions."
+        try:
+            from pdf2image import convert_from_path
+            images = convert_from_path(pdf_path, first_page=page_index + 1, last_page=page_index + 1)
+            try:
+                page_part = image_to_part(images[0])
+            finally:
+                for image in images:
+                    image.close()
+        except ImportError:
+            # Fallback: send the page as a one-page PDF (native PDF support, e.g. Gemini)
+            page_part = {"mime_type": "application/pdf", "data": extract_pdf_page(pdf_path, page_index)}
+        return self.provider.generate([prompt, page_part], model=self.model_name)
+
+    def extract_pdf_pages(
+        self,
+        pdf_path: str,
+        on_page: Optional[Callable[[Dict[str, Any], int], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract text page by page, OCR'ing only pages without a usable text layer.
+
+        Returns one entry per page with the text, the method used ("text",
+        "ocr", or "ocr_failed" for a page left with its short text layer when
+        OCR fails) and the time spent on that page. on_page(entry, page_count) is
+        called as each page is done.
+        """
+        started = time.perf_counter()
+        page_texts = read_pdf_pages_in_pool(pdf_path)
+        parse_seconds = time.perf_counter() - started
+        per_page_parse = parse_seconds / max(len(page_texts), 1)
+
+        pages = []
+        for index, page_text in enumerate(page_texts):
+            if len(page_text.strip()) >= settings.PDF_PAGE_MIN_TEXT_CHARS:
+                pages.append({
+                    "page": index + 1,
+                    "method": "text",
+                    "text": page_text,
+                    "seconds": round(per_page_parse, 4)
+                })
+                if on_page:
+                    on_page(pages[-1], len(page_texts))
+                continue
+
+            page_started = time.perf_counter()
+            method = "ocr"
+            try:
+                page_text = self._ocr_pdf_page(pdf_path, index)
+            except Exception as e:
+                print(f"Error running OCR on page {index + 1}: {e}")
+                method = "ocr_failed"
+            pages.append({
+                "page": index + 1,
+                "method": method,
+                "text": page_text,
+                "seconds": round(per_page_parse + time.perf_counter() - page_started, 4)
+            })
+            if on_page:
+                on_page(pages[-1], len(page_texts))
+
+        ocr_pages = sum(1 for page in pages if page["method"] == "ocr")
+        failed_pages = sum(1 for page in pages if page["method"] == "ocr_failed")
+        print(
+            f"Extracted {len(pages)} PDF pages ({len(pages) - ocr_pages - failed_pages} text layer, {ocr_pages} OCR"
+            + (f", {failed_pages} OCR failed" if failed_pages else "")
+            + f") in {time.perf_counter() - started:.2f}s"
+        )
+        for page in pages:
+            print(f"  page {page['page']}: {page['method']}, {len(page['text'])} chars, {page['seconds']:.2f}s")
+        return pages
+
     def extract_text_from_pdf(self, pdf_path: str) -> str:
-        """Extract text from PDF - handles both text-based and scanned PDFs"""
+        """Extract text from PDF - handles text-based, scanned and mixed PDFs"""
+        try:
+            pages = self.extract_pdf_pages(pdf_path)
+            return "\n".join(page["text"] for page in pages)
+        except Exception as e:
+            print(f"Error reading PDF pages ({e}). Trying direct PDF processing...")
+        return self._extract_pdf_text_whole(pdf_path)
+
+    def _extract_pdf_text_whole(self, pdf_path: str) -> str:
+        """Extract text from the whole PDF with the provider's native PDF support"""
         try:
-            # First, try PyPDF2 for text-based PDFs
-            text = ""
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-            
-            # If text is empty or too short, it's likely a scanned PDF
-            if not text or len(text.strip()) < 50:
-                print(f"PDF appears to be scanned (no text found). Using Gemini Vision...")
-                # Convert PDF to images and use Gemini Vision
-                try:
-                    from pdf2image import convert_from_path
-                    images = convert_from_path(pdf_path)
-                    
-                    all_text = []
-                    for i, image in enumerate(images):
-                        print(f"Processing page {i+1}/{len(images)}...")
-                        response = self.model.generate_content([
-                            "Extract all text from this PDF page accurately. Return only the text, no descriptions.",
-                            image
-                        ])
-                        all_text.append(response.text)
-                    
-                    text = "\n\n".join(all_text)
-                    print(f"Extracted {len(text)} characters using Gemini Vision")
-                except ImportError:
-                    print("pdf2image not installed. Trying direct Gemini PDF processing...")
-                    # Fallback: Try Gemini's native PDF support
-                    with open(pdf_path, 'rb') as f:
-                        pdf_data = f.read()
-                    response = self.model.generate_content([
-                        "Extract all text from this PDF document accurately. Return only the text, no descriptions.",
-                        {"mime_type": "application/pdf", "data": pdf_data}
-                    ])
-                    text = response.text
-                    
-            return text
+            with open(pdf_path, 'rb') as f:
+                pdf_data = f.read()
+            return self.provider.generate([
+                "Extract all text from this PDF document accurately. Return only the text, no descriptions.",
+                {"mime_type": "application/pdf", "data": pdf_data}
+            ], model=self.model_name)
         except Exception as e:
             print(f"Error extracting text from PDF: {e}")
             return ""
     
+    def uses_single_pass(self, file_type: str) -> bool:
+        """Whether documents of this type are structured straight from the file"""
+        return file_type in settings.SINGLE_PASS_FILE_TYPES
+
     def extract_structured_data(self, file_path: str, file_type: str) -> Dict[str, Any]:
         """
-        Extract structured data from document using LangGraph workflow
+        Extract structured data from a document, in one or two model calls
+        depending on SINGLE_PASS_FILE_TYPES
+        """
+        return self.extract_with_text(file_path, file_type)[0]
+
+    def extract_with_text(
+        self,
+        file_path: str,
+        file_type: str,
+        on_stage: Optional[StageCallback] = None,
+        on_partial: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Tuple[Dict[str, Any], str]:
         """
-        # Extract text based on file type
+        Extract structured data and also return the document text (empty in
+        single-pass mode). For multi-page documents, on_partial receives the
+        header fields of page one as soon as they are known, while the rest
+        of the document is still being extracted.
+        """
+        partial = ProgressiveExtraction(on_partial)
+        try:
+            if self.uses_single_pass(file_type):
+                if file_type == "pdf" and on_partial and count_pdf_pages(file_path) > 1:
+                    page_part = {"mime_type": "application/pdf", "data": extract_pdf_page(file_path, 0)}
+                    partial.submit(self.extract_header_fields, [page_part])
+                if on_stage:
+                    on_stage("structuring", 0, 1)
+                return self.extract_structured_data_single_pass(file_path, file_type), ""
+            return self._two_stage_with_text(file_path, file_type, on_stage, partial)
+        finally:
+            partial.finish()
+
+    def extract_header_fields(self, contents: List[Any], page_text: str = "") -> Optional[Dict[str, Any]]:
+        """Header fields (vendor, dates, total, ...) from the first page, None if they can't be read"""
+        prompt = f"""
+        This is the first page of a longer document. Extract only these fields in
+        JSON format: {", ".join(HEADER_FIELDS)}.
+        If a field is not on this page, use null. Return ONLY valid JSON, no additional text.
+        """
+        if page_text:
+            contents = [f"{prompt}\n        Page text:\n        {page_text}"]
+        else:
+            contents = [prompt, *contents]
+        route = model_router.route_extraction(1, len(page_text), vision=not page_text)
+        result = self._run_structuring(
+            route, contents, sum(len(part) if isinstance(part, str) else len(part["data"]) for part in contents)
+        )
+        if "error" in result or not any(result.get(field) is not None for field in HEADER_FIELDS):
+            return None
+        return {field: result.get(field) for field in HEADER_FIELDS}
+
+    def extract_text_pages(
+        self,
+        file_path: str,
+        file_type: str,
+        on_page: Optional[Callable[[Dict[str, Any], int], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """Extract document text as a list of pages, each with its text and method"""
         if file_type == "image":
-            raw_text = self.extract_text_from_image(file_path)
-        else:  # pdf
-            raw_text = self.extract_text_from_pdf(file_path)
+            page = {"page": 1, "method": "ocr", "text": self.extract_text_from_image(file_path)}
+            if on_page:
+                on_page(page, 1)
+            return [page]
+        try:
+            return self.extract_pdf_pages(file_path, on_page)
+        except Exception as e:
+            print(f"Error reading PDF pages ({e}). Trying direct PDF processing...")
+            return [{"page": 1, "method": "ocr", "text": self._extract_pdf_text_whole(file_path)}]
+
+    def estimate_tokens(self, text: str) -> int:
+        """Count tokens with the model, falling back to a character-based estimate"""
+        try:
+            return self.provider.count_tokens(text, model=self.model_name)
+        except Exception as e:
+            print(f"Token count failed ({e}), estimating from length")
+            return len(text) // 4
+
+    def extract_structured_data_two_stage(self, file_path: str, file_type: str) -> Dict[str, Any]:
+        """Extract the document text first, then structure that text with a second call"""
+        return self._two_stage_with_text(file_path, file_type)[0]
+
+    def _two_stage_with_text(
+        self,
+        file_path: str,
+        file_type: str,
+        on_stage: Optional[StageCallback] = None,
+        partial: Optional[ProgressiveExtraction] = None
+    ) -> Tuple[Dict[str, Any], str]:
+        """Run OCR/text extraction then structuring, returning both results"""
+
+        def on_page(page: Dict[str, Any], page_count: int):
+            if on_stage:
+                on_stage("text", page["page"], page_count)
+            # Header fields from page one while the remaining pages are read
+            if partial and page["page"] == 1 and page_count > 1 and page["text"].strip():
+                partial.submit(self.extract_header_fields, [], page["text"])
+
+        page_results = self.extract_text_pages(file_path, file_type, on_page)
+        pages = [page["text"] for page in page_results]
+        raw_text = "\n".join(pages)
         
-        if not raw_text:
-            return {"error": "Could not extract text from document"}
+        if not raw_text.strip():
+            return {"error": "Could not extract text from document"}, ""
         
-        # Use Gemini to extract structured data
+        ocr_pages = sum(1 for page in page_results if page["method"] == "ocr")
+        return self.structure_pages(pages, ocr_pages=ocr_pages, on_stage=on_stage), raw_text
+
+    def structure_pages(
+        self,
+        pages: List[str],
+        ocr_pages: int = 0,
+        on_stage: Optional[StageCallback] = None
+    ) -> Dict[str, Any]:
+        """
+        Structure page texts, splitting long documents into page-aligned chunks
+        that are structured in parallel and merged
+        """
+        raw_text = "\n".join(pages)
+        route = model_router.route_extraction(len(pages), len(raw_text), ocr_pages=ocr_pages)
+
+        # Preflight: a model token count only for multi-page texts that may be over
+        # the chunk size, one count for the whole text, pages estimated proportionally
+        fits = len(pages) == 1 or len(raw_text) // MIN_CHARS_PER_TOKEN <= settings.STRUCTURING_CHUNK_TOKENS
+        total_tokens = 0 if fits else self.estimate_tokens(raw_text)
+        if fits or total_tokens <= settings.STRUCTURING_CHUNK_TOKENS:
+            if on_stage:
+                on_stage("structuring", 0, 1)
+            return self._structure_text(raw_text, route)
+
+        tokens_per_char = total_tokens / max(len(raw_text), 1)
+        chunks = chunk_pages(
+            pages,
+            settings.STRUCTURING_CHUNK_TOKENS,
+            lambda page: int(len(page) * tokens_per_char) + 1
+        )
+        print(f"Structuring {len(pages)} pages (~{total_tokens} tokens) in {len(chunks)} chunks")
+
+        results = []
+        if on_stage:
+            on_stage("structuring", 0, len(chunks))
+        with ThreadPoolExecutor(max_workers=settings.STRUCTURING_MAX_PARALLEL) as executor:
+            for result in executor.map(
+                lambda item: self._structure_text("\n".join(item[1]), route, part=(item[0] + 1, len(chunks))),
+                enumerate(chunks)
+            ):
+                results.append(result)
+                if on_stage:
+                    on_stage("structuring", len(results), len(chunks))
+        return merge_structured_chunks(results)
+
+    def _structure_text(self, raw_text: str, route: Route, part: Optional[tuple] = None) -> Dict[str, Any]:
+        """Structure a single block of document text"""
+        part_note = ""
+        if part:
+            part_note = (
+                f"This text is part {part[0]} of {part[1]} of a longer document. "
+                "Only report values present in this part; use null for anything else."
+            )
         prompt = f"""
         Analyze the following document text and extract structured data in JSON format.
-        
-        Expected fields for utility bills/receipts:
-        - vendor_name: Name of the vendor/company
-        - vendor_address: Address of the vendor
-        - document_type: Type of document (bill, receipt, invoice, etc.)
-        - document_number: Document/Invoice number
-        - date: Date on the document
-        - due_date: Due date (if applicable)
-        - total_amount: Total amount
-        - currency: Currency code (USD, EUR, etc.)
-        - tax_amount: Tax amount
-        - subtotal: Subtotal before tax
-        - line_items: List of line items with description and amount
-        - payment_method: Payment method (if mentioned)
-        - account_number: Account number (if applicable)
-        
-        Extract as many fields as possible. If a field is not found, use null.
-        Return ONLY valid JSON, no additional text.
-        
+        {part_note}
+        {STRUCTURING_INSTRUCTIONS}
         Document text:
         {raw_text}
         """
-        
+        return self._run_structuring(route, prompt, len(prompt), raw_text)
+
+    def extract_structured_data_single_pass(self, file_path: str, file_type: str) -> Dict[str, Any]:
+        """Send the file itself with the structuring prompt, skipping the separate OCR call"""
+        prompt = f"""
+        Analyze the attached document and extract structured data in JSON format.
+        {STRUCTURING_INSTRUCTIONS}
+        """
         try:
-            response = self.model.generate_content(prompt)
-            result_text = response.text.strip()
-            
-            # Clean up the response to extract JSON
-            if "```json" in result_text:
-                result_text = result_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in result_text:
-                result_text = result_text.split("```")[1].split("```")[0].strip()
-            
-            extracted_data = json.loads(result_text)
-            return extracted_data
-        except json.JSONDecodeError as e:
+            if file_type == "image":
+                document_part = load_image_part(file_path)
+            else:  # pdf
+                with open(file_path, 'rb') as f:
+                    document_part = {"mime_type": "application/pdf", "data": f.read()}
+        except Exception as e:
+            print(f"Error in single-pass extraction: {e}")
+            return {"error": str(e)}
+        route = model_router.route_extraction(1, 0, vision=True)
+        return self._run_structuring(route, [prompt, document_part], len(prompt) + len(document_part["data"]))
+
+    def _run_structuring(self, route: Route, contents: Any, input_chars: int, raw_text: str = "") -> Dict[str, Any]:
+        """Run a structuring call on the routed model, escalating when the output can't be parsed"""
+        return model_router.run(
+            route,
+            lambda model: self._generate_structured(contents, raw_text, model=self.model_name or model),
+            is_failure=lambda result: "error" in result,
+            input_chars=input_chars,
+            output_chars=lambda result: len(json.dumps(result, default=str)),
+            provider=self.provider_name
+        )
+
+    def _generate_structured(self, contents: Any, raw_text: str = "", model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Run a structuring call and parse its JSON while it streams in.
+
+        The response is constrained to the BillData schema when the provider
+        supports it; either way it is parsed tolerantly (fences, trailing
+        prose, truncation) and validated against BillData.
+        """
+        parser = IncrementalJSONParser(max_chars=settings.STRUCTURING_MAX_RESPONSE_CHARS)
+        try:
+            response = self.provider.stream(
+                contents,
+                model=model or self.model_name,
+                generation_config=structuring_generation_config()
+            )
+            for chunk in response:
+                if parser.feed(chunk):
+                    break
+        except Exception as e:
+            print(f"Error in structured data extraction: {e}")
+            return {"error": str(e), "raw_text": raw_text[:500]}
+
+        if parser.truncated:
+            print(f"Structuring response exceeded {settings.STRUCTURING_MAX_RESPONSE_CHARS} characters, repairing")
+        try:
+            extracted_data = parser.result()
+        except ValueError as e:
             print(f"Error parsing JSON: {e}")
-            print(f"Raw response: {response.text}")
+            print(f"Raw response: {parser.buffer[:2000]}")
             # Return basic extracted text as fallback
             return {
                 "raw_text": raw_text[:500],
                 "error": "Could not parse structured data",
-                "raw_response": response.text
+                "raw_response": parser.buffer[:2000]
             }
-        except Exception as e:
-            print(f"Error in structured data extraction: {e}")
-            return {"error": str(e), "raw_text": raw_text[:500]}
+
+        if not isinstance(extracted_data, dict):
+            return {"line_items": extracted_data} if isinstance(extracted_data, list) else {"error": "Unexpected response"}
+        try:
+            return BillData.model_validate(extracted_data).model_dump()
+        except ValidationError as e:
+            print(f"Structured data did not match the bill schema: {e}")
+            return extracted_data
+
+
+CHAT_ERROR_RESPONSE = "I apologize, but I encountered an error processing your question. Please try again."
 
 
 class AIChatbot:
     """AI chatbot for answering questions about extracted data"""
     
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+    def __init__(self, provider_name: Optional[str] = None, model_name: Optional[str] = None):
+        self.provider_name = provider_name
+        self.model_name = model_name
+
+    @property
+    def provider(self):
+        """Shared LLM provider, created on first use"""
+        return get_provider(self.provider_name)
     
     def answer_question(
         self,
@@ -152,7 +516,7 @@ class AIChatbot:
         chat_history: Optional[list] = None
     ) -> str:
         """
-        Answer questions about the extracted data using Gemini
+        Answer questions about the extracted data using the LLM provider
         """
         # Format the extracted data for context
         data_context = json.dumps(extracted_data, indent=2)
@@ -177,13 +541,54 @@ class AIChatbot:
         If the information is not available in the data, politely say so.
         """
         
+        full_prompt = f"{system_prompt}\n\nUser Question: {question}"
+        route = model_router.route_chat(question, extracted_data, len(chat_history or []))
         try:
-            full_prompt = f"{system_prompt}\n\nUser Question: {question}"
-            response = self.model.generate_content(full_prompt)
-            return response.text
+            return model_router.run(
+                route,
+                lambda model: self.provider.generate(full_prompt, model=self.model_name or model),
+                is_failure=lambda answer: not answer.strip(),
+                input_chars=len(full_prompt),
+                provider=self.provider_name
+            )
         except Exception as e:
             print(f"Error in chatbot: {e}")
-            return "I apologize, but I encountered an error processing your question. Please try again."
+            return CHAT_ERROR_RESPONSE
+
+    def answer_across_documents(self, question: str, snippets: List[Dict[str, Any]]) -> str:
+        """
+        Answer a question about all of a user's documents from retrieved snippets
+        """
+        if not snippets:
+            return "I couldn't find any processed documents to answer that question."
+
+        context = "\n\n".join(
+            f"--- {snippet['filename']} (document {snippet['document_id']}) ---\n{snippet['content']}"
+            for snippet in snippets
+        )
+        prompt = f"""You are a helpful AI assistant specialized in analyzing document data.
+        The user has many documents (bills, receipts, invoices). These are the excerpts
+        most relevant to their question:
+        
+        {context}
+        
+        Answer the user's question using only these excerpts. When adding up amounts,
+        list the documents you used. If the excerpts don't contain the answer, say so.
+        
+        User Question: {question}
+        """
+        route = Route(name="chat.cross_document", tier="default")
+        try:
+            return model_router.run(
+                route,
+                lambda model: self.provider.generate(prompt, model=self.model_name or model),
+                is_failure=lambda answer: not answer.strip(),
+                input_chars=len(prompt),
+                provider=self.provider_name
+            )
+        except Exception as e:
+            print(f"Error in cross-document chatbot: {e}")
+            return CHAT_ERROR_RESPONSE
 
 
 # Initialize global instances
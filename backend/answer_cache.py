@@ -0,0 +1,125 @@
+"""
+Per-document cache of chatbot answers.
+
+Answers are keyed by the extracted data's version and the normalized
+question, so repeat questions are served without a model call and any edit
+to the extracted data naturally misses the cache. The version callers pass
+also carries a digest of the chat history the question was asked after, so
+a follow-up ("why?", "and the tax?") is only answered from the cache in the
+same conversation. An optional fuzzy layer
+matches near-identical phrasings of a question already answered for the
+same document version.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Set, Tuple
+from config import settings
+from metrics import metrics
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_NUMBERS = re.compile(r"\d+(?:\.\d+)?")
+
+CacheKey = Tuple[int, str, str]
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return " ".join(_PUNCTUATION.sub(" ", question.lower()).split())
+
+
+def history_digest(history: List[Dict[str, str]]) -> str:
+    """Short hash of the conversation before a question, empty when there is none"""
+    if not history:
+        return ""
+    canonical = json.dumps(history, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    """LRU + TTL cache of answers per (document, data version, question)"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, fuzzy_threshold: float = 0.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.fuzzy_threshold = fuzzy_threshold
+        self._entries: "OrderedDict[CacheKey, Tuple[str, float]]" = OrderedDict()
+        self._by_document: Dict[int, Set[CacheKey]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, document_id: int, version: str, question: str) -> Optional[str]:
+        """Return a cached answer or None"""
+        normalized = normalize_question(question)
+        with self._lock:
+            key = (document_id, version, normalized)
+            answer = self._lookup(key)
+            if answer is None and self.fuzzy_threshold > 0:
+                answer = self._fuzzy_lookup(document_id, version, normalized)
+        metrics.increment("answer_cache.hits" if answer is not None else "answer_cache.misses")
+        return answer
+
+    def set(self, document_id: int, version: str, question: str, answer: str):
+        """Store an answer, evicting the least recently used entries"""
+        key = (document_id, version, normalize_question(question))
+        with self._lock:
+            self._entries[key] = (answer, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            self._by_document.setdefault(document_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._forget(evicted)
+
+    def invalidate_document(self, document_id: int):
+        """Drop every cached answer for a document"""
+        with self._lock:
+            for key in self._by_document.pop(document_id, set()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_document.clear()
+
+    def _lookup(self, key: CacheKey) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        answer, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._forget(key)
+            return None
+        self._entries.move_to_end(key)
+        return answer
+
+    def _fuzzy_lookup(self, document_id: int, version: str, normalized: str) -> Optional[str]:
+        # Questions that differ in a number ("line item 2" vs "line item 3") never match
+        numbers = _NUMBERS.findall(normalized)
+        best_key, best_ratio = None, self.fuzzy_threshold
+        for key in self._by_document.get(document_id, ()):
+            if key[1] != version or _NUMBERS.findall(key[2]) != numbers:
+                continue
+            ratio = SequenceMatcher(None, normalized, key[2]).ratio()
+            if ratio >= best_ratio:
+                best_key, best_ratio = key, ratio
+        if best_key is None:
+            return None
+        return self._lookup(best_key)
+
+    def _forget(self, key: CacheKey):
+        keys = self._by_document.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_document[key[0]]
+
+
+answer_cache = AnswerCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    fuzzy_threshold=settings.ANSWER_CACHE_FUZZY_THRESHOLD
+)
@@ -0,0 +1,200 @@
+"""
+Extraction benchmark over the fixture corpus, replayable offline.
+
+Usage:
+    python benchmark_extraction.py                      # replay the cassette (no network)
+    python benchmark_extraction.py --record             # call the configured provider and re-record
+    python benchmark_extraction.py --record --provider fake
+    python benchmark_extraction.py --variants two_stage --realtime --min-accuracy 0.9 --json results.json
+
+Runs each pipeline variant over the bills in benchmark_fixtures/bills and
+reports, per variant, the model calls made (generate, count_tokens and embed
+round trips alike, and per method), the time spent, and field-level accuracy
+against benchmark_fixtures/bills/expected.json.
+
+Model calls go through a CassetteProvider (cassettes.py). --record sends them
+to the real provider and saves the requests, responses and latencies to
+benchmark_fixtures/cassettes/extraction.json; the default replays that file
+as the provider that recorded it, so the numbers are reproducible in CI
+without network access or quota. The committed cassette was recorded from
+the fake provider: it checks the harness, call counts and pipeline time,
+but its accuracy is meaningless until it is re-recorded from a live model. In
+replay, 'Wall s' is the pipeline's own time and 'Model s' the recorded model
+time; with --realtime each replayed call waits for its recorded latency, so
+'Wall s' is end to end including parallel calls overlapping.
+
+A change to a prompt, to image preprocessing (or the Pillow version that
+encodes its output) or to the model routing settings changes the requests,
+which then miss the cassette; record again and commit the new cassette with
+the change.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BILLS_DIR = os.path.join(HERE, "benchmark_fixtures", "bills")
+DEFAULT_CASSETTE = os.path.join(HERE, "benchmark_fixtures", "cassettes", "extraction.json")
+
+VARIANTS = {
+    "two_stage": "extract_structured_data_two_stage",
+    "single_pass": "extract_structured_data_single_pass",
+}
+
+
+def line_items_match(expected: List[Dict[str, Any]], actual: Any, normalize_value) -> bool:
+    """Same number of items with the same amounts, in any order"""
+    if not isinstance(actual, list) or len(actual) != len(expected):
+        return False
+    amounts = sorted(normalize_value(item.get("amount")) for item in expected)
+    actual_amounts = [normalize_value(item.get("amount")) if isinstance(item, dict) else None for item in actual]
+    return sorted(actual_amounts, key=str) == sorted(amounts, key=str)
+
+
+def score(expected: Dict[str, Any], actual: Dict[str, Any], normalize_value) -> Dict[str, bool]:
+    """Whether each expected field was extracted correctly"""
+    results = {}
+    for field, value in expected.items():
+        if field == "line_items":
+            results[field] = line_items_match(value, actual.get(field), normalize_value)
+        else:
+            results[field] = normalize_value(actual.get(field)) == normalize_value(value)
+    return results
+
+
+def run_variant(extractor, provider, variant: str, files: List[Tuple[str, str]], expected: Dict[str, Any]):
+    from compare_extraction_modes import normalize_value
+
+    method = getattr(extractor, VARIANTS[variant])
+    result = {"variant": variant, "documents": [], "calls": 0, "calls_by_method": {}, "wall_seconds": 0.0,
+              "model_seconds": 0.0, "correct": 0, "fields": 0, "misses": 0, "errors": 0}
+    field_totals: Dict[str, List[int]] = {}
+    for name, file_type in files:
+        provider.reset_counters()
+        started = time.perf_counter()
+        data = method(os.path.join(BILLS_DIR, name), file_type)
+        wall = time.perf_counter() - started
+        fields = score(expected[name], data, normalize_value)
+        calls = sum(provider.calls.values())
+        for kind, count in provider.calls.items():
+            result["calls_by_method"][kind] = result["calls_by_method"].get(kind, 0) + count
+
+        result["documents"].append({
+            "file": name, "calls": calls, "calls_by_method": dict(provider.calls), "wall_seconds": round(wall, 4),
+            "model_seconds": round(provider.recorded_seconds, 4),
+            "wrong_fields": sorted(field for field, correct in fields.items() if not correct),
+            "error": data.get("error"),
+        })
+        result["calls"] += calls
+        result["wall_seconds"] += wall
+        result["model_seconds"] += provider.recorded_seconds
+        result["correct"] += sum(fields.values())
+        result["fields"] += len(fields)
+        result["misses"] += provider.misses
+        result["errors"] += "error" in data
+        for field, correct in fields.items():
+            totals = field_totals.setdefault(field, [0, 0])
+            totals[0] += correct
+            totals[1] += 1
+    result["accuracy"] = result["correct"] / max(result["fields"], 1)
+    result["field_accuracy"] = {field: correct / total for field, (correct, total) in sorted(field_totals.items())}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", action="store_true", help="Call the provider and re-record the cassette")
+    mode.add_argument("--auto", action="store_true", help="Replay what is recorded, record the rest")
+    parser.add_argument("--provider", help="Provider to record from (defaults to LLM_PROVIDER)")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE)
+    parser.add_argument("--variants", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--realtime", action="store_true", help="Replay with the recorded latencies")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--min-accuracy", type=float, default=0.0, help="Exit with an error below this accuracy")
+    args = parser.parse_args()
+
+    if not args.provider and not args.record and os.path.exists(args.cassette):
+        # Replay as the provider that recorded the cassette, whose model names the requests carry
+        with open(args.cassette, encoding="utf-8") as file:
+            args.provider = json.load(file).get("provider")
+    if args.provider:
+        os.environ["LLM_PROVIDER"] = args.provider
+        if args.provider == "fake":
+            os.environ.setdefault("FAKE_LLM_LATENCY_MS", "0")
+
+    # Imported after the environment is set so settings pick up the provider
+    from ai_service import AIDocumentExtractor
+    from cassettes import CassetteProvider
+    from config import settings
+    from model_registry import get_provider, set_provider
+
+    if args.record and os.path.exists(args.cassette):
+        os.remove(args.cassette)
+    cassette_mode = "record" if args.record else "auto" if args.auto else "replay"
+    if cassette_mode == "replay" and not os.path.exists(args.cassette):
+        print(f"⚠️  No cassette at {args.cassette}; record one with --record")
+        sys.exit(2)
+    provider = CassetteProvider(
+        args.cassette,
+        mode=cassette_mode,
+        inner=get_provider() if cassette_mode != "replay" else None,
+        replay_latency=1.0 if args.realtime else 0.0
+    )
+    set_provider(provider, settings.LLM_PROVIDER)
+    extractor = AIDocumentExtractor()
+
+    with open(os.path.join(BILLS_DIR, "expected.json"), encoding="utf-8") as file:
+        expected = json.load(file)
+    files = [(name, "pdf" if name.endswith(".pdf") else "image") for name in sorted(expected)]
+
+    results = []
+    try:
+        for variant in args.variants:
+            results.append(run_variant(extractor, provider, variant, files, expected))
+    finally:
+        if provider.dirty:
+            provider.save()
+            print(f"Recorded {args.cassette}")
+
+    print("=" * 78)
+    print(f"{'Variant':<12} {'Docs':>5} {'Calls':>6} {'Calls/doc':>10} {'Wall s':>8} {'Model s':>8} {'Accuracy':>10} {'Misses':>7}")
+    print("=" * 78)
+    for result in results:
+        documents = len(result["documents"])
+        print(
+            f"{result['variant']:<12} {documents:>5} {result['calls']:>6} {result['calls'] / documents:>10.2f} "
+            f"{result['wall_seconds']:>8.2f} {result['model_seconds']:>8.2f} {result['accuracy']:>9.1%} "
+            f"{result['misses']:>7}"
+        )
+    for result in results:
+        methods = ", ".join(f"{method} {count}" for method, count in sorted(result["calls_by_method"].items()))
+        print(f"{result['variant']:<12} calls: {methods or 'none'}")
+    print("-" * 78)
+    fields = sorted({field for result in results for field in result["field_accuracy"]})
+    print(f"{'Field':<16}" + "".join(f"{result['variant']:>14}" for result in results))
+    for field in fields:
+        print(f"{field:<16}" + "".join(f"{result['field_accuracy'].get(field, 0):>14.0%}" for result in results))
+    for result in results:
+        for document in result["documents"]:
+            if document["error"]:
+                print(f"⚠️  {result['variant']} {document['file']}: {document['error']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"mode": cassette_mode, "results": results}, file, indent=2)
+
+    if any(result["misses"] for result in results):
+        print("⚠️  Requests missing from the cassette; record it again with --record")
+        sys.exit(1)
+    failing = [result["variant"] for result in results if result["accuracy"] < args.min_accuracy]
+    if failing:
+        print(f"⚠️  Accuracy below {args.min_accuracy:.0%}: {', '.join(failing)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Generate the synthetic bill corpus used by benchmark_extraction.py.
+
+Usage:
+    python benchmark_fixtures/generate_bills.py
+
+Writes each bill in bills/ as a PNG scan or a PDF with a text layer,
+together with bills/expected.json holding the fields a correct extraction
+returns. The files are committed; regenerate them only to change the corpus,
+since every recorded cassette matches the exact bytes of the files.
+"""
+import json
+import os
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BILLS_DIR = os.path.join(HERE, "bills")
+
+BILLS: List[Dict[str, Any]] = [
+    {
+        "file": "power_statement.png",
+        "fields": {
+            "vendor_name": "City Power & Light", "document_type": "utility bill",
+            "document_number": "CPL-2024-0301", "account_number": "0042-1187-22",
+            "date": "2024-03-01", "due_date": "2024-03-21", "currency": "USD",
+            "subtotal": 94.54, "tax_amount": 7.64, "total_amount": 102.18,
+        },
+        "line_items": [("Energy charge 612 kWh", 73.44), ("Delivery charge", 21.10)],
+    },
+    {
+        "file": "water_bill.png",
+        "fields": {
+            "vendor_name": "Lakeside Water Authority", "document_type": "utility bill",
+            "document_number": "LWA-558120", "account_number": "77-30912",
+            "date": "2024-02-14", "due_date": "2024-03-06", "currency": "USD",
+            "subtotal": 48.20, "tax_amount": 0.00, "total_amount": 48.20,
+        },
+        "line_items": [("Water usage 9 kgal", 31.50), ("Sewer service", 16.70)],
+    },
+    {
+        "file": "cafe_receipt.png",
+        "fields": {
+            "vendor_name": "Morning Grind Cafe", "document_type": "receipt",
+            "document_number": "R-00917", "date": "2024-04-09", "currency": "EUR",
+            "subtotal": 11.40, "tax_amount": 0.91, "total_amount": 12.31,
+            "payment_method": "card",
+        },
+        "line_items": [("Flat white", 3.80), ("Croissant", 2.60), ("Sandwich", 5.00)],
+    },
+    {
+        "file": "hosting_invoice.pdf",
+        "fields": {
+            "vendor_name": "Northwind Hosting Ltd", "document_type": "invoice",
+            "document_number": "NW-INV-4471", "account_number": "CUST-2093",
+            "date": "2024-05-01", "due_date": "2024-05-31", "currency": "GBP",
+            "subtotal": 240.00, "tax_amount": 48.00, "total_amount": 288.00,
+        },
+        "line_items": [("Dedicated server May", 180.00), ("Backup storage 500 GB", 45.00),
+                       ("Support plan", 15.00)],
+    },
+    {
+        "file": "telecom_two_pages.pdf",
+        "fields": {
+            "vendor_name": "Skyline Telecom", "document_type": "utility bill",
+            "document_number": "ST-99310457", "account_number": "8801-552-190",
+            "date": "2024-06-03", "due_date": "2024-06-24", "currency": "USD",
+            "subtotal": 115.97, "tax_amount": 9.28, "total_amount": 125.25,
+        },
+        "line_items": [("Mobile plan 2 lines", 70.00), ("Home fiber 500", 39.99),
+                       ("Device installment", 5.98)],
+        # Line items continue on page two, so the header is all page one has
+        "pages": 2,
+    },
+    {
+        "file": "office_supplies.pdf",
+        "fields": {
+            "vendor_name": "Paperline Office Supply", "document_type": "invoice",
+            "document_number": "PL-30218", "date": "2024-01-22", "due_date": "2024-02-21",
+            "currency": "USD", "subtotal": 86.50, "tax_amount": 6.92, "total_amount": 93.42,
+            "payment_method": "bank transfer",
+        },
+        "line_items": [("Copy paper 10 reams", 54.00), ("Toner cartridge", 32.50)],
+    },
+]
+
+
+def bill_lines(bill: Dict[str, Any]) -> List[List[str]]:
+    """The text of a bill, one list of lines per page"""
+    fields = bill["fields"]
+    currency = fields["currency"]
+    header = [
+        fields["vendor_name"].upper(),
+        f"{fields['document_type'].title()} {fields['document_number']}",
+    ]
+    if "account_number" in fields:
+        header.append(f"Account {fields['account_number']}")
+    header.append(f"Date {fields['date']}")
+    if "due_date" in fields:
+        header.append(f"Due {fields['due_date']}")
+    items = [f"{description:<30} {amount:>10.2f}" for description, amount in bill["line_items"]]
+    totals = [
+        f"{'Subtotal':<30} {fields['subtotal']:>10.2f}",
+        f"{'Tax':<30} {fields['tax_amount']:>10.2f}",
+        f"{'Total due ' + currency:<30} {fields['total_amount']:>10.2f}",
+    ]
+    if "payment_method" in fields:
+        totals.append(f"Paid by {fields['payment_method']}")
+    if bill.get("pages", 1) == 2:
+        return [header + ["", "Summary of charges on page 2"], ["Charges", ""] + items + [""] + totals]
+    return [header + [""] + items + [""] + totals]
+
+
+def write_png(path: str, lines: List[str]):
+    from PIL import Image, ImageDraw
+
+    image = Image.new("L", (640, 40 + 22 * len(lines)), 255)
+    draw = ImageDraw.Draw(image)
+    for index, line in enumerate(lines):
+        draw.text((24, 20 + 22 * index), line, fill=0)
+    image.save(path, format="PNG", optimize=True)
+
+
+def _pdf_string(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[List[str]]):
+    """Minimal PDF with a Courier text layer, one page per list of lines"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>"]
+    page_ids = []
+    for lines in pages:
+        stream = "BT /F1 11 Tf 14 TL 50 780 Td " + " ".join(f"({_pdf_string(line)}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as file:
+        file.write(output)
+
+
+def main():
+    os.makedirs(BILLS_DIR, exist_ok=True)
+    expected = {}
+    for bill in BILLS:
+        pages = bill_lines(bill)
+        path = os.path.join(BILLS_DIR, bill["file"])
+        if bill["file"].endswith(".pdf"):
+            write_pdf(path, pages)
+        else:
+            write_png(path, [line for page in pages for line in page])
+        expected[bill["file"]] = {
+            **bill["fields"],
+            "line_items": [{"description": description, "amount": amount} for description, amount in bill["line_items"]],
+        }
+        print(f"Wrote {path}")
+    with open(os.path.join(BILLS_DIR, "expected.json"), "w", encoding="utf-8") as file:
+        json.dump(expected, file, indent=2, ensure_ascii=False)
+        file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark image normalization: payload size and latency before and after.
+
+Usage:
+    python benchmark_image_preprocessing.py [image ...] [--live]
+
+Without arguments every image in the upload directory is used. With --live
+each image is also sent to the configured LLM provider raw and normalized
+to compare model latency.
+"""
+import argparse
+import io
+import os
+import time
+from PIL import Image
+from config import settings
+from image_preprocessing import load_image_part
+from model_registry import get_provider
+
+PROMPT = "Extract all text from this image accurately."
+
+
+def raw_part(image_path: str) -> dict:
+    """Encode the image the way it was sent before normalization"""
+    with Image.open(image_path) as image:
+        output = io.BytesIO()
+        image.save(output, format="PNG")
+        return {"mime_type": "image/png", "data": output.getvalue()}
+
+
+def time_model_call(provider, part: dict) -> float:
+    started = time.perf_counter()
+    provider.generate([PROMPT, part])
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", help="Image files (defaults to the upload directory)")
+    parser.add_argument("--live", action="store_true", help="Also measure model latency")
+    args = parser.parse_args()
+
+    images = args.images or [
+        os.path.join(settings.UPLOAD_DIR, name)
+        for name in sorted(os.listdir(settings.UPLOAD_DIR))
+        if name.lower().endswith(('.jpg', '.jpeg', '.png'))
+    ]
+    if not images:
+        print("⚠️  No images to benchmark")
+        return
+
+    provider = get_provider() if args.live else None
+
+    print("=" * 90)
+    print(f"{'Image':<32} {'Raw KB':>9} {'Norm KB':>9} {'Ratio':>7} {'Prep ms':>9} {'Raw s':>7} {'Norm s':>7}")
+    print("=" * 90)
+
+    total_raw = total_norm = 0
+    for image_path in images:
+        before = raw_part(image_path)
+
+        started = time.perf_counter()
+        after = load_image_part(image_path)
+        prep_ms = (time.perf_counter() - started) * 1000
+
+        raw_size = len(before["data"])
+        norm_size = len(after["data"])
+        total_raw += raw_size
+        total_norm += norm_size
+
+        raw_latency = norm_latency = ""
+        if provider is not None:
+            raw_latency = f"{time_model_call(provider, before):.2f}"
+            norm_latency = f"{time_model_call(provider, after):.2f}"
+
+        print(
+            f"{os.path.basename(image_path)[:32]:<32} {raw_size / 1024:>9.1f} {norm_size / 1024:>9.1f} "
+            f"{raw_size / max(norm_size, 1):>6.1f}x {prep_ms:>9.1f} {raw_latency:>7} {norm_latency:>7}"
+        )
+
+    print("-" * 90)
+    print(f"Total payload: {total_raw / 1024:.1f} KB -> {total_norm / 1024:.1f} KB "
+          f"({total_raw / max(total_norm, 1):.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
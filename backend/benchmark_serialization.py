@@ -0,0 +1,149 @@
+"""
+Micro-benchmark for response serialization on the hot read endpoints.
+
+Usage:
+    python benchmark_serialization.py [--rows 1000 5000 10000] [--runs 5]
+
+Fills an in-memory SQLite database and times, per endpoint, the old path
+(ORM objects -> Pydantic validation -> jsonable_encoder -> json.dumps, as
+FastAPI does with a response_model) against the new one (column query ->
+orjson bytes). Both outputs are checked to decode to the same JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ["DEBUG"] = "False"
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+from models import ChatMessage, Document, User
+from schemas import AuthResponse, Document as DocumentSchema, User as UserSchema
+from serialization import CHAT_HISTORY_COLUMNS, DOCUMENT_COLUMNS, chat_history_json, documents_json, user_dict
+
+
+def old_json(content) -> bytes:
+    # What fastapi.responses.JSONResponse.render does
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def seed(db, rows: int):
+    user = User(name="Bench", email="bench@example.com", hashed_password="x",
+                created_at=datetime.now(timezone.utc))
+    db.add(user)
+    db.flush()
+    document = None
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(rows):
+        document = Document(
+            user_id=user.id, filename=f"invoice_{i}.pdf", file_path=f"/uploads/{user.id}_{i}_invoice_{i}.pdf",
+            file_type="pdf", file_size=100_000 + i, status="processed",
+            created_at=started + timedelta(minutes=i), updated_at=started + timedelta(minutes=i, seconds=30)
+        )
+        db.add(document)
+    db.flush()
+    for i in range(rows):
+        sender = "user" if i % 2 == 0 else "ai"
+        db.add(ChatMessage(
+            user_id=user.id, document_id=document.id, sender=sender,
+            message=f"What is line {i}?" if sender == "user" else "",
+            response=f"Line {i} is a service charge of ${i}.00" if sender == "ai" else "",
+            created_at=started + timedelta(minutes=rows, seconds=i)
+        ))
+    db.commit()
+    return user, document
+
+
+def endpoints(db, user, document):
+    """(name, old path, new path) for each endpoint"""
+
+    def documents_old():
+        documents = db.query(Document).filter(Document.user_id == user.id).order_by(Document.created_at.desc()).all()
+        return old_json(jsonable_encoder([DocumentSchema.model_validate(d) for d in documents]))
+
+    def documents_new():
+        rows = db.query(*DOCUMENT_COLUMNS).filter(Document.user_id == user.id).order_by(Document.created_at.desc()).all()
+        return documents_json(rows)
+
+    def history_old():
+        messages = db.query(ChatMessage).filter(
+            ChatMessage.document_id == document.id, ChatMessage.user_id == user.id
+        ).order_by(ChatMessage.created_at.asc()).all()
+        formatted = []
+        for msg in messages:
+            text = msg.message if msg.sender == "user" else msg.response
+            if text:
+                formatted.append({"id": msg.id, "text": text, "sender": msg.sender,
+                                  "timestamp": msg.created_at.isoformat()})
+        return old_json(jsonable_encoder(formatted))
+
+    def history_new():
+        rows = db.query(*CHAT_HISTORY_COLUMNS).filter(
+            ChatMessage.document_id == document.id, ChatMessage.user_id == user.id
+        ).order_by(ChatMessage.created_at.asc()).all()
+        return chat_history_json(rows)
+
+    def login_old():
+        payload = AuthResponse.model_validate({"token": "t" * 160, "user": UserSchema.model_validate(user)})
+        return old_json(jsonable_encoder(payload))
+
+    def login_new():
+        return orjson.dumps({"token": "t" * 160, "user": user_dict(user)})
+
+    return [
+        ("GET /api/documents", documents_old, documents_new, 1),
+        ("GET /api/chat/history", history_old, history_new, 1),
+        ("POST /api/auth/login (x1000)", login_old, login_new, 1000),
+    ]
+
+
+def timed(call, repeat: int, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            call()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 5000, 10000])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print("=" * 84)
+    print(f"{'Endpoint':<30} {'Rows':>7} {'Old ms':>10} {'New ms':>10} {'Speedup':>9} {'KB':>9}")
+    print("=" * 84)
+    for rows in args.rows:
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        user, document = seed(db, rows)
+
+        for name, old, new, repeat in endpoints(db, user, document):
+            if orjson.loads(old()) != orjson.loads(new()):
+                print(f"❌ {name}: outputs differ")
+                continue
+            old_ms = timed(old, repeat, args.runs)
+            new_ms = timed(new, repeat, args.runs)
+            # Expire cached ORM state so the old path pays for loading objects every run
+            db.expire_all()
+            print(f"{name:<30} {rows:>7} {old_ms:>10.1f} {new_ms:>10.1f} {old_ms / max(new_ms, 1e-9):>8.1f}x "
+                  f"{len(new()) / 1024:>9.1f}")
+        db.close()
+        engine.dispose()
+        print("-" * 84)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Startup-time benchmark for the API and the CLI scripts.
+
+Usage:
+    python benchmark_startup.py [--runs 5] [--budget 1.5]
+
+Imports each entry point in a fresh interpreter, reports the median import
+time and the slowest modules, and fails (exit code 1) if an entry point goes
+over the time budget or eagerly imports a heavy dependency that should only
+load on first use. Import attempts are caught before the module is looked
+up, so the check fails even where the dependency is not installed, and
+names the file and line that imported it.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# main is the API; ai_service and auth are what the CLI scripts (test_extraction.py,
+# create_test_user.py) import before doing any work
+ENTRY_POINTS = ["main", "ai_service", "auth"]
+
+# Must not be imported until a document is actually processed
+DEFERRED_MODULES = ["google.generativeai", "PIL", "PyPDF2", "pdf2image", "numpy"]
+
+# Records the first attempt to import each deferred module (or one of its
+# submodules) with the backend line responsible, then lets the import go on
+CHECK_SCRIPT = """
+import json, os, sys, traceback
+deferred = {deferred!r}
+here = os.getcwd()
+attempts = {{}}
+
+class Recorder:
+    def find_spec(self, name, path=None, target=None):
+        for root in deferred:
+            if (name == root or name.startswith(root + ".")) and root not in attempts:
+                frames = [frame for frame in traceback.extract_stack()[:-1] if frame.filename.startswith(here)]
+                attempts[root] = (
+                    f"{{os.path.relpath(frames[-1].filename, here)}}:{{frames[-1].lineno}}" if frames else "?"
+                )
+        return None
+
+sys.meta_path.insert(0, Recorder())
+try:
+    import {module}
+    error = None
+except Exception as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+print(json.dumps({{"attempts": attempts, "error": error}}))
+"""
+
+
+def time_import(module: str) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True, capture_output=True)
+    return time.perf_counter() - started
+
+
+def eager_imports(module: str) -> dict:
+    """Deferred modules importing `module` tries to load, with where from, and any import error"""
+    result = subprocess.run(
+        [sys.executable, "-c", CHECK_SCRIPT.format(module=module, deferred=DEFERRED_MODULES)],
+        check=True, capture_output=True, text=True
+    )
+    output = result.stdout.strip().splitlines()
+    return json.loads(output[-1])
+
+
+def slowest_modules(module: str, count: int = 5) -> list:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        check=True, capture_output=True, text=True
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        timings.append((int(parts[1]), parts[2].strip()))
+    return sorted(timings, reverse=True)[1:count + 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1.5, help="Maximum median import time in seconds")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    failures = []
+
+    print("=" * 60)
+    print("Startup Time Benchmark")
+    print("=" * 60)
+    for module in ENTRY_POINTS:
+        check = eager_imports(module)
+        loaded = check["attempts"]
+        eager = [f"{module} eagerly imports {name} (from {location})" for name, location in sorted(loaded.items())]
+        if check["error"]:
+            # Nothing to time; an eager import of a missing dependency ends up here
+            print(f"\n❌ {module}: import failed: {check['error']}")
+            failures += eager + [f"import {module} failed: {check['error']}"]
+            continue
+
+        timings = [time_import(module) for _ in range(args.runs)]
+        median = statistics.median(timings)
+        status = "✅" if median <= args.budget and not loaded else "❌"
+        print(f"\n{status} {module}: median {median:.3f}s over {args.runs} runs (min {min(timings):.3f}s)")
+        for cumulative_us, name in slowest_modules(module):
+            print(f"     {cumulative_us / 1000:8.1f} ms  {name}")
+        if median > args.budget:
+            failures.append(f"{module} took {median:.3f}s (budget {args.budget}s)")
+        for name, location in sorted(loaded.items()):
+            print(f"     eagerly imported: {name} (from {location})")
+        failures += eager
+
+    print("\n" + "=" * 60)
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ All entry points within budget")
+
+
+if __name__ == "__main__":
+    main()
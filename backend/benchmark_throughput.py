@@ -0,0 +1,80 @@
+"""
+Offline throughput benchmark for extraction and chat.
+
+Usage:
+    python benchmark_throughput.py [--provider fake] [--concurrency 8] [--requests 200] [--latency-ms 200]
+
+Runs structuring and chat calls concurrently against an LLM provider (the
+deterministic fake provider by default, so no quota is used) and reports
+throughput and latency percentiles for each concurrency level.
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SAMPLE_PAGE = """CITY POWER & LIGHT
+Account 0042-1187-22    Statement date 2024-03-01    Due 2024-03-21
+Energy charge 612 kWh                      73.44
+Delivery charge                            21.10
+Taxes                                       7.64
+Total amount due                          102.18
+"""
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", default="fake", help="LLM provider (fake, gemini, openai)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=None, help="Fake provider latency")
+    args = parser.parse_args()
+
+    os.environ["LLM_PROVIDER"] = args.provider
+    if args.latency_ms is not None:
+        os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+
+    # Imported after the environment is set so settings pick up the provider
+    from ai_service import AIChatbot, AIDocumentExtractor
+
+    extractor = AIDocumentExtractor()
+    chatbot = AIChatbot()
+    workloads = {
+        "structuring": lambda i: extractor.structure_pages([f"{SAMPLE_PAGE}\nReference {i}"]),
+        "chat": lambda i: chatbot.answer_question(f"What is charge number {i}?", {"total_amount": 102.18}),
+    }
+
+    print("=" * 78)
+    print(f"{'Workload':<12} {'Conc.':>6} {'Req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Errors':>8}")
+    print("=" * 78)
+    for name, call in workloads.items():
+        for concurrency in args.concurrency:
+            latencies = []
+            errors = 0
+
+            def timed(i):
+                started = time.perf_counter()
+                result = call(i)
+                return time.perf_counter() - started, isinstance(result, dict) and "error" in result
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                for latency, failed in executor.map(timed, range(args.requests)):
+                    latencies.append(latency * 1000)
+                    errors += failed
+            elapsed = time.perf_counter() - started
+
+            print(
+                f"{name:<12} {concurrency:>6} {args.requests / elapsed:>9.1f} {statistics.median(latencies):>9.1f} "
+                f"{percentile(latencies, 0.95):>9.1f} {percentile(latencies, 0.99):>9.1f} {errors:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
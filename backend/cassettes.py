@@ -0,0 +1,173 @@
+"""
+Record/replay of model calls.
+
+A CassetteProvider wraps the configured LLMProvider and is installed with
+model_registry.set_provider, so every model call in the app goes through it
+unchanged. In 'record' mode calls reach the real provider and each request
+is saved with its response and latency in a JSON cassette; in 'replay' mode
+responses come from the cassette without any network access. 'auto' replays
+what the cassette has and records the rest.
+
+Requests are matched on method, model, generation config and contents, with
+file parts matched by the SHA-256 of their bytes, so a change to a prompt,
+to image preprocessing or to the model name misses the cassette (a
+CassetteMiss) instead of replaying a stale answer. A request made several
+times replays its recordings in order.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional
+from llm_providers import Contents, LLMProvider, _as_list
+
+CASSETTE_VERSION = 1
+MODES = ("record", "replay", "auto")
+
+
+class CassetteMiss(KeyError):
+    """A replayed request has no recording"""
+
+
+def _describe_part(part: Any) -> Any:
+    if isinstance(part, dict) and isinstance(part.get("data"), (bytes, bytearray)):
+        return {"mime_type": part.get("mime_type"), "sha256": hashlib.sha256(part["data"]).hexdigest()}
+    return part
+
+
+def request_key(method: str, model: Optional[str], payload: Any, generation_config: Optional[Dict[str, Any]] = None) -> str:
+    """Stable hash of a request; unserializable config values (schema types) count by their repr"""
+    if method in ("generate", "stream"):
+        payload = [_describe_part(part) for part in _as_list(payload)]
+        method = "generate"  # A streamed call replays a recorded generate and vice versa
+    canonical = json.dumps(
+        {"method": method, "model": model, "payload": payload, "config": generation_config},
+        sort_keys=True, default=repr, ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CassetteProvider(LLMProvider):
+    """LLMProvider that records the calls of another provider or replays them"""
+
+    def __init__(self, path: str, mode: str = "replay", inner: Optional[LLMProvider] = None,
+                 replay_latency: float = 0.0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}'. Use one of: {', '.join(MODES)}")
+        if mode != "replay" and inner is None:
+            raise ValueError(f"Cassette mode '{mode}' needs a provider to record from")
+        self.path = path
+        self.mode = mode
+        self.inner = inner
+        # Fraction of the recorded latency to wait when replaying (1 = as recorded)
+        self.replay_latency = replay_latency
+        self.name = f"cassette:{inner.name if inner else 'replay'}"
+        # Provider the recordings came from; tier model names, and so the requests, depend on it
+        self.recorded_provider = inner.name if inner else None
+        self.default_model = inner.default_model if inner else ""
+        self._recordings: Dict[str, List[Dict[str, Any]]] = {}
+        self._replayed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()  # Per method, replayed or not
+        self.recorded_seconds = 0.0
+        self.misses = 0  # Counted here too, callers may swallow the exception
+        self.dirty = False
+        if os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with open(self.path, encoding="utf-8") as file:
+            cassette = json.load(file)
+        if cassette.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"{self.path} is a version {cassette.get('version')} cassette, expected {CASSETTE_VERSION}")
+        if self.mode == "replay" or not self.recorded_provider:
+            self.recorded_provider = cassette.get("provider")
+        recordings: Dict[str, List[Dict[str, Any]]] = {}
+        for interaction in cassette.get("interactions", []):
+            recordings.setdefault(interaction["key"], []).append(interaction)
+        with self._lock:
+            self._recordings = recordings
+            self._replayed = {}
+
+    def save(self):
+        """Write the cassette (sorted, so re-recording gives a readable diff)"""
+        with self._lock:
+            interactions = [interaction for key in sorted(self._recordings) for interaction in self._recordings[key]]
+            self.dirty = False
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({"version": CASSETTE_VERSION, "provider": self.recorded_provider, "interactions": interactions},
+                      file, indent=1, ensure_ascii=False)
+            file.write("\n")
+        os.replace(temporary, self.path)
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls = Counter()
+            self.recorded_seconds = 0.0
+            self.misses = 0
+
+    def _call(self, method: str, key: str, summary: str, function):
+        with self._lock:
+            self.calls[method] += 1
+            recordings = self._recordings.get(key, [])
+            index = self._replayed.get(key, 0)
+            replay = self.mode == "replay" or (self.mode == "auto" and index < len(recordings))
+            if replay:
+                if not recordings:
+                    self.misses += 1
+                    raise CassetteMiss(f"No recording of {method} request {key[:12]} ({summary}) in {self.path}")
+                self._replayed[key] = index + 1
+                interaction = recordings[min(index, len(recordings) - 1)]
+                self.recorded_seconds += interaction["seconds"]
+        if replay:
+            if self.replay_latency:
+                time.sleep(interaction["seconds"] * self.replay_latency)
+            return interaction["response"]
+
+        started = time.perf_counter()
+        response = function()
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self._recordings.setdefault(key, []).append({
+                "key": key,
+                "method": method,
+                "request": summary,
+                "response": response,
+                "seconds": round(seconds, 4),
+            })
+            self._replayed[key] = self._replayed.get(key, 0) + 1
+            self.recorded_seconds += seconds
+            self.dirty = True
+        return response
+
+    def generate(self, contents: Contents, model: Optional[str] = None,
+                 generation_config: Optional[Dict[str, Any]] = None) -> str:
+        key = request_key("generate", model, contents, generation_config)
+        return self._call("generate", key, _summary(contents),
+                          lambda: self.inner.generate(contents, model=model, generation_config=generation_config))
+
+    def stream(self, contents: Contents, model: Optional[str] = None,
+               generation_config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        # Recorded whole; a replayed stream arrives as a single chunk
+        yield self.generate(contents, model=model, generation_config=generation_config)
+
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        key = request_key("count_tokens", model, text)
+        return self._call("count_tokens", key, _summary(text), lambda: self.inner.count_tokens(text, model=model))
+
+    def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        key = request_key("embed", task_type, texts)
+        return self._call("embed", key, _summary(texts), lambda: self.inner.embed(texts, task_type))
+
+
+def _summary(payload: Any, width: int = 80) -> str:
+    """Readable start of a request's text, to find it in the cassette"""
+    text = " ".join(part if isinstance(part, str) else f"[{part.get('mime_type', 'file')}]" for part in _as_list(payload))
+    text = " ".join(text.split())
+    return text if len(text) <= width else text[:width - 1] + "…"
@@ -0,0 +1,102 @@
+"""
+Compare single-pass and two-stage structured extraction.
+
+Usage:
+    python compare_extraction_modes.py [file ...]
+
+Runs both pipelines on each document (defaults to the upload directory) and
+reports latency, model round trips and how many fields agree.
+"""
+import argparse
+import os
+import time
+from typing import Any, Dict, Tuple
+from ai_service import document_extractor
+from config import settings
+
+IGNORED_FIELDS = {"error", "raw_text", "raw_response"}
+
+
+def normalize_value(value: Any) -> Any:
+    """Normalize a field value so cosmetic differences don't count as disagreement"""
+    if isinstance(value, str):
+        cleaned = value.strip().lower().replace(",", "")
+        for symbol in ("$", "€", "£", "₹"):
+            cleaned = cleaned.replace(symbol, "")
+        try:
+            return round(float(cleaned), 2)
+        except ValueError:
+            return " ".join(cleaned.split())
+    if isinstance(value, (int, float)):
+        return round(float(value), 2)
+    return value
+
+
+def field_agreement(first: Dict[str, Any], second: Dict[str, Any]) -> Tuple[int, int]:
+    """Count agreeing fields over the fields either pipeline found"""
+    fields = {
+        key for key in set(first) | set(second)
+        if key not in IGNORED_FIELDS and (first.get(key) is not None or second.get(key) is not None)
+    }
+    agreed = 0
+    for key in fields:
+        if key == "line_items":
+            agreed += len(first.get(key) or []) == len(second.get(key) or [])
+        else:
+            agreed += normalize_value(first.get(key)) == normalize_value(second.get(key))
+    return agreed, len(fields)
+
+
+def run(method, file_path: str, file_type: str) -> Tuple[Dict[str, Any], float]:
+    started = time.perf_counter()
+    result = method(file_path, file_type)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", help="Documents to compare (defaults to the upload directory)")
+    args = parser.parse_args()
+
+    files = args.files or [
+        os.path.join(settings.UPLOAD_DIR, name)
+        for name in sorted(os.listdir(settings.UPLOAD_DIR))
+        if name.lower().endswith(('.jpg', '.jpeg', '.png', '.pdf'))
+    ]
+    if not files:
+        print("⚠️  No documents to compare")
+        return
+
+    print("=" * 86)
+    print(f"{'Document':<34} {'Type':<6} {'2-stage s':>10} {'1-pass s':>10} {'Speedup':>8} {'Agreement':>12}")
+    print("=" * 86)
+
+    totals = {"two_stage": 0.0, "single_pass": 0.0, "agreed": 0, "fields": 0}
+    for file_path in files:
+        file_type = "pdf" if file_path.lower().endswith(".pdf") else "image"
+        two_stage, two_stage_seconds = run(document_extractor.extract_structured_data_two_stage, file_path, file_type)
+        single_pass, single_pass_seconds = run(document_extractor.extract_structured_data_single_pass, file_path, file_type)
+        agreed, fields = field_agreement(two_stage, single_pass)
+
+        totals["two_stage"] += two_stage_seconds
+        totals["single_pass"] += single_pass_seconds
+        totals["agreed"] += agreed
+        totals["fields"] += fields
+
+        errors = " ⚠️" if "error" in two_stage or "error" in single_pass else ""
+        print(
+            f"{os.path.basename(file_path)[:34]:<34} {file_type:<6} {two_stage_seconds:>10.2f} "
+            f"{single_pass_seconds:>10.2f} {two_stage_seconds / max(single_pass_seconds, 1e-6):>7.2f}x "
+            f"{agreed:>5}/{fields:<6}{errors}"
+        )
+
+    print("-" * 86)
+    print(f"Total latency: two-stage {totals['two_stage']:.2f}s, single-pass {totals['single_pass']:.2f}s")
+    if totals["fields"]:
+        print(f"Field agreement: {totals['agreed']}/{totals['fields']} "
+              f"({100 * totals['agreed'] / totals['fields']:.1f}%)")
+    print("Model calls per document: two-stage 1 + pages OCR'd, single-pass 1")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,14 +12,137 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
     
+    # LLM provider: 'gemini', 'openai' (any OpenAI-compatible server) or 'fake' (offline)
+    LLM_PROVIDER: str = "gemini"
+    
     # Google Gemini
     GOOGLE_API_KEY: str = ""
+    GEMINI_MODEL: str = "gemini-2.0-flash"
+    
+    # OpenAI-compatible server (e.g. a local vLLM/Ollama/llama.cpp endpoint)
+    OPENAI_BASE_URL: str = "http://localhost:11434/v1"
+    OPENAI_API_KEY: str = ""
+    OPENAI_MODEL: str = "llama3.2-vision"
+    OPENAI_EMBEDDING_MODEL: str = "nomic-embed-text"
+    OPENAI_TIMEOUT_SECONDS: float = 120
+    
+    # Model routing: tiers map to model names of the configured provider. A tier without
+    # an entry uses the provider's default model (GEMINI_MODEL, OPENAI_MODEL), so the
+    # default tier follows GEMINI_MODEL like OCR and token counting do.
+    ROUTING_ENABLED: bool = True
+    ROUTING_ESCALATE: bool = True  # Retry failed calls on the next stronger tier
+    MODEL_TIERS_BY_PROVIDER: dict = {
+        "gemini": {"fast": "gemini-2.0-flash-lite", "strong": "gemini-2.5-pro"},
+    }
+    MODEL_TIER_FAST: str = ""  # Overrides the provider's tier model when set
+    MODEL_TIER_DEFAULT: str = ""
+    MODEL_TIER_STRONG: str = ""
+    MODEL_PRICES_PER_MILLION: dict = {  # [input, output] USD per million tokens
+        "gemini-2.0-flash-lite": [0.075, 0.30],
+        "gemini-2.0-flash": [0.10, 0.40],
+        "gemini-2.5-pro": [1.25, 10.00],
+    }
+    ROUTING_SMALL_PAGES: int = 2
+    ROUTING_SMALL_TEXT_CHARS: int = 6000
+    ROUTING_CHAT_SIMPLE_WORDS: int = 20
+    ROUTING_CHAT_MAX_LINE_ITEMS: int = 40
+    ROUTING_FAILURE_WINDOW: int = 50  # Recent calls per route used to detect failing routes
+    ROUTING_FAILURE_MIN_SAMPLES: int = 10
+    ROUTING_FAILURE_THRESHOLD: float = 0.2  # Start a route one tier higher above this failure rate
+    
+    # Fake provider (offline load tests and benchmarks)
+    FAKE_LLM_LATENCY_MS: float = 200
+    FAKE_LLM_TOKENS_PER_SECOND: float = 0  # 0 streams instantly after the initial latency
     
     # Application
     DEBUG: bool = True
     UPLOAD_DIR: str = "./uploads"
     MAX_UPLOAD_SIZE: int = 10485760  # 10MB
     
+    # Resumable uploads (/api/documents/uploads)
+    RESUMABLE_UPLOAD_MAX_SIZE: int = 104857600  # 100MB
+    UPLOAD_CHUNK_SIZE: int = 5242880  # 5MB, used when the client does not choose one
+    UPLOAD_MIN_CHUNK_SIZE: int = 262144  # 256KB
+    UPLOAD_MAX_CHUNK_SIZE: int = 16777216  # 16MB
+    UPLOAD_SESSION_TTL_SECONDS: int = 86400  # Unfinished uploads are removed after this
+    
+    # PDF processing
+    PDF_PARSE_WORKERS: int = 2
+    PDF_PAGE_MIN_TEXT_CHARS: int = 25  # Pages with less text are OCR'd
+    
+    # Thumbnails and page previews (PDF pages need pypdfium2)
+    PREVIEW_THUMBNAIL_EDGE: int = 240  # Longest edge in pixels
+    PREVIEW_PAGE_EDGE: int = 1000
+    PREVIEW_MAX_PAGES: int = 50  # Later pages are only in the original
+    PREVIEW_WEBP_QUALITY: int = 60
+    PREVIEW_CACHE_SECONDS: int = 604800  # Browsers reuse previews this long without asking
+    
+    # Image normalization before model calls
+    IMAGE_MAX_EDGE: int = 1600  # Longest edge in pixels, 0 disables resizing
+    IMAGE_GRAYSCALE: bool = True
+    IMAGE_JPEG_QUALITY: int = 80
+    
+    # File types ('image', 'pdf') structured in one model call instead of OCR + structuring
+    SINGLE_PASS_FILE_TYPES: list = ["image"]
+    
+    # Structuring responses
+    STRUCTURING_MAX_OUTPUT_TOKENS: int = 8192
+    STRUCTURING_MAX_RESPONSE_CHARS: int = 200000  # Stop reading and repair beyond this size
+    STRUCTURING_CHUNK_TOKENS: int = 12000  # Longer texts are structured in page-aligned chunks
+    STRUCTURING_MAX_PARALLEL: int = 4
+    
+    # Bulk export
+    EXPORT_BATCH_SIZE: int = 500  # Rows fetched per server-side cursor batch
+    
+    # Chat answer cache
+    ANSWER_CACHE_MAX_ENTRIES: int = 5000
+    ANSWER_CACHE_TTL_SECONDS: int = 86400
+    ANSWER_CACHE_FUZZY_THRESHOLD: float = 0.92  # Similarity for near-duplicate questions, 0 disables
+    
+    # Cross-document retrieval
+    EMBEDDING_MODEL: str = "models/text-embedding-004"
+    RETRIEVAL_CHUNK_CHARS: int = 1000
+    RETRIEVAL_MAX_CHUNKS_PER_DOCUMENT: int = 64
+    RETRIEVAL_CACHED_USERS: int = 256  # Per-user embedding matrices kept in memory
+    RETRIEVAL_BACKFILL_LIMIT: int = 20  # Older documents indexed per query
+    
+    # Background removal of deleted documents' files
+    FILE_PURGE_MAX_ATTEMPTS: int = 5
+    FILE_PURGE_RETRY_SECONDS: float = 2  # Doubles after each failed attempt
+    
+    # Storage sweeper (storage_gc.py)
+    STORAGE_GC_INTERVAL_SECONDS: int = 21600  # 0 disables scheduled sweeps
+    STORAGE_GC_GRACE_SECONDS: int = 3600  # Younger files and documents are never swept
+    STORAGE_GC_BATCH_SIZE: int = 500
+    STORAGE_GC_MAX_DELETES_PER_SECOND: float = 50
+    RETENTION_DAYS_BY_STATUS: dict = {"failed": 30}  # Delete documents with this status after N days
+    RETENTION_DAYS_BY_USER: dict = {}  # {user_id: days} for all of a user's documents
+    CHAT_ARCHIVE_DAYS: int = 365  # Move older chat messages to chat_messages_archive, 0 disables
+    CHAT_PARTITION_MONTHS_AHEAD: int = 3  # Monthly chat_messages partitions created in advance (PostgreSQL)
+    
+    # Response compression (brotli when installed, otherwise gzip)
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # Smaller responses are sent as is
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # Higher levels cost too much CPU for dynamic responses
+    
+    # Production server (serve.py)
+    WEB_HOST: str = "0.0.0.0"
+    WEB_PORT: int = 8000
+    WEB_WORKERS: int = 0  # 0 sizes the worker count from the CPUs available to the container
+    WEB_MAX_WORKERS: int = 8
+    WEB_GRACEFUL_TIMEOUT: int = 120  # Seconds a worker gets after SIGTERM to finish requests and extractions
+    WEB_KEEPALIVE: int = 75  # Keep longer than the load balancer's idle timeout
+    WEB_MAX_REQUESTS: int = 2000  # Recycle workers periodically to cap memory growth, 0 disables
+    
+    # Recovery of interrupted document processing
+    RECOVERY_INTERVAL_SECONDS: int = 60  # 0 disables
+    RECOVERY_STALE_SECONDS: int = 900  # Pending/processing documents untouched this long are reprocessed
+    # Single-host setups only: documents left over from before this launch are reprocessed at once
+    # instead of after RECOVERY_STALE_SECONDS. Unsafe with several instances, it would take over their work
+    RECOVERY_SINGLE_INSTANCE: bool = False
+    RECOVERY_MAX_ATTEMPTS: int = 3
+    RECOVERY_WORKERS: int = 2
+    
     # CORS
     CORS_ORIGINS: list = ["http://localhost:3000", "http://127.0.0.1:3000"]
     
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
@@ -17,6 +17,71 @@ def get_db():
         db.close()
 
 
+# Columns added to existing tables after their first release: (table, column, DDL type).
+# create_all only creates missing tables, so these are added in place when absent.
+SCHEMA_UPGRADES = [
+    ("documents", "processing_attempts", "INTEGER NOT NULL DEFAULT 0"),
+    ("extracted_data", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ("documents", "preview_pages", "INTEGER"),
+    ("documents", "processing_stage", "VARCHAR(20)"),
+    ("documents", "processing_progress", "INTEGER"),
+    ("extracted_data", "provisional", "BOOLEAN NOT NULL DEFAULT FALSE"),
+    ("documents", "indexed_at", "TIMESTAMP WITH TIME ZONE"),
+]
+
+
+def upgrade_schema():
+    """Bring tables created by an older version up to date with the models"""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table, column, ddl in SCHEMA_UPGRADES:
+            if not inspector.has_table(table):
+                continue
+            if column not in {existing["name"] for existing in inspector.get_columns(table)}:
+                connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+                print(f"Added column {table}.{column}")
+
+    # Indexes declared on existing tables
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    if engine.dialect.name != "sqlite":  # SQLite cannot alter constraints
+        _upgrade_foreign_keys(inspector)
+
+
+def _upgrade_foreign_keys(inspector):
+    """Recreate foreign keys whose ON DELETE action differs from the model"""
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            wanted = {fk.parent.name: fk for fk in table.foreign_keys if fk.ondelete}
+            if not wanted or not inspector.has_table(table.name):
+                continue
+            for existing in inspector.get_foreign_keys(table.name):
+                columns = existing["constrained_columns"]
+                fk = wanted.get(columns[0]) if len(columns) == 1 else None
+                if fk is None or (existing.get("options", {}).get("ondelete") or "").upper() == fk.ondelete.upper():
+                    continue
+                name = existing["name"]
+                connection.execute(text(
+                    f"ALTER TABLE {table.name} DROP CONSTRAINT {name}, "
+                    f"ADD CONSTRAINT {name} FOREIGN KEY ({fk.parent.name}) "
+                    f"REFERENCES {fk.column.table.name} ({fk.column.name}) ON DELETE {fk.ondelete}"
+                ))
+                print(f"Foreign key {table.name}.{fk.parent.name} now ON DELETE {fk.ondelete}")
+
+
 def init_db():
     """Initialize database tables"""
+    import partitions
+
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+    if not partitions.enabled():
+        return
+    # Partition maintenance runs again on every storage sweep; it must not stop the app starting
+    try:
+        if not partitions.ensure_chat_partitions():
+            print("chat_messages is not partitioned; run 'python partitions.py migrate' during maintenance")
+    except Exception as e:
+        print(f"⚠️  Chat partition maintenance failed: {e}")
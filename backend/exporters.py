@@ -0,0 +1,226 @@
+"""
+Streaming bulk export of extracted data.
+
+Documents are read from the database in server-side cursor batches and
+written out incrementally, so exporting a year of bills uses constant
+memory. Flat formats (CSV, Parquet, XLSX) get one row per line item with the
+document's header fields repeated; NDJSON keeps one nested record per line.
+"""
+import csv
+import json
+import tempfile
+from datetime import datetime
+from io import StringIO
+from typing import Any, Dict, Iterator, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from models import Document, ExtractedData
+from schemas import BillData, LineItem, parse_amount
+from config import settings
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+DOCUMENT_COLUMNS = ["document_id", "filename", "status", "uploaded_at"]
+HEADER_FIELDS = [name for name in BillData.model_fields if name != "line_items"]
+LINE_ITEM_FIELDS = list(LineItem.model_fields)
+LINE_ITEM_COLUMNS = ["line_item_index"] + [f"line_item_{name}" for name in LINE_ITEM_FIELDS]
+EXPORT_COLUMNS = DOCUMENT_COLUMNS + HEADER_FIELDS + LINE_ITEM_COLUMNS
+
+NUMERIC_COLUMNS = {
+    name for name, field in BillData.model_fields.items() if field.annotation == Optional[float]
+} | {
+    f"line_item_{name}" for name, field in LineItem.model_fields.items() if field.annotation == Optional[float]
+}
+
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def check_export_format(format: str) -> Optional[str]:
+    """Return an error message if the format is unknown or its writer isn't installed"""
+    if format not in EXPORT_FORMATS:
+        return f"Invalid format. Use one of: {', '.join(EXPORT_FORMATS)}"
+    try:
+        if format == "parquet":
+            import pyarrow  # noqa: F401
+        elif format == "xlsx":
+            import openpyxl  # noqa: F401
+    except ImportError:
+        return f"{format} export requires {'pyarrow' if format == 'parquet' else 'openpyxl'} to be installed"
+    return None
+
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input matches literally (with escape="\\")"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def build_export_query(
+    db: Session,
+    user_id: int,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    vendor: Optional[str] = None,
+    status: Optional[str] = None
+):
+    """Query (document, extracted data) pairs matching the export filter"""
+    # A 2.0-style select: the legacy Query uniques multi-entity rows, which
+    # cannot be combined with yield_per
+    query = select(Document, ExtractedData).outerjoin(
+        ExtractedData, ExtractedData.document_id == Document.id
+    ).where(Document.user_id == user_id)
+
+    if date_from:
+        query = query.where(Document.created_at >= date_from)
+    if date_to:
+        query = query.where(Document.created_at < date_to)
+    if status:
+        query = query.where(Document.status == status)
+    if vendor:
+        query = query.where(
+            ExtractedData.data["vendor_name"].as_string().ilike(f"%{escape_like(vendor)}%", escape="\\")
+        )
+
+    return query.order_by(Document.id).execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+
+
+def iter_documents(query_factory) -> Iterator[Dict[str, Any]]:
+    """
+    Yield one nested record per document from a server-side cursor.
+
+    The export owns its session: the request's session is closed before a
+    streaming response starts sending.
+    """
+    db = SessionLocal()
+    try:
+        for document, extracted in db.execute(query_factory(db)):
+            yield {
+                "document_id": document.id,
+                "filename": document.filename,
+                "status": document.status,
+                "uploaded_at": document.created_at.isoformat() if document.created_at else None,
+                "data": extracted.data if extracted else None,
+            }
+    finally:
+        db.close()
+
+
+def _scalar(value: Any, numeric: bool) -> Any:
+    if value is None:
+        return None
+    if numeric:
+        amount = parse_amount(value)
+        return amount if isinstance(amount, (int, float)) else None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def flatten_document(record: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Yield one flat row per line item (or a single row without line items)"""
+    data = record["data"] if isinstance(record["data"], dict) else {}
+    base = {column: record[column] for column in DOCUMENT_COLUMNS}
+    for field in HEADER_FIELDS:
+        base[field] = _scalar(data.get(field), field in NUMERIC_COLUMNS)
+
+    line_items = data.get("line_items")
+    if not isinstance(line_items, list) or not line_items:
+        yield {**base, **{column: None for column in LINE_ITEM_COLUMNS}}
+        return
+
+    for index, item in enumerate(line_items, start=1):
+        if not isinstance(item, dict):
+            item = {"description": item}
+        row = {**base, "line_item_index": index}
+        for name in LINE_ITEM_FIELDS:
+            column = f"line_item_{name}"
+            row[column] = _scalar(item.get(name), column in NUMERIC_COLUMNS)
+        yield row
+
+
+def _iter_row_batches(records: Iterator[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for record in records:
+        batch.extend(flatten_document(record))
+        if len(batch) >= settings.EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_csv(records: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    output = StringIO()
+    writer = csv.DictWriter(output, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for batch in _iter_row_batches(records):
+        writer.writerows(batch)
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate()
+    yield output.getvalue()
+
+
+def stream_ndjson(records: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record, default=str))
+        if len(lines) >= settings.EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def _stream_file(file) -> Iterator[bytes]:
+    file.seek(0)
+    try:
+        while chunk := file.read(FILE_CHUNK_SIZE):
+            yield chunk
+    finally:
+        file.close()
+
+
+def stream_parquet(records: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    """Write one Parquet row group per batch to a temporary file, then stream it"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (column, pa.float64() if column in NUMERIC_COLUMNS else
+         pa.int64() if column in ("document_id", "line_item_index") else pa.string())
+        for column in EXPORT_COLUMNS
+    ])
+    spool = tempfile.TemporaryFile()
+    with pq.ParquetWriter(spool, schema, compression="zstd") as writer:
+        for batch in _iter_row_batches(records):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+    yield from _stream_file(spool)
+
+
+def stream_xlsx(records: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    """Write rows with openpyxl's write-only (streaming) workbook, then stream it"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Extracted data")
+    sheet.append(EXPORT_COLUMNS)
+    for batch in _iter_row_batches(records):
+        for row in batch:
+            sheet.append([row[column] for column in EXPORT_COLUMNS])
+    spool = tempfile.TemporaryFile()
+    workbook.save(spool)
+    yield from _stream_file(spool)
+
+
+STREAMERS = {
+    "csv": stream_csv,
+    "ndjson": stream_ndjson,
+    "parquet": stream_parquet,
+    "xlsx": stream_xlsx,
+}
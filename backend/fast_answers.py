@@ -0,0 +1,135 @@
+"""
+Deterministic answers for direct field lookups.
+
+Many chat turns just ask for a value that already sits in the extracted
+data ("what is the total?", "when is it due?"). answer_locally recognizes
+those questions, plus a few simple computations, and answers them from the
+stored JSON. Anything it is not sure about returns None so the question
+goes to the model.
+"""
+import re
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from schemas import parse_amount
+
+# Questions asking for reasoning or comparison always go to the model
+_COMPLEX = re.compile(
+    r"\b(why|explain|compare|comparison|should|could|would|if|analy[sz]e|summar|breakdown|"
+    r"difference|trend|average|percent|higher|lower|more than|less than|correct|wrong)\b"
+)
+_MAX_WORDS = 14
+
+DATE_FORMATS = [
+    "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%m-%d-%Y", "%d.%m.%Y",
+    "%B %d, %Y", "%b %d, %Y", "%d %B %Y", "%d %b %Y", "%B %d %Y", "%b %d %Y",
+]
+
+
+def _money(data: Dict[str, Any], value: Any) -> Optional[str]:
+    amount = parse_amount(value)
+    if not isinstance(amount, (int, float)):
+        return None
+    currency = data.get("currency")
+    return f"{currency} {amount:,.2f}" if currency else f"{amount:,.2f}"
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """Parse the date formats commonly found on bills"""
+    if not isinstance(value, str):
+        return None
+    cleaned = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(cleaned, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _field_answer(field: str, label: str, money: bool = False) -> Callable[[Dict[str, Any]], Optional[str]]:
+    def answer(data: Dict[str, Any]) -> Optional[str]:
+        value = data.get(field)
+        if value in (None, "", []):
+            return None
+        if money:
+            formatted = _money(data, value)
+            return f"The {label} is {formatted}." if formatted else None
+        return f"The {label} is {value}."
+    return answer
+
+
+def _line_item_sum(data: Dict[str, Any]) -> Optional[str]:
+    items = data.get("line_items")
+    if not isinstance(items, list) or not items:
+        return None
+    amounts = [parse_amount(item.get("amount")) for item in items if isinstance(item, dict)]
+    if len(amounts) != len(items) or not all(isinstance(amount, (int, float)) for amount in amounts):
+        return None
+    return f"The {len(items)} line items add up to {_money(data, sum(amounts))}."
+
+
+def _line_item_count(data: Dict[str, Any]) -> Optional[str]:
+    items = data.get("line_items")
+    if not isinstance(items, list):
+        return None
+    return f"The document has {len(items)} line item{'s' if len(items) != 1 else ''}."
+
+
+def _days_until_due(data: Dict[str, Any]) -> Optional[str]:
+    due = parse_date(data.get("due_date"))
+    if due is None:
+        return None
+    days = (due - date.today()).days
+    if days > 0:
+        return f"The bill is due in {days} day{'s' if days != 1 else ''} ({data['due_date']})."
+    if days == 0:
+        return f"The bill is due today ({data['due_date']})."
+    return f"The due date ({data['due_date']}) passed {-days} day{'s' if days != -1 else ''} ago."
+
+
+# Totals of things other than money ("total kWh", "total usage") are left to the model
+_NOT_MONEY = r"(?!.*\b(kwh|kw|usage|consumption|units?|items?|number of|how many|gallons|litres|liters|therms|minutes|hours|gb|mb|data)\b)"
+
+# (name, pattern, handler, broader intents it refines). A question may match
+# a specific intent and the broader ones it refines ("subtotal" also says
+# "total"); matching anything else as well makes it ambiguous.
+INTENTS: List[Tuple[str, re.Pattern, Callable[[Dict[str, Any]], Optional[str]], Tuple[str, ...]]] = [
+    ("days_until_due", re.compile(r"\bhow (many|much) (days|time)\b.*\b(due|left|until|till|before)\b|\bdays (left|until|till|before)\b"), _days_until_due, ("due_date",)),
+    ("line_item_sum", re.compile(r"\b(sum|add up|adds up|total(?! number))\b.*\b(line )?items\b|\bline items?\b.*\b(sum|add up|total)\b"), _line_item_sum, ("total_amount",)),
+    ("line_item_count", re.compile(r"\bhow many (line )?items\b|\bnumber of (line )?items\b"), _line_item_count, ()),
+    ("subtotal", re.compile(r"\bsub ?total\b|\b(before|excluding|excl|without|pre)[ -]?(tax|vat|gst)\b"), _field_answer("subtotal", "subtotal", money=True), ("tax_amount", "total_amount")),
+    ("tax_amount", re.compile(r"\b(tax|vat|gst|sales tax)\b"), _field_answer("tax_amount", "tax amount", money=True), ()),
+    ("due_date", re.compile(r"\bdue date\b|\bwhen\b.*\bdue\b|\bdeadline\b|\bpay (it )?by\b"), _field_answer("due_date", "due date"), ()),
+    ("total_amount", re.compile(_NOT_MONEY + r".*(\btotal\b|\bamount due\b|\bhow much\b.*\b(owe|pay|paid|cost|charged|bill)\b|\bbalance\b)"), _field_answer("total_amount", "total amount", money=True), ()),
+    ("document_number", re.compile(r"\b(invoice|bill|receipt|document|reference)\s*(number|no|num|#)"), _field_answer("document_number", "document number"), ()),
+    ("account_number", re.compile(r"\baccount (number|no|num|#)"), _field_answer("account_number", "account number"), ()),
+    ("vendor_name", re.compile(r"\bvendor\b|\bmerchant\b|\bbiller\b|\bcompany\b|\bwho\b.*\b(from|issued|sent|bill)\b|\bwhich (store|shop|company)\b"), _field_answer("vendor_name", "vendor"), ()),
+    ("vendor_address", re.compile(r"\b(vendor|company|merchant|store)?\s*address\b"), _field_answer("vendor_address", "vendor address"), ("vendor_name",)),
+    ("payment_method", re.compile(r"\bpayment method\b|\bhow (was it|did i) pa(id|y)\b|\bpaid (with|by)\b"), _field_answer("payment_method", "payment method"), ("total_amount",)),
+    ("currency", re.compile(r"\bcurrency\b"), _field_answer("currency", "currency"), ()),
+    ("date", re.compile(r"\b(bill|invoice|document|receipt|issue) date\b|\bwhat date\b|\bwhen was (it|this)\b.*\b(issued|dated|billed)\b"), _field_answer("date", "document date"), ()),
+]
+
+
+def detect_intent(question: str) -> Optional[Tuple[str, Callable[[Dict[str, Any]], Optional[str]]]]:
+    """Return the direct-lookup intent for a question, if it is exactly one"""
+    normalized = " ".join(question.lower().replace("?", " ").split())
+    if len(normalized.split()) > _MAX_WORDS or _COMPLEX.search(normalized):
+        return None
+    matched = [(name, handler, refines) for name, pattern, handler, refines in INTENTS if pattern.search(normalized)]
+    refined = {name for _, _, refines in matched for name in refines}
+    matched = [(name, handler) for name, handler, _ in matched if name not in refined]
+    # "What is the tax on the total?" could mean either; let the model read it
+    if len(matched) != 1:
+        return None
+    return matched[0]
+
+
+def answer_locally(question: str, data: Dict[str, Any]) -> Optional[str]:
+    """Answer a direct lookup from the extracted data, or None to use the model"""
+    if not isinstance(data, dict):
+        return None
+    intent = detect_intent(question)
+    if intent is None:
+        return None
+    return intent[1](data)
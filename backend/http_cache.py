@@ -0,0 +1,198 @@
+"""
+Response compression and conditional GET support.
+
+CompressionMiddleware negotiates brotli (when the brotli package is
+installed) or gzip from Accept-Encoding and compresses responses above a
+size threshold, streaming ones included. Media types that are already
+compressed (images, PDFs, Parquet, XLSX) and event streams pass through.
+
+The ETag helpers let read endpoints answer repeat loads with 304 Not
+Modified, using validators derived from the rows' updated_at timestamps.
+"""
+import hashlib
+import zlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+UNCOMPRESSIBLE_PREFIXES = (
+    "image/",
+    "video/",
+    "audio/",
+    "text/event-stream",
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/vnd.apache.parquet",
+    "application/vnd.openxmlformats",
+)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, honouring q=0"""
+    accepted: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=brotli_quality)
+            self.compress, self.finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+            self.compress, self.finish = compressor.compress, compressor.flush
+
+
+class CompressionMiddleware:
+    """ASGI middleware for negotiated brotli/gzip compression"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                media_type = headers.get("content-type", "")
+                if (
+                    "content-encoding" in headers
+                    or media_type.startswith(UNCOMPRESSIBLE_PREFIXES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if "etag" in headers and not headers["etag"].startswith("W/"):
+                    # The compressed bytes differ from what a strong ETag describes
+                    headers["ETag"] = "W/" + headers["etag"]
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = compressor.compress(body) + compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def make_etag(*parts) -> str:
+    """Weak ETag from the values that identify a representation's version"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    """Validators plus a policy that makes browsers revalidate on every load"""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """
+    Whether an If-None-Match / If-Match header lists the ETag. The W/ prefix
+    is ignored because compression weakens ETags the handler set as strong.
+    """
+    candidates = [tag.strip() for tag in header.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return "*" in candidates or any((tag[2:] if tag.startswith("W/") else tag) == bare for tag in candidates)
+
+
+def precondition_failed(request: Request, etag: str) -> bool:
+    """True when the request has an If-Match header that does not match the current ETag"""
+    if_match = request.headers.get("if-match")
+    return if_match is not None and not etag_matches(if_match, etag)
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the current validators"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second resolution
+        return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+    return False
+
+
+def conditional(request: Request, etag: str, last_modified: Optional[datetime]) -> Tuple[Optional[Response], Dict[str, str]]:
+    """Return (304 response or None, headers to attach to the full response)"""
+    headers = cache_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers), headers
+    return None, headers
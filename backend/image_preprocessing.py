@@ -0,0 +1,57 @@
+"""
+Image normalization applied before images are sent to the model.
+
+Phone photos and high-dpi page renders are far larger than the model needs
+to read a bill. Normalizing them (EXIF orientation, bounded size, grayscale,
+compact JPEG) cuts upload payload and latency without hurting OCR quality.
+"""
+import io
+from typing import TYPE_CHECKING, Dict, Any
+from config import settings
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+def normalize_image(image: "Image.Image") -> "Image.Image":
+    """Return an auto-oriented, downsized and (optionally) grayscale copy of an image"""
+    from PIL import Image, ImageOps
+
+    normalized = ImageOps.exif_transpose(image)
+    if normalized is image:
+        normalized = image.copy()
+
+    max_edge = settings.IMAGE_MAX_EDGE
+    if max_edge and max(normalized.size) > max_edge:
+        normalized.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    target_mode = "L" if settings.IMAGE_GRAYSCALE else "RGB"
+    if normalized.mode != target_mode:
+        converted = normalized.convert(target_mode)
+        normalized.close()
+        normalized = converted
+    return normalized
+
+
+def encode_image(image: "Image.Image") -> Dict[str, Any]:
+    """Encode an image as a compact JPEG blob accepted by the model"""
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=settings.IMAGE_JPEG_QUALITY, optimize=True)
+    return {"mime_type": "image/jpeg", "data": output.getvalue()}
+
+
+def image_to_part(image: "Image.Image") -> Dict[str, Any]:
+    """Normalize and encode an already opened image"""
+    normalized = normalize_image(image)
+    try:
+        return encode_image(normalized)
+    finally:
+        normalized.close()
+
+
+def load_image_part(image_path: str) -> Dict[str, Any]:
+    """Open, normalize and encode an image file, closing every handle"""
+    from PIL import Image
+
+    with Image.open(image_path) as image:
+        return image_to_part(image)
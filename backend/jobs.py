@@ -0,0 +1,168 @@
+"""
+Background document processing: in-flight tracking, graceful draining and
+recovery of interrupted work.
+
+Every process_document run is tracked so a worker that receives SIGTERM can
+wait for extractions to finish before exiting. Documents whose processing
+was cut short anyway (killed worker, crashed host) are left in 'pending' or
+'processing'; a recovery thread in each worker claims them with
+FOR UPDATE SKIP LOCKED, so several workers never pick up the same document,
+and processes them again up to RECOVERY_MAX_ATTEMPTS times.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, Optional
+from sqlalchemy import func
+from config import settings
+from database import SessionLocal
+from metrics import metrics
+from models import Document
+from storage import upload_path
+
+# serve.py exports the launcher's start time so every worker agrees on which
+# documents were left over from the previous run
+STARTED_AT = datetime.fromtimestamp(float(os.environ.get("APP_STARTED_AT", time.time())), tz=timezone.utc)
+
+
+class JobTracker:
+    """Counts in-flight background jobs and waits for them on shutdown"""
+
+    def __init__(self):
+        self._active: dict = {}
+        self._condition = threading.Condition()
+        self.draining = False
+
+    @contextmanager
+    def track(self, document_id: int):
+        with self._condition:
+            self._active[document_id] = self._active.get(document_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active[document_id] -= 1
+                if not self._active[document_id]:
+                    del self._active[document_id]
+                self._condition.notify_all()
+
+    def active(self) -> List[int]:
+        """Document ids currently being processed"""
+        with self._condition:
+            return list(self._active)
+
+    def drain(self, timeout: float) -> List[int]:
+        """Stop taking recovered work and wait for running jobs; returns the ids still running"""
+        self.draining = True
+        deadline = time.monotonic() + max(timeout, 0)
+        with self._condition:
+            while self._active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return list(self._active)
+
+
+jobs = JobTracker()
+
+_recovery_pool: Optional[ThreadPoolExecutor] = None
+_recovery_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def claim_interrupted_documents(limit: int) -> List[Document]:
+    """Claim documents whose processing was interrupted and mark them pending again"""
+    now = datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=settings.RECOVERY_STALE_SECONDS)
+    if settings.RECOVERY_SINGLE_INSTANCE:
+        # Nothing from before this launch can still be running anywhere
+        cutoff = max(cutoff, STARTED_AT)
+    last_touched = func.coalesce(Document.updated_at, Document.created_at)
+    running_here = jobs.active()
+
+    db = SessionLocal()
+    try:
+        candidates = (
+            db.query(Document)
+            .filter(
+                Document.status.in_(["pending", "processing"]),
+                last_touched < cutoff,
+                Document.id.notin_(running_here)
+            )
+            .order_by(Document.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        claimed = []
+        for document in candidates:
+            if (document.processing_attempts or 0) >= settings.RECOVERY_MAX_ATTEMPTS:
+                print(f"Document {document.id} failed after {document.processing_attempts} attempts, giving up")
+                document.status = "failed"
+                metrics.increment("jobs.abandoned")
+                continue
+            document.status = "pending"
+            document.updated_at = now
+            claimed.append(document)
+        db.commit()
+        for document in claimed:
+            db.refresh(document)
+            db.expunge(document)
+        return claimed
+    finally:
+        db.close()
+
+
+def recover_once(process: Callable[[int, str, str], None]) -> int:
+    """Queue interrupted documents for processing; returns how many were claimed"""
+    if jobs.draining:
+        return 0
+    free_slots = settings.RECOVERY_WORKERS - len(jobs.active())
+    if free_slots <= 0:
+        return 0
+    claimed = claim_interrupted_documents(free_slots)
+    for document in claimed:
+        print(f"Recovering document {document.id} (attempt {(document.processing_attempts or 0) + 1})")
+        metrics.increment("jobs.recovered")
+        _recovery_pool.submit(process, document.id, upload_path(document.file_path), document.file_type)
+    return len(claimed)
+
+
+def _recovery_loop(process: Callable[[int, str, str], None]):
+    while not _stop.is_set():
+        try:
+            recover_once(process)
+        except Exception as e:
+            print(f"Error recovering documents: {e}")
+        _stop.wait(settings.RECOVERY_INTERVAL_SECONDS)
+
+
+def start_recovery(process: Callable[[int, str, str], None]):
+    """Start the recovery thread for this worker (called on application startup)"""
+    global _recovery_pool, _recovery_thread
+    if settings.RECOVERY_INTERVAL_SECONDS <= 0 or _recovery_thread is not None:
+        return
+    _stop.clear()
+    _recovery_pool = ThreadPoolExecutor(max_workers=settings.RECOVERY_WORKERS, thread_name_prefix="recovery")
+    _recovery_thread = threading.Thread(target=_recovery_loop, args=(process,), name="recovery", daemon=True)
+    _recovery_thread.start()
+
+
+def shutdown_jobs(timeout: float):
+    """Stop recovery and wait up to timeout seconds for in-flight processing"""
+    global _recovery_pool, _recovery_thread
+    _stop.set()
+    unfinished = jobs.drain(timeout)
+    if unfinished:
+        # Left in 'processing'; the next launch recovers them
+        print(f"Shutdown timeout with documents still processing: {unfinished}")
+    else:
+        print("All background processing finished")
+    if _recovery_pool is not None:
+        _recovery_pool.shutdown(wait=False, cancel_futures=True)
+        _recovery_pool = None
+    _recovery_thread = None
@@ -0,0 +1,155 @@
+"""
+RFC 6902 JSON Patch for extracted data edits.
+
+Patches are applied copy-on-write: the input document is never mutated and
+only the objects and arrays along each patched path are copied, so editing
+one field of an invoice with hundreds of line items copies a handful of
+containers instead of the whole blob. SQLAlchemy then sees a new value for
+the JSON column and writes it.
+"""
+from typing import Any, Dict, List, Tuple
+
+OPERATIONS = {"add", "remove", "replace", "move", "copy", "test"}
+
+
+class JSONPatchError(ValueError):
+    """The patch is malformed or does not apply to the document"""
+
+
+class JSONPatchTestFailed(JSONPatchError):
+    """A 'test' operation did not match"""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """Split an RFC 6901 JSON pointer into unescaped tokens"""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise JSONPatchError(f"Invalid JSON pointer '{pointer}'")
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _index(container: list, token: str, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (token != "0" and token.startswith("0")):
+        raise JSONPatchError(f"Invalid array index '{token}'")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JSONPatchError(f"Array index {index} out of range")
+    return index
+
+
+def _child(container: Any, token: str) -> Any:
+    if isinstance(container, dict):
+        if token not in container:
+            raise JSONPatchError(f"Path segment '{token}' not found")
+        return container[token]
+    if isinstance(container, list):
+        return container[_index(container, token, allow_end=False)]
+    raise JSONPatchError(f"Cannot descend into a scalar at '{token}'")
+
+
+def resolve(document: Any, tokens: List[str]) -> Any:
+    """Value at a parsed pointer"""
+    for token in tokens:
+        document = _child(document, token)
+    return document
+
+
+def _copy_path(document: Any, tokens: List[str]) -> Tuple[Any, Any]:
+    """Shallow-copy the containers from the root down to the parent of the target"""
+    root = _shallow_copy(document)
+    parent = root
+    for token in tokens[:-1]:
+        child = _shallow_copy(_child(parent, token))
+        if isinstance(parent, dict):
+            parent[token] = child
+        else:
+            parent[_index(parent, token, allow_end=False)] = child
+        parent = child
+    return root, parent
+
+
+def _shallow_copy(value: Any) -> Any:
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return list(value)
+    raise JSONPatchError("Path does not point into an object or array")
+
+
+def _add(document: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    root, parent = _copy_path(document, tokens)
+    if isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    else:
+        parent.insert(_index(parent, tokens[-1], allow_end=True), value)
+    return root
+
+
+def _remove(document: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise JSONPatchError("Cannot remove the whole document")
+    root, parent = _copy_path(document, tokens)
+    if isinstance(parent, dict):
+        if tokens[-1] not in parent:
+            raise JSONPatchError(f"Path segment '{tokens[-1]}' not found")
+        del parent[tokens[-1]]
+    else:
+        del parent[_index(parent, tokens[-1], allow_end=False)]
+    return root
+
+
+def _replace(document: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    resolve(document, tokens)  # must exist
+    root, parent = _copy_path(document, tokens)
+    if isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    else:
+        parent[_index(parent, tokens[-1], allow_end=False)] = value
+    return root
+
+
+def apply_patch(document: Any, operations: List[Dict[str, Any]]) -> Any:
+    """Apply a JSON Patch atomically and return the new document"""
+    if not isinstance(operations, list):
+        raise JSONPatchError("A JSON Patch must be an array of operations")
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get("op") not in OPERATIONS or "path" not in operation:
+            raise JSONPatchError(f"Invalid operation {operation!r}")
+        op = operation["op"]
+        tokens = parse_pointer(operation["path"])
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise JSONPatchError(f"'{op}' requires a value")
+
+        if op == "add":
+            document = _add(document, tokens, operation["value"])
+        elif op == "remove":
+            document = _remove(document, tokens)
+        elif op == "replace":
+            document = _replace(document, tokens, operation["value"])
+        elif op == "test":
+            if resolve(document, tokens) != operation["value"]:
+                raise JSONPatchTestFailed(f"Test failed at '{operation['path']}'")
+        else:  # move, copy
+            if "from" not in operation:
+                raise JSONPatchError(f"'{op}' requires 'from'")
+            source = parse_pointer(operation["from"])
+            if op == "move" and tokens[:len(source)] == source and tokens != source:
+                raise JSONPatchError("Cannot move a value into one of its children")
+            value = resolve(document, source)
+            if op == "move":
+                document = _remove(document, source)
+            document = _add(document, tokens, value)
+    return document
+
+
+def merge_operations(fields: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Express a top-level field merge (PUT body) as JSON Patch operations for the edit log"""
+    return [{"op": "add", "path": "/" + key.replace("~", "~0").replace("/", "~1"), "value": value}
+            for key, value in fields.items()]
@@ -0,0 +1,254 @@
+"""
+LLM provider implementations.
+
+Every model call in the app goes through an LLMProvider, so extraction and
+chat can run against Gemini, any OpenAI-compatible server (vLLM, Ollama,
+llama.cpp, LM Studio, ...) or a deterministic fake provider for offline
+load tests. Contents use the Gemini convention: a prompt string or a list of
+strings and {"mime_type": ..., "data": bytes} blobs.
+"""
+import base64
+import hashlib
+import json
+import re
+import time
+from typing import Any, Dict, Iterator, List, Optional, Union
+from config import settings
+
+Contents = Union[str, List[Union[str, Dict[str, Any]]]]
+
+
+class LLMProvider:
+    """Interface for text, vision, streaming, token counting and embeddings"""
+
+    name = "base"
+    default_model = ""
+
+    def generate(self, contents: Contents, model: Optional[str] = None,
+                 generation_config: Optional[Dict[str, Any]] = None) -> str:
+        """Return the full text response"""
+        return "".join(self.stream(contents, model=model, generation_config=generation_config))
+
+    def stream(self, contents: Contents, model: Optional[str] = None,
+               generation_config: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """Yield the response text in chunks as it is generated"""
+        raise NotImplementedError
+
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        """Count (or estimate) the tokens in a prompt"""
+        return len(text) // 4
+
+    def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """Embed texts for retrieval ('retrieval_document' or 'retrieval_query')"""
+        raise NotImplementedError
+
+
+def _as_list(contents: Contents) -> List[Union[str, Dict[str, Any]]]:
+    return [contents] if isinstance(contents, str) else list(contents)
+
+
+def _prompt_text(contents: Contents) -> str:
+    return "\n".join(part for part in _as_list(contents) if isinstance(part, str))
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through the google-generativeai SDK"""
+
+    name = "gemini"
+
+    def __init__(self):
+        self.default_model = settings.GEMINI_MODEL
+
+    def _config(self, generation_config: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        from model_registry import supports_response_schema
+
+        if not generation_config:
+            return None
+        config = dict(generation_config)
+        if not supports_response_schema():
+            config.pop("response_mime_type", None)
+            config.pop("response_schema", None)
+        return config
+
+    def generate(self, contents, model=None, generation_config=None) -> str:
+        from model_registry import get_model
+
+        response = get_model(model or self.default_model).generate_content(
+            contents, generation_config=self._config(generation_config)
+        )
+        return response.text
+
+    def stream(self, contents, model=None, generation_config=None) -> Iterator[str]:
+        from model_registry import get_model
+
+        response = get_model(model or self.default_model).generate_content(
+            contents, generation_config=self._config(generation_config), stream=True
+        )
+        for chunk in response:
+            yield chunk.text
+
+    def count_tokens(self, text: str, model: Optional[str] = None) -> int:
+        from model_registry import get_model
+
+        return get_model(model or self.default_model).count_tokens(text).total_tokens
+
+    def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        from model_registry import get_genai
+
+        result = get_genai().embed_content(model=settings.EMBEDDING_MODEL, content=texts, task_type=task_type)
+        return result["embedding"]
+
+
+def _json_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a Gemini response schema (OpenAPI subset) to JSON Schema"""
+    converted = {key: value for key, value in schema.items() if key not in ("nullable", "properties", "items")}
+    if "properties" in schema:
+        converted["properties"] = {name: _json_schema(child) for name, child in schema["properties"].items()}
+    if "items" in schema:
+        converted["items"] = _json_schema(schema["items"])
+    if schema.get("nullable"):
+        converted["type"] = [schema["type"], "null"]
+    return converted
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Any server implementing the OpenAI chat completions and embeddings API"""
+
+    name = "openai"
+
+    def __init__(self):
+        import httpx
+
+        self.default_model = settings.OPENAI_MODEL
+        headers = {"Authorization": f"Bearer {settings.OPENAI_API_KEY}"} if settings.OPENAI_API_KEY else {}
+        self.client = httpx.Client(
+            base_url=settings.OPENAI_BASE_URL,
+            headers=headers,
+            timeout=settings.OPENAI_TIMEOUT_SECONDS
+        )
+
+    def _payload(self, contents, model, generation_config, stream: bool) -> Dict[str, Any]:
+        message_parts = []
+        for part in _as_list(contents):
+            if isinstance(part, str):
+                message_parts.append({"type": "text", "text": part})
+            elif part.get("mime_type", "").startswith("image/"):
+                encoded = base64.b64encode(part["data"]).decode("ascii")
+                message_parts.append({
+                    "type": "image_url",
+                    "image_url": {"url": f"data:{part['mime_type']};base64,{encoded}"}
+                })
+            else:
+                raise ValueError(f"{part.get('mime_type')} input is not supported by OpenAI-compatible providers")
+
+        payload: Dict[str, Any] = {
+            "model": model or self.default_model,
+            "messages": [{"role": "user", "content": message_parts}],
+            "stream": stream,
+        }
+        config = generation_config or {}
+        if "max_output_tokens" in config:
+            payload["max_tokens"] = config["max_output_tokens"]
+        if "temperature" in config:
+            payload["temperature"] = config["temperature"]
+        if "response_schema" in config:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "response", "schema": _json_schema(config["response_schema"])}
+            }
+        return payload
+
+    def generate(self, contents, model=None, generation_config=None) -> str:
+        response = self.client.post(
+            "/chat/completions",
+            json=self._payload(contents, model, generation_config, stream=False)
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"] or ""
+
+    def stream(self, contents, model=None, generation_config=None) -> Iterator[str]:
+        payload = self._payload(contents, model, generation_config, stream=True)
+        with self.client.stream("POST", "/chat/completions", json=payload) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                text = choices[0].get("delta", {}).get("content") if choices else None
+                if text:
+                    yield text
+
+    def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        response = self.client.post("/embeddings", json={"model": settings.OPENAI_EMBEDDING_MODEL, "input": texts})
+        response.raise_for_status()
+        return [item["embedding"] for item in sorted(response.json()["data"], key=lambda item: item["index"])]
+
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic provider with configurable latency, for offline benchmarks
+    and load tests. Responses depend only on the prompt.
+    """
+
+    name = "fake"
+    default_model = "fake"
+    embedding_dimensions = 64
+
+    def __init__(self, latency_ms: Optional[float] = None, tokens_per_second: Optional[float] = None):
+        self.latency_ms = settings.FAKE_LLM_LATENCY_MS if latency_ms is None else latency_ms
+        self.tokens_per_second = settings.FAKE_LLM_TOKENS_PER_SECOND if tokens_per_second is None else tokens_per_second
+
+    def _respond(self, contents: Contents) -> str:
+        prompt = _prompt_text(contents)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        seed = int(digest[:8], 16)
+
+        if "JSON" in prompt:
+            amount = round(10 + (seed % 50000) / 100, 2)
+            tax = round(amount * 0.08, 2)
+            return json.dumps({
+                "vendor_name": f"Vendor {digest[:6].upper()}",
+                "document_type": "bill",
+                "document_number": f"INV-{seed % 100000:05d}",
+                "date": "2024-01-15",
+                "due_date": "2024-02-15",
+                "total_amount": round(amount + tax, 2),
+                "currency": "USD",
+                "tax_amount": tax,
+                "subtotal": amount,
+                "line_items": [{"description": "Service charge", "amount": amount}],
+            })
+        if "Extract all text" in prompt:
+            return f"FAKE VENDOR {digest[:6].upper()}\nInvoice INV-{seed % 100000:05d}\nTotal due USD {10 + (seed % 50000) / 100:.2f}"
+        question = prompt.rsplit("User Question:", 1)[-1].strip()
+        return f"(fake answer {digest[:8]}) {question[:200]}"
+
+    def stream(self, contents, model=None, generation_config=None) -> Iterator[str]:
+        text = self._respond(contents)
+        time.sleep(self.latency_ms / 1000)
+        # Emit roughly word-sized chunks at the configured generation speed
+        for chunk in re.findall(r"\S+\s*|\s+", text):
+            if self.tokens_per_second:
+                time.sleep(1 / self.tokens_per_second)
+            yield chunk
+
+    def embed(self, texts: List[str], task_type: str) -> List[List[float]]:
+        # Hashed bag of words: texts sharing words get similar vectors
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.embedding_dimensions
+            for word in re.findall(r"\w+", text.lower()):
+                bucket = int(hashlib.md5(word.encode("utf-8")).hexdigest()[:8], 16)
+                vector[bucket % self.embedding_dimensions] += 1.0
+            vectors.append(vector)
+        return vectors
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "openai": OpenAICompatibleProvider,
+    "fake": FakeProvider,
+}
@@ -1,24 +1,39 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 import os
 from database import init_db
 from config import settings
-from routers import auth_router, document_router, chat_router
+from pdf_utils import shutdown_pdf_pool
+from jobs import start_recovery, shutdown_jobs
+from storage import file_purger
+from storage_gc import start_storage_gc, stop_storage_gc
+from metrics import metrics
+from http_cache import CompressionMiddleware
+from routers import auth_router, document_router, upload_router, chat_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
-    # Startup
-    init_db()
-    print("Database initialized successfully")
+    # Startup (serve.py initializes the database once before forking workers)
+    if not os.environ.get("APP_DB_INITIALIZED"):
+        init_db()
+        print("Database initialized successfully")
+    start_recovery(document_router.process_document)
+    start_storage_gc()
     print(f"Server running on http://localhost:8000")
     print(f"API docs available at http://localhost:8000/docs")
     yield
-    # Shutdown (if needed)
+    # Shutdown
     print("Application shutting down...")
+    stop_storage_gc()
+    # Uvicorn has already waited for open requests with half the graceful timeout
+    shutdown_jobs(settings.WEB_GRACEFUL_TIMEOUT / 2 - 5)
+    shutdown_pdf_pool()
+    file_purger.shutdown()
 
 
 # Initialize FastAPI app
@@ -26,7 +41,8 @@ app = FastAPI(
     title="AI Document Extractor API",
     description="AI-powered document extraction and Q&A system",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -36,6 +52,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "Location", "Upload-Offset", "Upload-Length", "Upload-Chunks"],
+)
+
+# Compress large JSON/CSV responses for clients that accept it
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
 )
 
 # Create uploads directory if it doesn't exist
@@ -46,6 +71,7 @@ app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads"
 
 # Include routers
 app.include_router(auth_router.router)
+app.include_router(upload_router.router)
 app.include_router(document_router.router)
 app.include_router(chat_router.router)
 
@@ -66,6 +92,16 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Per-worker performance counters"""
+    snapshot = metrics.snapshot()
+    turns = snapshot.get("chat.turns", 0)
+    if turns:
+        snapshot["chat.local_answer_ratio"] = round(snapshot.get("chat.local_answers", 0) / turns, 4)
+    return snapshot
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
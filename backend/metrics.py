@@ -0,0 +1,31 @@
+"""
+In-process counters for performance features (cache hits, model calls saved, ...).
+
+Counters are per worker process and exposed through the /metrics endpoint.
+"""
+import threading
+from collections import defaultdict
+from typing import Dict
+
+
+class Metrics:
+    """Thread-safe named counters"""
+
+    def __init__(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: float = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+
+metrics = Metrics()
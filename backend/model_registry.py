@@ -0,0 +1,71 @@
+"""
+Lazily constructed, shared LLM providers and Gemini model clients.
+
+Importing the Gemini SDK is the most expensive part of starting the app, so
+nothing here touches it until a model is first needed. Providers and clients
+are created once per process and shared by the extractor, the chatbot and
+retrieval.
+"""
+import inspect
+import threading
+from typing import Any, Dict, Optional
+from config import settings
+
+_models: Dict[str, Any] = {}
+_providers: Dict[str, Any] = {}
+_genai = None
+_lock = threading.Lock()
+
+
+def get_genai():
+    """Import and configure the Gemini SDK on first use"""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=settings.GOOGLE_API_KEY)
+                _genai = genai
+    return _genai
+
+
+def get_model(model_name: Optional[str] = None):
+    """Return the shared GenerativeModel for a model name"""
+    model_name = model_name or settings.GEMINI_MODEL
+    model = _models.get(model_name)
+    if model is None:
+        genai = get_genai()
+        with _lock:
+            model = _models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                _models[model_name] = model
+    return model
+
+
+def supports_response_schema() -> bool:
+    """Whether the installed SDK accepts response_mime_type/response_schema"""
+    return "response_schema" in inspect.signature(get_genai().types.GenerationConfig).parameters
+
+
+def get_provider(name: Optional[str] = None):
+    """Return the shared LLMProvider ('gemini', 'openai' or 'fake')"""
+    from llm_providers import PROVIDERS
+
+    name = name or settings.LLM_PROVIDER
+    provider = _providers.get(name)
+    if provider is None:
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown LLM provider '{name}'. Use one of: {', '.join(PROVIDERS)}")
+        with _lock:
+            provider = _providers.get(name)
+            if provider is None:
+                provider = PROVIDERS[name]()
+                _providers[name] = provider
+    return provider
+
+
+def set_provider(provider, name: Optional[str] = None):
+    """Replace a provider instance (benchmarks and record/replay wrappers)"""
+    with _lock:
+        _providers[name or settings.LLM_PROVIDER] = provider
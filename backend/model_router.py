@@ -0,0 +1,154 @@
+"""
+Cost- and size-aware model routing.
+
+Each extraction and chat call is assigned a route from cheap, measurable
+features (page count, text length, scanned pages, question complexity) and
+each route starts on a model tier: fast, default or strong. A call that
+fails (exception or unparseable output) is retried one tier up, and a route
+whose recent calls keep failing starts one tier higher until it recovers.
+Per-route calls, failures, escalations, latency, tokens and estimated cost
+are recorded in the shared metrics.
+"""
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+from config import settings
+from metrics import metrics
+
+TIERS = ["fast", "default", "strong"]
+
+_COMPLEX_QUESTION = re.compile(
+    r"\b(why|explain|compare|analy[sz]e|summar|trend|average|percent|difference|calculate|"
+    r"breakdown|should|would|could|estimate|forecast|unusual|anomal)\w*"
+)
+
+T = TypeVar("T")
+
+
+@dataclass
+class Route:
+    name: str
+    tier: str
+
+
+class ModelRouter:
+    """Chooses a model tier per call and escalates on failure"""
+
+    def __init__(self):
+        self._recent: Dict[str, deque] = defaultdict(lambda: deque(maxlen=settings.ROUTING_FAILURE_WINDOW))
+        self._lock = threading.Lock()
+
+    def tier_model(self, tier: str, provider: Optional[str] = None) -> Optional[str]:
+        """Model name for a tier of a provider (None means the provider's default model)"""
+        override = {
+            "fast": settings.MODEL_TIER_FAST,
+            "default": settings.MODEL_TIER_DEFAULT,
+            "strong": settings.MODEL_TIER_STRONG,
+        }[tier]
+        tiers = settings.MODEL_TIERS_BY_PROVIDER.get(provider or settings.LLM_PROVIDER) or {}
+        return override or tiers.get(tier) or None
+
+    def route_extraction(self, page_count: int, text_length: int, ocr_pages: int = 0, vision: bool = False) -> Route:
+        """Route a structuring call from document features"""
+        if vision:
+            return self._route("extract.vision", "default")
+        if page_count <= settings.ROUTING_SMALL_PAGES and text_length <= settings.ROUTING_SMALL_TEXT_CHARS:
+            # Short receipts and one-page bills; OCR'd text is noisier, so give it the default model
+            return self._route("extract.small", "fast" if not ocr_pages else "default")
+        return self._route("extract.large", "default")
+
+    def route_chat(self, question: str, data: Any, history_length: int = 0) -> Route:
+        """Route a chat turn from question complexity and context size"""
+        line_items = data.get("line_items") if isinstance(data, dict) else None
+        large_context = isinstance(line_items, list) and len(line_items) > settings.ROUTING_CHAT_MAX_LINE_ITEMS
+        complex_question = (
+            _COMPLEX_QUESTION.search(question.lower()) is not None
+            or len(question.split()) > settings.ROUTING_CHAT_SIMPLE_WORDS
+        )
+        if complex_question or large_context or history_length > 6:
+            return self._route("chat.complex", "default")
+        return self._route("chat.simple", "fast")
+
+    def _route(self, name: str, tier: str) -> Route:
+        if settings.ROUTING_ENABLED:
+            # Promote routes whose recent calls keep failing on their starting tier
+            with self._lock:
+                recent = list(self._recent[name])
+            if len(recent) >= settings.ROUTING_FAILURE_MIN_SAMPLES:
+                failure_rate = recent.count(False) / len(recent)
+                if failure_rate > settings.ROUTING_FAILURE_THRESHOLD and tier != TIERS[-1]:
+                    tier = TIERS[TIERS.index(tier) + 1]
+        else:
+            tier = "default"
+        return Route(name=name, tier=tier)
+
+    def _escalation_models(self, route: Route, provider: Optional[str] = None,
+                           default_model: str = "") -> List[Optional[str]]:
+        tiers = TIERS[TIERS.index(route.tier):] if settings.ROUTING_ESCALATE else [route.tier]
+        models: List[Optional[str]] = []
+        for tier in tiers:
+            model = self.tier_model(tier, provider)
+            # A tier naming the default model is the same model as one without an entry
+            if (model or default_model) not in [known or default_model for known in models]:
+                models.append(model)
+        return models
+
+    def run(
+        self,
+        route: Route,
+        call: Callable[[Optional[str]], T],
+        is_failure: Callable[[T], bool],
+        input_chars: int,
+        output_chars: Callable[[T], int] = lambda result: len(str(result)),
+        provider: Optional[str] = None
+    ) -> T:
+        """Run a call on the route's model of a provider, escalating to stronger tiers on failure"""
+        from model_registry import get_provider
+
+        # Tiers without a model use the provider's default; named here for metrics and prices
+        default_model = get_provider(provider).default_model
+        models = self._escalation_models(route, provider, default_model)
+        result: Any = None
+        error: Optional[Exception] = None
+        for attempt, model in enumerate(models):
+            started = time.perf_counter()
+            try:
+                result = call(model)
+                failed = is_failure(result)
+                error = None
+            except Exception as e:
+                result, failed, error = None, True, e
+            self._record(route, model or default_model, time.perf_counter() - started, input_chars,
+                         output_chars(result) if result is not None else 0, failed, first=attempt == 0)
+            if not failed:
+                return result
+            if attempt + 1 < len(models):
+                metrics.increment(f"route.{route.name}.escalations")
+                print(f"Route {route.name}: {model or default_model or 'default model'} failed, escalating")
+        if error is not None:
+            raise error
+        return result
+
+    def _record(self, route: Route, model: Optional[str], seconds: float, input_chars: int,
+                output_chars: int, failed: bool, first: bool):
+        if first:
+            with self._lock:
+                self._recent[route.name].append(not failed)
+        input_tokens = input_chars // 4
+        output_tokens = output_chars // 4
+        prices = settings.MODEL_PRICES_PER_MILLION.get(model or "", [0, 0])
+        prefix = f"route.{route.name}"
+        metrics.increment(f"{prefix}.calls")
+        metrics.increment(f"{prefix}.calls.{model or 'default'}")
+        metrics.increment(f"{prefix}.latency_seconds", seconds)
+        metrics.increment(f"{prefix}.input_tokens", input_tokens)
+        metrics.increment(f"{prefix}.output_tokens", output_tokens)
+        metrics.increment(f"{prefix}.cost_usd", (input_tokens * prices[0] + output_tokens * prices[1]) / 1_000_000)
+        if failed:
+            metrics.increment(f"{prefix}.failures")
+
+
+model_router = ModelRouter()
@@ -1,7 +1,12 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, JSON, Boolean, LargeBinary, Sequence
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from database import Base
+from database import Base, engine
+
+# PostgreSQL partitions the chat tables by created_at (partitions.py), and a
+# partitioned table's primary key must include the partition column. Other
+# databases keep a plain autoincrement id as the key.
+PARTITIONED_CHAT = engine.dialect.name == "postgresql"
 
 
 class User(Base):
@@ -30,41 +35,150 @@ class Document(Base):
     file_type = Column(String(50), nullable=False)  # 'image' or 'pdf'
     file_size = Column(Integer, nullable=False)
     status = Column(String(50), default="pending")  # pending, processing, processed, failed
+    processing_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    preview_pages = Column(Integer)  # Pages with a preview; NULL until previews have been generated
+    processing_stage = Column(String(20))  # previews, text, structuring, indexing, done
+    processing_progress = Column(Integer)  # Percent of the whole pipeline
+    indexed_at = Column(DateTime(timezone=True))  # Last retrieval indexing, also when it produced no chunks
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
-    # Relationships
+    # Relationships (child rows are removed by ON DELETE CASCADE, not loaded and deleted one by one)
     user = relationship("User", back_populates="documents")
-    extracted_data = relationship("ExtractedData", back_populates="document", uselist=False, cascade="all, delete-orphan")
-    chat_messages = relationship("ChatMessage", back_populates="document", cascade="all, delete-orphan")
+    extracted_data = relationship("ExtractedData", back_populates="document", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    chat_messages = relationship("ChatMessage", back_populates="document", cascade="all, delete-orphan", passive_deletes=True)
+    chunks = relationship("DocumentChunk", back_populates="document", cascade="all, delete-orphan", passive_deletes=True)
+    edits = relationship("ExtractedDataEdit", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class ExtractedData(Base):
     __tablename__ = "extracted_data"
 
     id = Column(Integer, primary_key=True, index=True)
-    document_id = Column(Integer, ForeignKey("documents.id"), unique=True, nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), unique=True, nullable=False)
     data = Column(JSON, nullable=False)  # Structured data as JSON
     coordinates = Column(JSON, nullable=True)  # Field coordinates for highlighting
     confidence_scores = Column(JSON, nullable=True)  # Confidence scores for each field
+    version = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped on every write
+    provisional = Column(Boolean, nullable=False, default=False, server_default="false")  # First-page header fields only
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     document = relationship("Document", back_populates="extracted_data")
 
+    # UPDATEs are conditional on the version read, so concurrent writers get a StaleDataError
+    __mapper_args__ = {"version_id_col": version}
 
-class ChatMessage(Base):
-    __tablename__ = "chat_messages"
+
+class ExtractedDataEdit(Base):
+    """Append-only log of user edits to extracted data, as JSON Patch operations"""
+    __tablename__ = "extracted_data_edits"
 
     id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), index=True, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
+    version = Column(Integer, nullable=False)  # Version the edit produced
+    operations = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class ChatMessage(Base):
+    """
+    On PostgreSQL the table is range-partitioned by month of created_at
+    (see partitions.py), so created_at is part of the table's primary key
+    there; the ORM identifies rows by id alone on every database. Queries
+    should bound created_at (e.g. by the document's created_at) to prune
+    partitions.
+    """
+    __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_document_user_created", "document_id", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    # A composite key gets no SERIAL, so the sequence is declared explicitly
+    # (databases without sequences ignore it and autoincrement the id)
+    id = Column(Integer, Sequence("chat_messages_id_seq"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
     message = Column(Text, nullable=False)
     response = Column(Text, nullable=False)
     sender = Column(String(20), nullable=False)  # 'user' or 'ai'
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), primary_key=PARTITIONED_CHAT, nullable=False, server_default=func.now())
+
+    __mapper_args__ = {"primary_key": [id]}
 
     # Relationships
     user = relationship("User", back_populates="chat_messages")
     document = relationship("Document", back_populates="chat_messages")
+
+
+class ChatMessageArchive(Base):
+    """
+    Chat messages older than CHAT_ARCHIVE_DAYS. Same columns and partitioning
+    as chat_messages, so old monthly partitions are moved here by detaching
+    and re-attaching them rather than copying rows.
+    """
+    __tablename__ = "chat_messages_archive"
+    __table_args__ = (
+        Index("ix_chat_messages_archive_document_user_created", "document_id", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)  # Same id as in chat_messages
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    message = Column(Text, nullable=False)
+    response = Column(Text, nullable=False)
+    sender = Column(String(20), nullable=False)
+    created_at = Column(DateTime(timezone=True), primary_key=PARTITIONED_CHAT, nullable=False)
+
+    __mapper_args__ = {"primary_key": [id]}
+
+
+class DocumentChunk(Base):
+    """Embedded snippet of a document (OCR text or structured fields) for retrieval"""
+    __tablename__ = "document_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    source = Column(String(20), nullable=False)  # 'fields' or 'text'
+    content = Column(Text, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)  # float32 vector
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    document = relationship("Document", back_populates="chunks")
+
+
+class UploadSession(Base):
+    """
+    Resumable upload in progress. Chunks are written in place into
+    '<id>.part' in the upload directory; finalizing renames the file and
+    creates the Document.
+    """
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)  # uuid4 hex, also names the .part file
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+    filename = Column(String(255), nullable=False)
+    content_type = Column(String(100), nullable=False)
+    file_size = Column(Integer, nullable=False)
+    chunk_size = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+    # Relationships
+    chunks = relationship("UploadChunk", cascade="all, delete-orphan", passive_deletes=True)
+
+
+class UploadChunk(Base):
+    """A received and checksum-verified chunk of an upload session"""
+    __tablename__ = "upload_chunks"
+
+    session_id = Column(String(32), ForeignKey("upload_sessions.id", ondelete="CASCADE"), primary_key=True)
+    chunk_index = Column(Integer, primary_key=True)
+    checksum = Column(String(200))  # As sent in Upload-Checksum, e.g. 'sha256 <base64>'
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
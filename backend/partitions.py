@@ -0,0 +1,256 @@
+"""
+Monthly range partitions for chat_messages (PostgreSQL only).
+
+Usage:
+    python partitions.py status
+    python partitions.py ensure
+    python partitions.py migrate    # convert an existing unpartitioned table; stop the server first
+
+chat_messages and chat_messages_archive are partitioned by month of
+created_at. Partitions are created CHAT_PARTITION_MONTHS_AHEAD months in
+advance (at startup and on every storage sweep), with a DEFAULT partition so
+an insert never fails for lack of one. Messages that landed in DEFAULT while
+a month had no partition (the server was down longer than the lookahead)
+are moved into that month's partition when it is created. Months older than CHAT_ARCHIVE_DAYS
+are detached from chat_messages and attached to chat_messages_archive,
+which moves them without copying a row. Other databases keep plain tables.
+"""
+import argparse
+import re
+from datetime import date, datetime, timezone
+from typing import List, Tuple
+from sqlalchemy import text
+from config import settings
+from database import engine
+
+CHAT_TABLE = "chat_messages"
+ARCHIVE_TABLE = "chat_messages_archive"
+CHAT_COLUMNS = "id, user_id, document_id, message, response, sender, created_at"
+
+_PARTITION_NAME = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def enabled() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(connection, table: str) -> bool:
+    return bool(connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table)"
+    ), {"table": table}).scalar())
+
+
+def list_partitions(connection, table: str) -> List[Tuple[str, date]]:
+    """Monthly partitions of a table as (name, first day of month), oldest first"""
+    names = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {"table": table}).scalars()
+    partitions = []
+    for name in names:
+        match = _PARTITION_NAME.search(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def table_exists(connection, table: str) -> bool:
+    return connection.execute(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": table}).scalar()
+
+
+def create_partition(connection, table: str, month: date):
+    """
+    Create one monthly partition. PostgreSQL refuses it while the DEFAULT
+    partition holds rows of that month, so those are moved into a new table
+    first and it is attached as the partition.
+    """
+    name = partition_name(table, month)
+    if table_exists(connection, name):
+        return
+    bounds = f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    month_rows = f"created_at >= '{month.isoformat()}' AND created_at < '{add_months(month, 1).isoformat()}'"
+    default = f"{table}_default"
+    stranded = table_exists(connection, default) and connection.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {month_rows})"
+    )).scalar()
+    if not stranded:
+        connection.execute(text(f"CREATE TABLE {name} PARTITION OF {table} {bounds}"))
+        return
+
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = connection.execute(text(
+        f"WITH moved AS (DELETE FROM {default} WHERE {month_rows} RETURNING {CHAT_COLUMNS}) "
+        f"INSERT INTO {name} ({CHAT_COLUMNS}) SELECT {CHAT_COLUMNS} FROM moved"
+    )).rowcount
+    connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} {bounds}"))
+    print(f"Moved {moved} messages from {default} into {name}")
+
+
+def create_partitions(connection, table: str, first: date, last: date):
+    """
+    Create monthly partitions from first to last (inclusive) plus the DEFAULT
+    partition. A month that cannot be created is reported and skipped; its
+    messages stay in DEFAULT until a later run.
+    """
+    month = month_start(first)
+    while month <= last:
+        try:
+            with connection.begin_nested():
+                create_partition(connection, table, month)
+        except Exception as e:
+            print(f"⚠️  Could not create partition {partition_name(table, month)}: {e}")
+        month = add_months(month, 1)
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+
+def ensure_chat_partitions() -> bool:
+    """Create upcoming chat partitions; returns False when chat_messages is not partitioned"""
+    if not enabled():
+        return False
+    today = datetime.now(timezone.utc).date()
+    with engine.begin() as connection:
+        if is_partitioned(connection, ARCHIVE_TABLE):
+            # Rows archived by copying (before chat_messages was partitioned) land here
+            connection.execute(text(f"CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE}_default PARTITION OF {ARCHIVE_TABLE} DEFAULT"))
+        if not is_partitioned(connection, CHAT_TABLE):
+            return False
+        # Continue from the newest existing month so a long shutdown leaves no gap
+        existing = list_partitions(connection, CHAT_TABLE)
+        first = min(existing[-1][1], month_start(today)) if existing else month_start(today)
+        create_partitions(connection, CHAT_TABLE, first,
+                          add_months(month_start(today), settings.CHAT_PARTITION_MONTHS_AHEAD))
+    return True
+
+
+def archive_chat_partitions(cutoff: datetime) -> int:
+    """
+    Move monthly partitions that end before cutoff into the archive table.
+    Returns the (estimated) number of messages moved.
+    """
+    moved = 0
+    with engine.begin() as connection:
+        if not (is_partitioned(connection, CHAT_TABLE) and is_partitioned(connection, ARCHIVE_TABLE)):
+            return 0
+        for name, month in list_partitions(connection, CHAT_TABLE):
+            end = add_months(month, 1)
+            if datetime(end.year, end.month, end.day, tzinfo=timezone.utc) > cutoff:
+                break
+            rows = connection.execute(text(
+                "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE relname = :name"
+            ), {"name": name}).scalar() or 0
+            archived_name = partition_name(ARCHIVE_TABLE, month)
+            connection.execute(text(f"ALTER TABLE {CHAT_TABLE} DETACH PARTITION {name}"))
+            connection.execute(text(f"ALTER TABLE {name} RENAME TO {archived_name}"))
+            connection.execute(text(
+                f"ALTER TABLE {ARCHIVE_TABLE} ATTACH PARTITION {archived_name} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+            ))
+            print(f"Archived chat partition {name} (~{rows} messages)")
+            moved += rows
+    return moved
+
+
+def migrate_chat_messages():
+    """
+    Convert an unpartitioned chat_messages table in one transaction. The old
+    table is kept as chat_messages_unpartitioned until you drop it.
+    """
+    from models import ChatMessage, ChatMessageArchive
+
+    with engine.begin() as connection:
+        if is_partitioned(connection, CHAT_TABLE):
+            print("chat_messages is already partitioned")
+            return
+        old = f"{CHAT_TABLE}_unpartitioned"
+        connection.execute(text(f"ALTER TABLE {CHAT_TABLE} RENAME TO {old}"))
+        connection.execute(text(f"ALTER TABLE {old} RENAME CONSTRAINT {CHAT_TABLE}_pkey TO {old}_pkey"))
+        connection.execute(text(f"ALTER SEQUENCE IF EXISTS {CHAT_TABLE}_id_seq RENAME TO {old}_id_seq"))
+        for index in connection.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE tablename = :table AND indexname LIKE 'ix_%'"
+        ), {"table": old}).scalars().all():
+            connection.execute(text(f"DROP INDEX {index}"))
+
+        ChatMessage.__table__.create(bind=connection)
+        oldest = connection.execute(text(f"SELECT min(created_at) FROM {old}")).scalar()
+        today = datetime.now(timezone.utc).date()
+        create_partitions(connection, CHAT_TABLE, (oldest.date() if oldest else today),
+                          add_months(month_start(today), settings.CHAT_PARTITION_MONTHS_AHEAD))
+        copied = connection.execute(text(
+            f"INSERT INTO {CHAT_TABLE} ({CHAT_COLUMNS}) "
+            f"SELECT {CHAT_COLUMNS.replace('created_at', 'COALESCE(created_at, now())')} FROM {old}"
+        )).rowcount
+        connection.execute(text(
+            f"SELECT setval('{CHAT_TABLE}_id_seq', "
+            f"COALESCE((SELECT max(id) FROM {CHAT_TABLE}), 0) + 1, false)"
+        ))
+
+        if not is_partitioned(connection, ARCHIVE_TABLE):
+            archived = connection.execute(text(f"SELECT to_regclass('{ARCHIVE_TABLE}')")).scalar()
+            if archived:
+                connection.execute(text(f"ALTER TABLE {ARCHIVE_TABLE} RENAME TO {ARCHIVE_TABLE}_unpartitioned"))
+                connection.execute(text(
+                    f"ALTER TABLE {ARCHIVE_TABLE}_unpartitioned RENAME CONSTRAINT {ARCHIVE_TABLE}_pkey "
+                    f"TO {ARCHIVE_TABLE}_unpartitioned_pkey"
+                ))
+                for index in connection.execute(text(
+                    "SELECT indexname FROM pg_indexes WHERE tablename = :table AND indexname LIKE 'ix_%'"
+                ), {"table": f"{ARCHIVE_TABLE}_unpartitioned"}).scalars().all():
+                    connection.execute(text(f"DROP INDEX {index}"))
+            ChatMessageArchive.__table__.create(bind=connection)
+            connection.execute(text(f"CREATE TABLE {ARCHIVE_TABLE}_default PARTITION OF {ARCHIVE_TABLE} DEFAULT"))
+            if archived:
+                connection.execute(text(
+                    f"INSERT INTO {ARCHIVE_TABLE} ({CHAT_COLUMNS}) "
+                    f"SELECT {CHAT_COLUMNS} FROM {ARCHIVE_TABLE}_unpartitioned WHERE created_at IS NOT NULL"
+                ))
+    print(f"Copied {copied} messages into the partitioned chat_messages; "
+          f"drop {old} once you have checked the result")
+
+
+def status():
+    if not enabled():
+        print("Partitioning needs PostgreSQL")
+        return
+    with engine.connect() as connection:
+        for table in (CHAT_TABLE, ARCHIVE_TABLE):
+            if not is_partitioned(connection, table):
+                print(f"{table}: not partitioned")
+                continue
+            partitions = list_partitions(connection, table)
+            print(f"{table}: {len(partitions)} monthly partitions"
+                  + (f", {partitions[0][1]:%Y-%m} to {partitions[-1][1]:%Y-%m}" if partitions else ""))
+            default_rows = connection.execute(text(f"SELECT count(*) FROM {table}_default")).scalar()
+            if default_rows:
+                print(f"  ⚠️  {default_rows} rows in {table}_default; run 'ensure' before they grow")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["status", "ensure", "migrate"])
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate_chat_messages()
+        ensure_chat_partitions()
+    elif args.command == "ensure":
+        print("Partitions up to date" if ensure_chat_partitions() else "chat_messages is not partitioned")
+    status()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Helpers for CPU-bound PDF parsing.
+
+Parsing runs in a process pool so large PDFs don't hold the GIL while
+the server keeps answering requests. Functions submitted to the pool live
+in this small module so worker processes don't have to import the AI SDK.
+"""
+import io
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from config import settings
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pdf_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool used for PDF parsing"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=settings.PDF_PARSE_WORKERS)
+    return _pool
+
+
+def shutdown_pdf_pool():
+    """Shut down the PDF parsing pool (called on application shutdown)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+def read_pdf_pages(pdf_path: str) -> List[str]:
+    """Extract the text layer of every page (runs inside a pool worker)"""
+    import PyPDF2
+
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [page.extract_text() or "" for page in pdf_reader.pages]
+
+
+def read_pdf_pages_in_pool(pdf_path: str) -> List[str]:
+    """Extract per-page text in the process pool and wait for the result"""
+    return get_pdf_pool().submit(read_pdf_pages, pdf_path).result()
+
+
+def count_pdf_pages(pdf_path: str) -> int:
+    """Number of pages, without extracting any text"""
+    import PyPDF2
+
+    with open(pdf_path, 'rb') as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def extract_pdf_page(pdf_path: str, page_index: int) -> bytes:
+    """Return a single page of a PDF as a standalone PDF document"""
+    import PyPDF2
+
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        writer = PyPDF2.PdfWriter()
+        writer.add_page(pdf_reader.pages[page_index])
+        output = io.BytesIO()
+        writer.write(output)
+        return output.getvalue()
@@ -0,0 +1,114 @@
+"""
+Thumbnails and low-resolution page previews for the document viewer.
+
+Previews are rendered once, when a document is processed (or on the first
+request for documents uploaded before previews existed), and stored next to
+the original as '<stored name>.thumb.webp' and '<stored name>.page-<n>.webp'.
+The dashboard and viewer load these few-KB images instead of the original
+file. PDF pages are rendered with pypdfium2; without it PDFs get no
+previews and the viewer shows the original.
+
+Rendering runs in the PDF process pool, so like pdf_utils this module only
+imports what pool workers need.
+"""
+import os
+import re
+from typing import TYPE_CHECKING, Iterator, List, Optional
+from config import settings
+from pdf_utils import get_pdf_pool
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+_PREVIEW_SUFFIX = re.compile(r"\.(thumb|page-\d+)\.webp$")
+
+
+def thumbnail_path(source_path: str) -> str:
+    return f"{source_path}.thumb.webp"
+
+
+def page_path(source_path: str, page: int) -> str:
+    """Preview of a page, numbered from 1"""
+    return f"{source_path}.page-{page}.webp"
+
+
+def preview_paths(source_path: str, pages: Optional[int]) -> List[str]:
+    """Every preview file of an original"""
+    if not pages:
+        return []
+    return [thumbnail_path(source_path)] + [page_path(source_path, page) for page in range(1, pages + 1)]
+
+
+def original_name(name: str) -> Optional[str]:
+    """Name of the original file a preview belongs to, None if name is not a preview"""
+    match = _PREVIEW_SUFFIX.search(name)
+    return name[:match.start()] if match else None
+
+
+def _save_webp(image: "Image.Image", path: str, max_edge: int):
+    from PIL import Image
+
+    preview = image.copy()
+    try:
+        preview.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        if preview.mode not in ("RGB", "RGBA", "L"):
+            converted = preview.convert("RGB")
+            preview.close()
+            preview = converted
+        # Written under a temporary name so a reader never sees half a file
+        temporary = f"{path}.tmp"
+        preview.save(temporary, format="WEBP", quality=settings.PREVIEW_WEBP_QUALITY, method=4)
+        os.replace(temporary, path)
+    finally:
+        preview.close()
+
+
+def _pdf_pages(source_path: str) -> Iterator["Image.Image"]:
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(source_path)
+    try:
+        for index in range(min(len(pdf), settings.PREVIEW_MAX_PAGES)):
+            page = pdf[index]
+            try:
+                # Render straight at preview size rather than at full resolution
+                width, height = page.get_size()
+                scale = settings.PREVIEW_PAGE_EDGE / max(width, height, 1)
+                yield page.render(scale=scale).to_pil()
+            finally:
+                page.close()
+    finally:
+        pdf.close()
+
+
+def _image_pages(source_path: str) -> Iterator["Image.Image"]:
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as image:
+        yield ImageOps.exif_transpose(image)
+
+
+def render_previews(source_path: str, file_type: str) -> int:
+    """Write the previews of a file and return how many pages have one (runs inside a pool worker)"""
+    if file_type == "pdf":
+        try:
+            import pypdfium2  # noqa: F401
+        except ImportError:
+            return 0
+        pages = _pdf_pages(source_path)
+    else:
+        pages = _image_pages(source_path)
+
+    count = 0
+    for image in pages:
+        count += 1
+        if count == 1:
+            _save_webp(image, thumbnail_path(source_path), settings.PREVIEW_THUMBNAIL_EDGE)
+        _save_webp(image, page_path(source_path, count), settings.PREVIEW_PAGE_EDGE)
+        image.close()
+    return count
+
+
+def generate_previews(source_path: str, file_type: str) -> int:
+    """Render previews in the process pool and wait for the result"""
+    return get_pdf_pool().submit(render_previews, source_path, file_type).result()
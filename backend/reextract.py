@@ -0,0 +1,294 @@
+"""
+Re-run structured extraction over stored documents, e.g. after changing the
+extraction prompt or model.
+
+Usage:
+    python reextract.py [--status processed] [--user-id N] [--document-id N ...]
+                        [--since 2024-01-01] [--until 2024-07-01] [--file-type pdf] [--limit N]
+                        [--workers 4] [--rate 120] [--checkpoint reextract.checkpoint.jsonl]
+                        [--dry-run [--diff-file diffs.jsonl]] [--include-edited] [--restart]
+
+Documents are extracted by --workers threads, starting at most --rate
+documents per minute (0 for no limit) so a large run stays inside the model
+provider's quota. Each finished document is appended to the checkpoint
+file; running the same command again skips what it lists, so an
+interrupted run (Ctrl-C, a lost SSH session) resumes where it stopped.
+--restart discards the checkpoint, --retry-failed runs failed documents
+again.
+
+--dry-run extracts without saving and prints the fields that would change
+against the stored ExtractedData (--diff-file also writes them as JSON
+lines); it does not touch the checkpoint. Otherwise the new data replaces
+the stored data, bumping its version, and the document is re-indexed for
+chat. Documents whose data was edited by a user are left alone unless
+--include-edited is given, and a document edited while it was being
+re-extracted is reported as a conflict rather than overwritten.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import exists
+from sqlalchemy.orm.exc import StaleDataError
+from ai_service import document_extractor
+from compare_extraction_modes import IGNORED_FIELDS, normalize_value
+from database import SessionLocal
+from models import Document, ExtractedData, ExtractedDataEdit
+from storage import upload_path
+import retrieval
+
+PROGRESS_INTERVAL_SECONDS = 10
+
+
+class RateLimiter:
+    """Spaces out the start of work to at most `per_minute` items per minute across threads"""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class Checkpoint:
+    """Append-only JSON lines record of finished documents"""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self, retry_failed: bool) -> Set[int]:
+        """Ids of documents a previous run finished"""
+        done = set()
+        if not self.path or not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Half-written line of an interrupted run
+                if retry_failed and entry.get("outcome") == "failed":
+                    done.discard(entry["document_id"])
+                else:
+                    done.add(entry["document_id"])
+        return done
+
+    def record(self, document_id: int, outcome: str, seconds: float):
+        if not self.path:
+            return
+        line = json.dumps({"document_id": document_id, "outcome": outcome, "seconds": round(seconds, 3)})
+        with self._lock, open(self.path, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def reset(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def diff_fields(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """Fields whose value would change, as {field: [old, new]}"""
+    changes = {}
+    for key in sorted(set(old) | set(new)):
+        if key in IGNORED_FIELDS:
+            continue
+        before, after = old.get(key), new.get(key)
+        if key == "line_items":
+            same = [
+                {field: normalize_value(value) for field, value in (item or {}).items()}
+                for item in before or []
+            ] == [
+                {field: normalize_value(value) for field, value in (item or {}).items()}
+                for item in after or []
+            ]
+        else:
+            same = normalize_value(before) == normalize_value(after)
+        if not same:
+            changes[key] = [before, after]
+    return changes
+
+
+def select_documents(args) -> List[int]:
+    db = SessionLocal()
+    try:
+        query = db.query(Document.id).filter(Document.status.in_(args.status))
+        if args.user_id:
+            query = query.filter(Document.user_id == args.user_id)
+        if args.document_id:
+            query = query.filter(Document.id.in_(args.document_id))
+        if args.since:
+            query = query.filter(Document.created_at >= args.since)
+        if args.until:
+            query = query.filter(Document.created_at < args.until)
+        if args.file_type:
+            query = query.filter(Document.file_type == args.file_type)
+        if not args.include_edited:
+            query = query.filter(~exists().where(ExtractedDataEdit.document_id == Document.id))
+        query = query.order_by(Document.id)
+        if args.limit:
+            query = query.limit(args.limit)
+        return [document_id for (document_id,) in query]
+    finally:
+        db.close()
+
+
+def reextract(document_id: int, dry_run: bool) -> Dict[str, Any]:
+    """Extract one document again; returns its outcome and, for dry runs, the changed fields"""
+    db = SessionLocal()
+    try:
+        document = db.query(Document).filter(Document.id == document_id).first()
+        if document is None:
+            return {"outcome": "missing"}
+        file_path = upload_path(document.file_path)
+        if not os.path.exists(file_path):
+            return {"outcome": "failed", "error": "file not found"}
+        stored = db.query(ExtractedData).filter(ExtractedData.document_id == document_id).first()
+        stored_data = dict(stored.data or {}) if stored else {}
+        stored_version = stored.version if stored else None
+        # Do not hold a connection during the model calls
+        db.commit()
+
+        data, raw_text = document_extractor.extract_with_text(file_path, document.file_type)
+        if "error" in data:
+            return {"outcome": "failed", "error": data["error"]}
+
+        changes = diff_fields(stored_data, data)
+        if dry_run or (stored is not None and not changes):
+            return {"outcome": "changed" if changes else "unchanged", "changes": changes}
+
+        if stored is None:
+            db.add(ExtractedData(document_id=document_id, data=data, coordinates={}, confidence_scores={}))
+        else:
+            db.refresh(stored)
+            if stored.version != stored_version:
+                return {"outcome": "conflict"}
+            stored.data = data
+            stored.provisional = False
+        document.status = "processed"
+        retrieval.index_document(db, document, data, raw_text)
+        db.commit()
+        return {"outcome": "updated", "changes": changes}
+    except StaleDataError:
+        db.rollback()
+        return {"outcome": "conflict"}
+    except Exception as e:
+        db.rollback()
+        return {"outcome": "failed", "error": str(e)}
+    finally:
+        db.close()
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def format_value(value: Any, width: int = 40) -> str:
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= width else text[:width - 1] + "…"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", nargs="+", default=["processed"], help="Document statuses to include")
+    parser.add_argument("--user-id", type=int)
+    parser.add_argument("--document-id", type=int, nargs="+")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="Uploaded on or after (ISO date)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Uploaded before (ISO date)")
+    parser.add_argument("--file-type", choices=["image", "pdf"])
+    parser.add_argument("--limit", type=int)
+    parser.add_argument("--workers", type=int, default=4, help="Documents extracted in parallel")
+    parser.add_argument("--rate", type=float, default=0, help="Documents started per minute, 0 for no limit")
+    parser.add_argument("--checkpoint", default="reextract.checkpoint.jsonl")
+    parser.add_argument("--restart", action="store_true", help="Ignore and discard the checkpoint")
+    parser.add_argument("--retry-failed", action="store_true", help="Run documents that failed last time again")
+    parser.add_argument("--dry-run", action="store_true", help="Show field changes without saving")
+    parser.add_argument("--diff-file", help="With --dry-run, write changes as JSON lines")
+    parser.add_argument("--include-edited", action="store_true", help="Also replace data users have edited")
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint(None if args.dry_run else args.checkpoint)
+    if args.restart:
+        checkpoint.reset()
+    finished = checkpoint.load(args.retry_failed)
+    selected = select_documents(args)
+    pending = [document_id for document_id in selected if document_id not in finished]
+    print(f"{len(selected)} documents selected, {len(selected) - len(pending)} already done, "
+          f"{len(pending)} to {'check' if args.dry_run else 're-extract'}")
+    if not pending:
+        return
+
+    limiter = RateLimiter(args.rate)
+    outcomes = Counter()
+    changed_fields = Counter()
+    diff_file = open(args.diff_file, "w", encoding="utf-8") if args.dry_run and args.diff_file else None
+
+    def run(document_id: int):
+        limiter.wait()
+        started = time.perf_counter()
+        return reextract(document_id, args.dry_run), time.perf_counter() - started
+
+    started = time.monotonic()
+    last_report = started
+    executor = ThreadPoolExecutor(max_workers=max(args.workers, 1))
+    try:
+        futures = {executor.submit(run, document_id): document_id for document_id in pending}
+        for done, future in enumerate(as_completed(futures), start=1):
+            document_id = futures[future]
+            result, seconds = future.result()
+            outcome = result["outcome"]
+            outcomes[outcome] += 1
+            checkpoint.record(document_id, outcome, seconds)
+
+            changes = result.get("changes") or {}
+            changed_fields.update(changes.keys())
+            if outcome == "failed":
+                print(f"  #{document_id}: failed ({result.get('error')})")
+            elif args.dry_run and changes:
+                print(f"  #{document_id}:")
+                for field, (before, after) in changes.items():
+                    print(f"      {field}: {format_value(before)} → {format_value(after)}")
+                if diff_file:
+                    diff_file.write(json.dumps({"document_id": document_id, "changes": changes}, default=str) + "\n")
+
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL_SECONDS or done == len(pending):
+                last_report = now
+                rate = done / max(now - started, 1e-6)
+                print(f"[{done}/{len(pending)}] {rate * 60:.1f} docs/min, "
+                      f"elapsed {format_duration(now - started)}, "
+                      f"ETA {format_duration((len(pending) - done) / rate)}, "
+                      + ", ".join(f"{name} {count}" for name, count in sorted(outcomes.items())))
+    except KeyboardInterrupt:
+        print("\n⚠️  Interrupted; run the same command again to resume")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise SystemExit(130)
+    finally:
+        executor.shutdown(wait=True)
+        if diff_file:
+            diff_file.close()
+
+    print("=" * 60)
+    print("Outcomes: " + ", ".join(f"{name} {count}" for name, count in sorted(outcomes.items())))
+    if changed_fields:
+        print("Fields changed: " + ", ".join(f"{field} {count}" for field, count in changed_fields.most_common()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Resumable chunked uploads (tus-style).
+
+A client creates an upload session, sends the file as fixed-size chunks with
+PATCH (in any order and in parallel), asks which chunks arrived with HEAD
+after a dropped connection, and finalizes. Each chunk is streamed straight
+to its offset in a preallocated '<session id>.part' file and verified
+against the Upload-Checksum header as it is written, so the server never
+holds more than a small buffer of a request and finalizing is a rename:
+the assembled file is never read back or copied.
+
+Headers follow tus 1.0 where it applies: Upload-Offset, Upload-Length and
+Upload-Checksum ('<algorithm> <base64 digest>'). Unlike tus core, a PATCH
+may start at any chunk boundary rather than only at the current end, which
+is what allows parallel chunks; HEAD reports the received chunks in
+Upload-Chunks as well as the contiguous Upload-Offset.
+"""
+import base64
+import hashlib
+import os
+from typing import AsyncIterator, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from config import settings
+
+CHECKSUM_ALGORITHMS = {"md5", "sha1", "sha256"}
+
+# Data received is buffered up to this size before each write
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class ChecksumMismatch(ValueError):
+    """A chunk's content does not match its Upload-Checksum header"""
+
+
+class ChunkLengthMismatch(ValueError):
+    """A chunk is shorter or longer than its position in the file requires"""
+
+
+def part_path(session_id: str) -> str:
+    return os.path.join(settings.UPLOAD_DIR, f"{session_id}.part")
+
+
+def chunk_count(file_size: int, chunk_size: int) -> int:
+    return (file_size + chunk_size - 1) // chunk_size
+
+
+def chunk_length(file_size: int, chunk_size: int, chunk_index: int) -> int:
+    """Expected length of a chunk (the last one may be shorter)"""
+    return min(chunk_size, file_size - chunk_index * chunk_size)
+
+
+def contiguous_offset(file_size: int, chunk_size: int, received) -> int:
+    """Bytes received without a gap from the start of the file"""
+    received = set(received)
+    index = 0
+    while index in received:
+        index += 1
+    return min(index * chunk_size, file_size)
+
+
+def parse_checksum(header: str) -> Tuple[str, bytes]:
+    """Parse 'sha256 <base64 digest>' into (algorithm, digest)"""
+    try:
+        algorithm, encoded = header.strip().split(" ", 1)
+        digest = base64.b64decode(encoded.strip(), validate=True)
+    except ValueError:
+        raise ValueError("Upload-Checksum must be '<algorithm> <base64 digest>'")
+    algorithm = algorithm.lower()
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise ValueError(f"Unsupported checksum algorithm '{algorithm}'")
+    return algorithm, digest
+
+
+def create_part_file(session_id: str, file_size: int):
+    """Preallocate the file so chunks can be written at their offsets in any order"""
+    with open(part_path(session_id), "wb") as part:
+        part.truncate(file_size)
+
+
+def _write_at(fd: int, data: bytes, offset: int):
+    if hasattr(os, "pwrite"):
+        while data:
+            written = os.pwrite(fd, data, offset)
+            data = data[written:]
+            offset += written
+    else:  # Windows; each request has its own descriptor, so seeking is safe
+        os.lseek(fd, offset, os.SEEK_SET)
+        while data:
+            data = data[os.write(fd, data):]
+
+
+async def write_chunk(
+    session_id: str,
+    offset: int,
+    expected_length: int,
+    body: AsyncIterator[bytes],
+    checksum: Optional[str] = None
+):
+    """
+    Stream a request body to its offset in the part file, checking its length
+    and checksum. Raises ChunkLengthMismatch or ChecksumMismatch; the chunk
+    must then be sent again (whatever was written is overwritten by the retry).
+    """
+    algorithm, expected_digest = parse_checksum(checksum) if checksum else (None, None)
+    digest = hashlib.new(algorithm) if algorithm else None
+    received = 0
+    buffer = bytearray()
+
+    fd = os.open(part_path(session_id), os.O_WRONLY | getattr(os, "O_BINARY", 0))
+    try:
+        async for piece in body:
+            received += len(piece)
+            if received > expected_length:
+                raise ChunkLengthMismatch(f"Chunk is longer than {expected_length} bytes")
+            if digest:
+                digest.update(piece)
+            buffer += piece
+            if len(buffer) >= WRITE_BUFFER_SIZE:
+                await run_in_threadpool(_write_at, fd, bytes(buffer), offset + received - len(buffer))
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(_write_at, fd, bytes(buffer), offset + received - len(buffer))
+    finally:
+        os.close(fd)
+
+    if received != expected_length:
+        raise ChunkLengthMismatch(f"Chunk has {received} bytes, expected {expected_length}")
+    if digest and digest.digest() != expected_digest:
+        raise ChecksumMismatch(f"{algorithm} checksum does not match")
+
+
+def complete_part_file(session_id: str, unique_filename: str):
+    """Move a fully received part file to its final name (a rename, no copy)"""
+    os.replace(part_path(session_id), os.path.join(settings.UPLOAD_DIR, unique_filename))
@@ -0,0 +1,223 @@
+"""
+Per-user retrieval index for cross-document chat.
+
+At extraction time each document's OCR text and structured fields are split
+into chunks, embedded once and stored in the document_chunks table as
+float32 vectors. Queries load the user's vectors into a NumPy matrix (cached
+per worker and reloaded when the user's chunks change) and only the top-k
+snippets are put into the prompt, so prompt size stays bounded no matter
+how many documents a user has.
+"""
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from models import Document, DocumentChunk, ExtractedData
+from model_registry import get_provider
+from config import settings
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    """Split text into paragraph-aligned chunks of at most max_chars"""
+    chunks: List[str] = []
+    current = ""
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def describe_fields(document: Document, data: Dict[str, Any]) -> str:
+    """Render structured fields as text for embedding and prompting"""
+    lines = [f'Document "{document.filename}" (id {document.id})']
+    for key, value in data.items():
+        if value in (None, "", []) or key in ("error", "raw_response"):
+            continue
+        if key == "line_items" and isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    lines.append(f"line item: {item.get('description')} - {item.get('amount')}")
+                else:
+                    lines.append(f"line item: {item}")
+        else:
+            lines.append(f"{key}: {value}")
+    return "\n".join(lines)
+
+
+def embed_texts(texts: List[str], task_type: str) -> "np.ndarray":
+    """Embed texts as L2-normalized float32 vectors"""
+    import numpy as np
+
+    vectors = np.asarray(get_provider().embed(texts, task_type), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _build_chunks(document: Document, data: Optional[Dict[str, Any]], raw_text: str) -> List[Tuple[str, str]]:
+    chunks = []
+    if isinstance(data, dict) and "error" not in data:
+        chunks.extend(("fields", chunk) for chunk in chunk_text(describe_fields(document, data), settings.RETRIEVAL_CHUNK_CHARS))
+    header = f'[{document.filename}]\n'
+    chunks.extend(("text", header + chunk) for chunk in chunk_text(raw_text or "", settings.RETRIEVAL_CHUNK_CHARS))
+    return chunks[:settings.RETRIEVAL_MAX_CHUNKS_PER_DOCUMENT]
+
+
+def index_document(db: Session, document: Document, data: Optional[Dict[str, Any]], raw_text: str = ""):
+    """(Re)build the chunks and embeddings of one document"""
+    db.query(DocumentChunk).filter(DocumentChunk.document_id == document.id).delete(synchronize_session=False)
+    chunks = _build_chunks(document, data, raw_text)
+    if chunks:
+        vectors = embed_texts([content for _, content in chunks], "retrieval_document")
+        db.add_all([
+            DocumentChunk(
+                document_id=document.id,
+                user_id=document.user_id,
+                chunk_index=index,
+                source=source,
+                content=content,
+                embedding=vector.tobytes()
+            )
+            for index, ((source, content), vector) in enumerate(zip(chunks, vectors))
+        ])
+    # Recorded even without chunks, so the backfill does not pick the document up again
+    # (updated_at is kept: indexing does not change the document)
+    db.query(Document).filter(Document.id == document.id).update(
+        {Document.indexed_at: func.now(), Document.updated_at: Document.updated_at},
+        synchronize_session=False
+    )
+    db.commit()
+
+
+def index_fields(db: Session, document: Document, data: Optional[Dict[str, Any]]):
+    """Rebuild only the structured-field chunks of a document, e.g. after a user edit; its text chunks stay"""
+    db.query(DocumentChunk).filter(
+        DocumentChunk.document_id == document.id,
+        DocumentChunk.source == "fields"
+    ).delete(synchronize_session=False)
+    chunks = _build_chunks(document, data, "")
+    if chunks:
+        vectors = embed_texts([content for _, content in chunks], "retrieval_document")
+        # Field chunks come first in a document, as index_document numbers them
+        db.add_all([
+            DocumentChunk(
+                document_id=document.id,
+                user_id=document.user_id,
+                chunk_index=index,
+                source=source,
+                content=content,
+                embedding=vector.tobytes()
+            )
+            for index, ((source, content), vector) in enumerate(zip(chunks, vectors))
+        ])
+    db.query(Document).filter(Document.id == document.id).update(
+        {Document.indexed_at: func.now(), Document.updated_at: Document.updated_at},
+        synchronize_session=False
+    )
+    db.commit()
+
+
+def index_missing_documents(db: Session, user_id: int, limit: int):
+    """Index the structured fields of processed documents that predate the index"""
+    indexed = db.query(DocumentChunk.document_id).filter(DocumentChunk.user_id == user_id)
+    missing = db.query(Document, ExtractedData).join(
+        ExtractedData, ExtractedData.document_id == Document.id
+    ).filter(
+        Document.user_id == user_id,
+        Document.indexed_at.is_(None),
+        ExtractedData.provisional.is_(False),
+        Document.id.notin_(indexed)
+    ).limit(limit).all()
+    for document, extracted in missing:
+        try:
+            index_document(db, document, extracted.data)
+        except Exception as e:
+            print(f"Error indexing document {document.id}: {e}")
+            db.rollback()
+            break
+
+
+class UserIndexCache:
+    """LRU cache of per-user embedding matrices, validated against the database"""
+
+    def __init__(self, max_users: int):
+        self.max_users = max_users
+        self._indexes: "OrderedDict[int, Tuple[tuple, np.ndarray, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, user_id: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Return (chunk ids, embedding matrix) for a user"""
+        import numpy as np
+
+        signature = tuple(db.query(func.count(DocumentChunk.id), func.max(DocumentChunk.id)).filter(
+            DocumentChunk.user_id == user_id
+        ).one())
+        with self._lock:
+            cached = self._indexes.get(user_id)
+            if cached and cached[0] == signature:
+                self._indexes.move_to_end(user_id)
+                return cached[1], cached[2]
+
+        rows = db.query(DocumentChunk.id, DocumentChunk.embedding).filter(
+            DocumentChunk.user_id == user_id
+        ).order_by(DocumentChunk.id).all()
+        ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+        matrix = np.vstack([np.frombuffer(row.embedding, dtype=np.float32) for row in rows]) if rows else np.empty((0, 0), dtype=np.float32)
+
+        with self._lock:
+            self._indexes[user_id] = (signature, ids, matrix)
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return ids, matrix
+
+
+user_indexes = UserIndexCache(max_users=settings.RETRIEVAL_CACHED_USERS)
+
+
+def search(db: Session, user_id: int, query: str, top_k: int) -> List[Dict[str, Any]]:
+    """Return the top-k chunks of a user's documents most relevant to a query"""
+    import numpy as np
+
+    index_missing_documents(db, user_id, settings.RETRIEVAL_BACKFILL_LIMIT)
+    ids, matrix = user_indexes.get(db, user_id)
+    if not len(ids):
+        return []
+
+    query_vector = embed_texts([query], "retrieval_query")[0]
+    scores = matrix @ query_vector
+    top_k = min(top_k, len(ids))
+    top = np.argpartition(-scores, top_k - 1)[:top_k]
+    top = top[np.argsort(-scores[top])]
+    score_by_id = {int(ids[i]): float(scores[i]) for i in top}
+
+    rows = db.query(DocumentChunk, Document.filename).join(
+        Document, Document.id == DocumentChunk.document_id
+    ).filter(DocumentChunk.id.in_(list(score_by_id))).all()
+    results = [
+        {
+            "document_id": chunk.document_id,
+            "filename": filename,
+            "source": chunk.source,
+            "content": chunk.content,
+            "score": round(score_by_id[chunk.id], 4)
+        }
+        for chunk, filename in rows
+    ]
+    return sorted(results, key=lambda result: result["score"], reverse=True)
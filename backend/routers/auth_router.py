@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from database import get_db
 from models import User
 from schemas import UserCreate, UserLogin, AuthResponse, User as UserSchema
+from serialization import json_response, user_dict
 from auth import (
     get_password_hash,
     authenticate_user,
@@ -39,10 +40,10 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     # Create access token
     access_token = create_access_token(data={"sub": new_user.email})
     
-    return {
+    return json_response({
         "token": access_token,
-        "user": UserSchema.model_validate(new_user)
-    }
+        "user": user_dict(new_user)
+    })
 
 
 @router.post("/login", response_model=AuthResponse)
@@ -59,10 +60,10 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     # Create access token
     access_token = create_access_token(data={"sub": user.email})
     
-    return {
+    return json_response({
         "token": access_token,
-        "user": UserSchema.model_validate(user)
-    }
+        "user": user_dict(user)
+    })
 
 
 @router.get("/profile", response_model=UserSchema)
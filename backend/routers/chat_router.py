@@ -1,15 +1,43 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import Response
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from database import get_db
 from models import User, Document, ChatMessage, ExtractedData
-from schemas import ChatMessageCreate, ChatMessage as ChatMessageSchema, ChatResponse
+from schemas import (
+    ChatMessageCreate,
+    ChatMessage as ChatMessageSchema,
+    ChatResponse,
+    CrossDocumentChatRequest,
+    CrossDocumentChatResponse
+)
 from auth import get_current_user
-from ai_service import chatbot
+from ai_service import chatbot, CHAT_ERROR_RESPONSE
+from answer_cache import answer_cache, history_digest, normalize_question
+from fast_answers import answer_locally
+from metrics import metrics
+from serialization import CHAT_HISTORY_COLUMNS, chat_history_json
+from singleflight import chat_flight
+import retrieval
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
 
 
+def messages_since(document: Document) -> list:
+    """
+    A document has no messages older than itself; saying so lets PostgreSQL
+    skip the chat_messages partitions from before it was uploaded
+    """
+    return [ChatMessage.created_at >= document.created_at] if document.created_at else []
+
+
+def ask_model(**kwargs) -> str:
+    """Run by the chat_flight leader only, so coalesced requests are not counted as calls"""
+    metrics.increment("chat.model_calls")
+    return chatbot.answer_question(**kwargs)
+
+
 @router.post("/message", response_model=ChatResponse)
 async def send_message(
     chat_data: ChatMessageCreate,
@@ -43,7 +71,8 @@ async def send_message(
     # Get chat history for context
     chat_history = db.query(ChatMessage).filter(
         ChatMessage.document_id == chat_data.document_id,
-        ChatMessage.user_id == current_user.id
+        ChatMessage.user_id == current_user.id,
+        *messages_since(document)
     ).order_by(ChatMessage.created_at.desc()).limit(10).all()
     
     # Prepare history for AI
@@ -52,18 +81,36 @@ async def send_message(
         for msg in reversed(chat_history)
     ]
     
-    # Get AI response
-    try:
-        ai_response = chatbot.answer_question(
-            question=chat_data.message,
-            extracted_data=extracted_data.data,
-            chat_history=history_list
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"AI service error: {str(e)}"
-        )
+    # Direct field lookups are answered from the stored data, repeat questions
+    # on unchanged data come from the cache, everything else goes to the model
+    metrics.increment("chat.turns")
+    ai_response = answer_locally(chat_data.message, extracted_data.data)
+    if ai_response is not None:
+        metrics.increment("chat.local_answers")
+    else:
+        # Follow-ups depend on the conversation, so answers are shared only within the same one
+        context = history_digest(history_list)
+        version = f"v{extracted_data.version}" + (f"-{context}" if context else "")
+        ai_response = answer_cache.get(chat_data.document_id, version, chat_data.message)
+    if ai_response is None:
+        # The same question on the same data already being answered (a retried
+        # request, a second tab) waits for that answer instead of a second call
+        try:
+            ai_response = await run_in_threadpool(
+                chat_flight.do,
+                (chat_data.document_id, version, normalize_question(chat_data.message)),
+                ask_model,
+                question=chat_data.message,
+                extracted_data=extracted_data.data,
+                chat_history=history_list
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"AI service error: {str(e)}"
+            )
+        if ai_response != CHAT_ERROR_RESPONSE:
+            answer_cache.set(chat_data.document_id, version, chat_data.message, ai_response)
     
     # Save user message
     user_message = ChatMessage(
@@ -94,6 +141,39 @@ async def send_message(
     }
 
 
+@router.post("/ask", response_model=CrossDocumentChatResponse)
+async def ask_across_documents(
+    chat_data: CrossDocumentChatRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Ask a question about all of the user's documents"""
+    # Embedding, backfill indexing and the model call all block; keep them off the event loop
+    try:
+        snippets = await run_in_threadpool(retrieval.search, db, current_user.id, chat_data.message, chat_data.top_k)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Retrieval error: {str(e)}"
+        )
+    
+    ai_response = await run_in_threadpool(chatbot.answer_across_documents, chat_data.message, snippets)
+    
+    # One source entry per document, in order of best match
+    sources = {}
+    for snippet in snippets:
+        sources.setdefault(snippet["document_id"], {
+            "document_id": snippet["document_id"],
+            "filename": snippet["filename"],
+            "score": snippet["score"]
+        })
+    
+    return {
+        "response": ai_response,
+        "sources": list(sources.values())
+    }
+
+
 @router.get("/history/{document_id}", response_model=List[dict])
 async def get_chat_history(
     document_id: int,
@@ -114,30 +194,14 @@ async def get_chat_history(
         )
     
     # Get chat messages
-    messages = db.query(ChatMessage).filter(
+    rows = db.query(*CHAT_HISTORY_COLUMNS).filter(
         ChatMessage.document_id == document_id,
-        ChatMessage.user_id == current_user.id
+        ChatMessage.user_id == current_user.id,
+        *messages_since(document)
     ).order_by(ChatMessage.created_at.asc()).all()
     
-    # Format messages for frontend
-    formatted_messages = []
-    for msg in messages:
-        if msg.sender == "user" and msg.message:
-            formatted_messages.append({
-                "id": msg.id,
-                "text": msg.message,
-                "sender": "user",
-                "timestamp": msg.created_at.isoformat()
-            })
-        elif msg.sender == "ai" and msg.response:
-            formatted_messages.append({
-                "id": msg.id,
-                "text": msg.response,
-                "sender": "ai",
-                "timestamp": msg.created_at.isoformat()
-            })
-    
-    return formatted_messages
+    # Formatted for the frontend and serialized in one pass
+    return Response(content=chat_history_json(rows), media_type="application/json")
 
 
 @router.delete("/history/{document_id}")
@@ -162,7 +226,8 @@ async def clear_chat_history(
     # Delete all chat messages
     db.query(ChatMessage).filter(
         ChatMessage.document_id == document_id,
-        ChatMessage.user_id == current_user.id
+        ChatMessage.user_id == current_user.id,
+        *messages_since(document)
     ).delete()
     
     db.commit()
@@ -1,15 +1,38 @@
 import os
+import re
 import shutil
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status, BackgroundTasks
-from fastapi.responses import FileResponse, StreamingResponse
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import APIRouter, Body, Depends, HTTPException, UploadFile, File, Query, Request, status, BackgroundTasks
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
-from database import get_db
-from models import User, Document, ExtractedData
-from schemas import Document as DocumentSchema, ExtractedData as ExtractedDataSchema
+from sqlalchemy.orm.exc import StaleDataError
+from starlette.concurrency import run_in_threadpool
+from database import get_db, SessionLocal
+from models import User, Document, ExtractedData, ExtractedDataEdit
+from schemas import (
+    Document as DocumentSchema,
+    ExtractedData as ExtractedDataSchema,
+    ExtractedDataEdit as ExtractedDataEditSchema,
+    ExtractedDataUpdateResponse,
+    BulkDeleteRequest,
+    BulkDeleteResponse
+)
 from auth import get_current_user
 from ai_service import document_extractor
+from answer_cache import answer_cache
+import retrieval
+from jobs import jobs
+from singleflight import extraction_flight, file_digest
+from storage import delete_documents, file_purger, upload_path
+import previews
 from config import settings
+from serialization import DOCUMENT_COLUMNS, documents_json, json_response
+from http_cache import conditional, make_etag, precondition_failed
+from json_patch import JSONPatchError, JSONPatchTestFailed, apply_patch, merge_operations
+from exporters import EXPORT_FORMATS, STREAMERS, build_export_query, check_export_format, iter_documents
 import json
 import csv
 from io import StringIO
@@ -20,35 +43,219 @@ router = APIRouter(prefix="/api/documents", tags=["Documents"])
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
 
-def process_document(document_id: int, file_path: str, file_type: str, db: Session):
-    """Background task to process document and extract data"""
+def ensure_previews(db: Session, document: Document) -> int:
+    """Render a document's thumbnail and page previews and record how many pages have one"""
     try:
-        # Update status to processing
-        document = db.query(Document).filter(Document.id == document_id).first()
-        document.status = "processing"
-        db.commit()
-        
-        # Extract structured data using AI
-        extracted_data = document_extractor.extract_structured_data(file_path, file_type)
-        
-        # Save extracted data
-        extracted_data_obj = ExtractedData(
+        pages = previews.generate_previews(upload_path(document.file_path), document.file_type)
+    except Exception as e:
+        print(f"Error generating previews for document {document.id}: {e}")
+        pages = 0
+    document.preview_pages = pages
+    db.commit()
+    return pages
+
+
+# Share of the whole pipeline (percent) covered by each stage
+STAGE_PROGRESS = {
+    "previews": (0, 5),
+    "text": (5, 60),
+    "structuring": (60, 95),
+    "indexing": (95, 100),
+    "done": (100, 100),
+}
+
+
+class ProgressReporter:
+    """Records a document's processing stage and progress, writing only when it moves by a few percent"""
+
+    def __init__(self, document_id: int):
+        self.document_id = document_id
+        self._last = (None, 0)
+
+    def __call__(self, stage: str, done: int = 0, total: int = 1):
+        start, end = STAGE_PROGRESS[stage]
+        progress = start + (end - start) * min(done, total) // max(total, 1)
+        if stage == self._last[0] and progress - self._last[1] < 5 and progress != end:
+            return
+        self._last = (stage, progress)
+        # Own session: this runs between the processing session's reads and writes
+        db = SessionLocal()
+        try:
+            db.execute(update(Document).where(Document.id == self.document_id).values(
+                processing_stage=stage, processing_progress=progress
+            ))
+            db.commit()
+        except Exception as e:
+            print(f"Error recording progress of document {self.document_id}: {e}")
+        finally:
+            db.close()
+
+
+def save_provisional_data(document_id: int, header: dict):
+    """Store first-page header fields as a provisional result until the full extraction is saved"""
+    db = SessionLocal()
+    try:
+        if db.query(ExtractedData.id).filter(ExtractedData.document_id == document_id).first():
+            return
+        db.add(ExtractedData(
             document_id=document_id,
-            data=extracted_data,
-            coordinates={},  # TODO: Implement coordinate extraction
-            confidence_scores={}
-        )
-        db.add(extracted_data_obj)
-        
-        # Update document status
-        document.status = "processed"
+            data={**header, "line_items": []},
+            coordinates={},
+            confidence_scores={},
+            provisional=True
+        ))
         db.commit()
-        
+        print(f"Saved first-page fields of document {document_id}")
+    except Exception as e:
+        print(f"Error saving first-page fields of document {document_id}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def reindex_fields(document_id: int):
+    """Background task: bring a document's field chunks for cross-document chat up to date after an edit"""
+    db = SessionLocal()
+    try:
+        # The current data, so of two quick edits the last one is what ends up indexed
+        row = db.query(Document, ExtractedData).join(
+            ExtractedData, ExtractedData.document_id == Document.id
+        ).filter(Document.id == document_id).first()
+        if row is not None:
+            retrieval.index_fields(db, row[0], row[1].data)
     except Exception as e:
-        print(f"Error processing document {document_id}: {e}")
-        document = db.query(Document).filter(Document.id == document_id).first()
-        document.status = "failed"
+        print(f"Error re-indexing fields of document {document_id}: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def process_document(document_id: int, file_path: str, file_type: str):
+    """Background task to process document and extract data"""
+    # The request's session is closed by the time background tasks run
+    db = SessionLocal()
+    report = ProgressReporter(document_id)
+    with jobs.track(document_id):
+        try:
+            # Update status to processing
+            document = db.query(Document).filter(Document.id == document_id).first()
+            if document is None or document.status == "processed":
+                return
+            document.status = "processing"
+            document.processing_attempts = (document.processing_attempts or 0) + 1
+            db.commit()
+            
+            # Previews first, so the viewer can show the document during extraction
+            if document.preview_pages is None:
+                report("previews")
+                ensure_previews(db, document)
+            
+            # Extract structured data using AI; multi-page documents get their
+            # header fields saved as soon as page one has been read. An identical
+            # file already being extracted (a double-clicked upload) shares that
+            # extraction, whose progress is reported on the other document.
+            report("text")
+            extracted_data, raw_text = extraction_flight.do(
+                (file_digest(file_path), file_type),
+                document_extractor.extract_with_text,
+                file_path,
+                file_type,
+                on_stage=report,
+                on_partial=lambda header: save_provisional_data(document_id, header)
+            )
+            
+            # Save extracted data, replacing the provisional result if there is one
+            extracted_data_obj = db.query(ExtractedData).filter(
+                ExtractedData.document_id == document_id
+            ).first()
+            if extracted_data_obj is None:
+                db.add(ExtractedData(
+                    document_id=document_id,
+                    data=extracted_data,
+                    coordinates={},  # TODO: Implement coordinate extraction
+                    confidence_scores={}
+                ))
+            else:
+                extracted_data_obj.data = extracted_data
+                extracted_data_obj.provisional = False
+            
+            # Update document status
+            document.status = "processed"
+            db.commit()
+            answer_cache.invalidate_document(document_id)
+            
+            # Index text and fields for cross-document chat
+            report("indexing")
+            try:
+                retrieval.index_document(db, document, extracted_data, raw_text)
+            except Exception as e:
+                print(f"Error indexing document {document_id}: {e}")
+                db.rollback()
+            report("done")
+            
+        except Exception as e:
+            print(f"Error processing document {document_id}: {e}")
+            db.rollback()
+            document = db.query(Document).filter(Document.id == document_id).first()
+            if document is not None:
+                document.status = "failed"
+                db.commit()
+        finally:
+            db.close()
+
+
+ALLOWED_CONTENT_TYPES = ["image/jpeg", "image/png", "image/jpg", "application/pdf"]
+
+
+def check_content_type(content_type: Optional[str]) -> str:
+    """Validate an upload's content type and return the document file type"""
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid file type. Only JPEG, PNG, and PDF are allowed."
+        )
+    return "image" if content_type.startswith("image/") else "pdf"
+
+
+def stored_filename(user_id: int, filename: str) -> str:
+    """Unique name in the upload directory for a user's file"""
+    # Random part instead of counting the upload directory, which is slow on
+    # large directories and reuses names once files have been deleted
+    return f"{user_id}_{uuid.uuid4().hex[:12]}_{os.path.basename(filename)}"
+
+
+def register_document(
+    db: Session,
+    background_tasks: BackgroundTasks,
+    user: User,
+    filename: str,
+    unique_filename: str,
+    file_type: str
+) -> Document:
+    """Create the Document for a saved file and queue its processing"""
+    file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
+    new_document = Document(
+        user_id=user.id,
+        filename=filename,
+        file_path=f"/uploads/{unique_filename}",
+        file_type=file_type,
+        file_size=os.path.getsize(file_path),
+        status="pending"
+    )
+    
+    db.add(new_document)
+    try:
         db.commit()
+    except Exception:
+        db.rollback()
+        file_purger.purge([file_path])
+        raise
+    db.refresh(new_document)
+    
+    # Process document in background
+    background_tasks.add_task(process_document, new_document.id, file_path, file_type)
+    
+    return new_document
 
 
 @router.post("/upload", response_model=DocumentSchema)
@@ -58,21 +265,11 @@ async def upload_document(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Upload a document (image or PDF)"""
-    # Validate file type
-    allowed_types = ["image/jpeg", "image/png", "image/jpg", "application/pdf"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid file type. Only JPEG, PNG, and PDF are allowed."
-        )
-    
-    # Determine file type
-    file_type = "image" if file.content_type.startswith("image/") else "pdf"
+    """Upload a document (image or PDF) in one request; see /uploads for resumable uploads"""
+    file_type = check_content_type(file.content_type)
     
     # Generate unique filename
-    file_extension = file.filename.split(".")[-1]
-    unique_filename = f"{current_user.id}_{len(os.listdir(settings.UPLOAD_DIR))}_{file.filename}"
+    unique_filename = stored_filename(current_user.id, file.filename)
     file_path = os.path.join(settings.UPLOAD_DIR, unique_filename)
     
     # Save file
@@ -85,45 +282,69 @@ async def upload_document(
             detail=f"Failed to save file: {str(e)}"
         )
     
-    # Get file size
-    file_size = os.path.getsize(file_path)
-    
-    # Create document record
-    new_document = Document(
-        user_id=current_user.id,
-        filename=file.filename,
-        file_path=f"/uploads/{unique_filename}",
-        file_type=file_type,
-        file_size=file_size,
-        status="pending"
-    )
-    
-    db.add(new_document)
-    db.commit()
-    db.refresh(new_document)
-    
-    # Process document in background
-    background_tasks.add_task(process_document, new_document.id, file_path, file_type, db)
-    
-    return new_document
+    return register_document(db, background_tasks, current_user, file.filename, unique_filename, file_type)
 
 
 @router.get("", response_model=List[DocumentSchema])
 async def get_documents(
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get all documents for current user"""
-    documents = db.query(Document).filter(
+    # Any upload, status change or deletion changes one of these
+    count, last_modified, max_id = db.query(
+        func.count(Document.id),
+        func.max(func.coalesce(Document.updated_at, Document.created_at)),
+        func.max(Document.id)
+    ).filter(Document.user_id == current_user.id).one()
+    not_modified, headers = conditional(
+        request, make_etag("documents", current_user.id, count, max_id, last_modified), last_modified
+    )
+    if not_modified:
+        return not_modified
+    
+    rows = db.query(*DOCUMENT_COLUMNS).filter(
         Document.user_id == current_user.id
     ).order_by(Document.created_at.desc()).all()
     
-    return documents
+    return Response(content=documents_json(rows), media_type="application/json", headers=headers)
+
+
+@router.get("/export/{format}")
+async def export_documents(
+    format: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    vendor: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream extracted data for many documents as CSV, NDJSON, Parquet or XLSX"""
+    error = check_export_format(format)
+    if error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error
+        )
+    
+    user_id = current_user.id
+    records = iter_documents(lambda db: build_export_query(
+        db, user_id, date_from=date_from, date_to=date_to, vendor=vendor, status=status_filter
+    ))
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        STREAMERS[format](records),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=extracted_data.{extension}"}
+    )
 
 
 @router.get("/{document_id}", response_model=DocumentSchema)
 async def get_document(
     document_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -139,12 +360,70 @@ async def get_document(
             detail="Document not found"
         )
     
+    last_modified = document.updated_at or document.created_at
+    not_modified, headers = conditional(request, make_etag("document", document.id, last_modified), last_modified)
+    if not_modified:
+        return not_modified
+    response.headers.update(headers)
+    
     return document
 
 
+@router.get("/{document_id}/previews/{name}")
+async def get_preview(
+    document_id: int,
+    name: str,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """WebP thumbnail ('thumbnail') or low-resolution page render ('page-1', 'page-2', ...)"""
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.user_id == current_user.id
+    ).first()
+    
+    if not document:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
+    
+    # Documents uploaded before previews existed get them on first view
+    if document.preview_pages is None:
+        await run_in_threadpool(ensure_previews, db, document)
+    
+    source = upload_path(document.file_path)
+    page = re.fullmatch(r"page-(\d+)", name)
+    if name == "thumbnail" and document.preview_pages:
+        path = previews.thumbnail_path(source)
+    elif page and 1 <= int(page.group(1)) <= (document.preview_pages or 0):
+        path = previews.page_path(source, int(page.group(1)))
+    else:
+        path = None
+    if path is None or not os.path.exists(path):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Preview not found"
+        )
+    
+    # Previews never change once rendered, so browsers may keep them without revalidating
+    stat = os.stat(path)
+    last_modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc)
+    not_modified, headers = conditional(
+        request, make_etag("preview", document.id, name, stat.st_mtime_ns, stat.st_size), last_modified
+    )
+    headers["Cache-Control"] = f"private, max-age={settings.PREVIEW_CACHE_SECONDS}"
+    if not_modified:
+        not_modified.headers["Cache-Control"] = headers["Cache-Control"]
+        return not_modified
+    return FileResponse(path, media_type="image/webp", headers=headers)
+
+
 @router.get("/{document_id}/extracted-data")
 async def get_extracted_data(
     document_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -170,17 +449,28 @@ async def get_extracted_data(
             detail="Extracted data not available yet"
         )
     
-    return extracted_data.data
+    last_modified = extracted_data.updated_at or extracted_data.created_at
+    not_modified, headers = conditional(request, data_etag(extracted_data), last_modified)
+    if not_modified:
+        return not_modified
+    
+    return json_response(extracted_data.data, headers=headers)
 
 
-@router.put("/{document_id}/extracted-data")
-async def update_extracted_data(
+def data_etag(extracted_data: ExtractedData) -> str:
+    """Version-based ETag of a document's extracted data, also used for If-Match"""
+    return f'"{extracted_data.document_id}-{extracted_data.version}"'
+
+
+def save_edit(
+    request: Request,
+    background_tasks: BackgroundTasks,
     document_id: int,
-    data: dict,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User,
+    db: Session,
+    operations: List[dict]
 ):
-    """Update extracted data"""
+    """Apply JSON Patch operations to a document's extracted data and log them"""
     document = db.query(Document).filter(
         Document.id == document_id,
         Document.user_id == current_user.id
@@ -202,23 +492,88 @@ async def update_extracted_data(
             detail="Extracted data not found"
         )
     
-    # Update data
-    current_data = extracted_data.data
-    current_data.update(data)
-    extracted_data.data = current_data
+    # The full extraction replaces provisional data, edits would be lost
+    if extracted_data.provisional:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Extraction is still in progress, edit the data once it has finished"
+        )
     
-    db.commit()
+    # Optimistic concurrency: the client names the version it edited
+    if precondition_failed(request, data_etag(extracted_data)):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"Extracted data has changed (current version {extracted_data.version})",
+            headers={"ETag": data_etag(extracted_data)}
+        )
+    
+    # Copy-on-write: assigning a new object is what marks the JSON column dirty
+    try:
+        extracted_data.data = apply_patch(extracted_data.data, operations)
+    except JSONPatchTestFailed as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except JSONPatchError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
     
-    return {"message": "Data updated successfully"}
+    db.add(ExtractedDataEdit(
+        document_id=document_id,
+        user_id=current_user.id,
+        version=extracted_data.version + 1,
+        operations=operations
+    ))
+    try:
+        db.commit()
+    except StaleDataError:
+        # Another request saved between our read and write
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Extracted data was modified by another request, reload and retry"
+        )
+    answer_cache.invalidate_document(document_id)
+    # Cross-document answers quote the field chunks, which still hold the old values
+    background_tasks.add_task(reindex_fields, document_id)
+    
+    return json_response(
+        {"message": "Data updated successfully", "version": extracted_data.version},
+        headers={"ETag": data_etag(extracted_data)}
+    )
 
 
-@router.delete("/{document_id}")
-async def delete_document(
+@router.put("/{document_id}/extracted-data", response_model=ExtractedDataUpdateResponse)
+async def update_extracted_data(
     document_id: int,
+    data: dict,
+    request: Request,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Delete a document"""
+    """Update top-level fields of the extracted data (honours If-Match)"""
+    return save_edit(request, background_tasks, document_id, current_user, db, merge_operations(data))
+
+
+@router.patch("/{document_id}/extracted-data", response_model=ExtractedDataUpdateResponse)
+async def patch_extracted_data(
+    document_id: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    operations: List[dict] = Body(...),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Apply an RFC 6902 JSON Patch to the extracted data (honours If-Match)"""
+    return save_edit(request, background_tasks, document_id, current_user, db, operations)
+
+
+@router.get("/{document_id}/extracted-data/edits", response_model=List[ExtractedDataEditSchema])
+async def get_extracted_data_edits(
+    document_id: int,
+    since_version: int = 0,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Edit history of a document's extracted data, oldest first"""
     document = db.query(Document).filter(
         Document.id == document_id,
         Document.user_id == current_user.id
@@ -230,14 +585,41 @@ async def delete_document(
             detail="Document not found"
         )
     
-    # Delete file
-    file_path = os.path.join(settings.UPLOAD_DIR, os.path.basename(document.file_path))
-    if os.path.exists(file_path):
-        os.remove(file_path)
+    return db.query(ExtractedDataEdit).filter(
+        ExtractedDataEdit.document_id == document_id,
+        ExtractedDataEdit.version > since_version
+    ).order_by(ExtractedDataEdit.id).all()
+
+
+@router.post("/bulk-delete", response_model=BulkDeleteResponse)
+async def bulk_delete_documents(
+    request_data: BulkDeleteRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete several documents at once"""
+    requested = list(dict.fromkeys(request_data.document_ids))
+    deleted = delete_documents(db, current_user.id, requested)
     
-    # Delete from database
-    db.delete(document)
-    db.commit()
+    deleted_set = set(deleted)
+    return {
+        "deleted": deleted,
+        "not_found": [document_id for document_id in requested if document_id not in deleted_set]
+    }
+
+
+@router.delete("/{document_id}")
+async def delete_document(
+    document_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Delete a document"""
+    if not delete_documents(db, current_user.id, [document_id]):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document not found"
+        )
     
     return {"message": "Document deleted successfully"}
 
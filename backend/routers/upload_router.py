@@ -0,0 +1,264 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Request, status
+from fastapi.responses import Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import get_db
+from models import User, UploadSession, UploadChunk
+from schemas import (
+    Document as DocumentSchema,
+    UploadSession as UploadSessionSchema,
+    UploadSessionCreate
+)
+from auth import get_current_user
+from config import settings
+from metrics import metrics
+from storage import file_purger
+from routers.document_router import check_content_type, register_document, stored_filename
+import resumable_uploads
+from resumable_uploads import ChecksumMismatch, ChunkLengthMismatch
+
+router = APIRouter(prefix="/api/documents/uploads", tags=["Uploads"])
+
+# tus returns 460 for a chunk whose checksum does not match
+HTTP_460_CHECKSUM_MISMATCH = 460
+
+
+def expires_at(session: UploadSession) -> datetime:
+    created_at = session.created_at
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at + timedelta(seconds=settings.UPLOAD_SESSION_TTL_SECONDS)
+
+
+def get_session(db: Session, session_id: str, user: User, for_update: bool = False) -> UploadSession:
+    query = db.query(UploadSession).filter(
+        UploadSession.id == session_id,
+        UploadSession.user_id == user.id
+    )
+    if for_update:
+        query = query.with_for_update()
+    session = query.first()
+
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    if expires_at(session) < datetime.now(timezone.utc):
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Upload has expired, start a new one"
+        )
+    return session
+
+
+def received_chunks(db: Session, session_id: str):
+    return [index for (index,) in db.query(UploadChunk.chunk_index).filter(
+        UploadChunk.session_id == session_id
+    ).order_by(UploadChunk.chunk_index)]
+
+
+def session_response(db: Session, session: UploadSession) -> dict:
+    return {
+        "id": session.id,
+        "filename": session.filename,
+        "size": session.file_size,
+        "chunk_size": session.chunk_size,
+        "chunk_count": resumable_uploads.chunk_count(session.file_size, session.chunk_size),
+        "received_chunks": received_chunks(db, session.id),
+        "expires_at": expires_at(session)
+    }
+
+
+@router.post("", response_model=UploadSessionSchema, status_code=status.HTTP_201_CREATED)
+async def create_upload(
+    upload: UploadSessionCreate,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Start a resumable upload; the file is then sent in chunks with PATCH"""
+    check_content_type(upload.content_type)
+    if upload.size > settings.RESUMABLE_UPLOAD_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File is larger than {settings.RESUMABLE_UPLOAD_MAX_SIZE} bytes"
+        )
+    chunk_size = upload.chunk_size or settings.UPLOAD_CHUNK_SIZE
+    if not settings.UPLOAD_MIN_CHUNK_SIZE <= chunk_size <= settings.UPLOAD_MAX_CHUNK_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"chunk_size must be between {settings.UPLOAD_MIN_CHUNK_SIZE} and {settings.UPLOAD_MAX_CHUNK_SIZE}"
+        )
+
+    session = UploadSession(
+        id=uuid.uuid4().hex,
+        user_id=current_user.id,
+        filename=upload.filename,
+        content_type=upload.content_type,
+        file_size=upload.size,
+        chunk_size=chunk_size
+    )
+    try:
+        resumable_uploads.create_part_file(session.id, upload.size)
+    except OSError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create upload: {str(e)}"
+        )
+    db.add(session)
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        file_purger.purge([resumable_uploads.part_path(session.id)])
+        raise
+    db.refresh(session)
+    metrics.increment("uploads.sessions_created")
+
+    response.headers["Location"] = f"{router.prefix}/{session.id}"
+    return session_response(db, session)
+
+
+@router.get("/{session_id}", response_model=UploadSessionSchema)
+async def get_upload(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Upload progress, including which chunks have been received"""
+    return session_response(db, get_session(db, session_id, current_user))
+
+
+@router.head("/{session_id}")
+async def head_upload(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """tus-style offset check for resuming"""
+    session = get_session(db, session_id, current_user)
+    received = received_chunks(db, session.id)
+    return Response(status_code=status.HTTP_200_OK, headers={
+        "Upload-Length": str(session.file_size),
+        "Upload-Offset": str(resumable_uploads.contiguous_offset(session.file_size, session.chunk_size, received)),
+        "Upload-Chunks": ",".join(map(str, received)),
+        "Cache-Control": "no-store"
+    })
+
+
+@router.patch("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def upload_chunk(
+    session_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset"),
+    upload_checksum: Optional[str] = Header(None, alias="Upload-Checksum"),
+    content_type: Optional[str] = Header(None, alias="Content-Type"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Write one chunk at Upload-Offset (a multiple of the chunk size); chunks may arrive in parallel"""
+    if content_type != "application/offset+octet-stream":
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Chunks must be sent as application/offset+octet-stream"
+        )
+    session = get_session(db, session_id, current_user)
+    file_size, chunk_size = session.file_size, session.chunk_size
+    if upload_offset < 0 or upload_offset >= file_size or upload_offset % chunk_size:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload-Offset must be a multiple of {chunk_size} below {file_size}"
+        )
+    chunk_index = upload_offset // chunk_size
+    expected_length = resumable_uploads.chunk_length(file_size, chunk_size, chunk_index)
+    # Do not hold a database connection while the chunk streams in
+    db.commit()
+
+    try:
+        await resumable_uploads.write_chunk(
+            session_id, upload_offset, expected_length, request.stream(), upload_checksum
+        )
+    except ChecksumMismatch as e:
+        metrics.increment("uploads.checksum_mismatches")
+        raise HTTPException(status_code=HTTP_460_CHECKSUM_MISMATCH, detail=str(e))
+    except ChunkLengthMismatch as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ValueError as e:  # Malformed Upload-Checksum
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found")
+
+    db.merge(UploadChunk(session_id=session_id, chunk_index=chunk_index, checksum=upload_checksum))
+    try:
+        db.commit()
+    except IntegrityError:
+        # The same chunk was retried concurrently and the other request recorded it
+        db.rollback()
+    metrics.increment("uploads.chunks")
+    metrics.increment("uploads.bytes", expected_length)
+
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={
+        "Upload-Offset": str(upload_offset + expected_length)
+    })
+
+
+@router.post("/{session_id}/finalize", response_model=DocumentSchema)
+async def finalize_upload(
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Turn a fully received upload into a document and start processing it"""
+    # Locked so that two finalize requests cannot both create a document
+    session = get_session(db, session_id, current_user, for_update=True)
+    expected = resumable_uploads.chunk_count(session.file_size, session.chunk_size)
+    received = len(received_chunks(db, session.id))
+    if received < expected:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{expected - received} of {expected} chunks have not been received"
+        )
+
+    unique_filename = stored_filename(current_user.id, session.filename)
+    try:
+        resumable_uploads.complete_part_file(session.id, unique_filename)
+    except OSError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save file: {str(e)}"
+        )
+
+    # Committed together with the new document
+    filename, file_type = session.filename, check_content_type(session.content_type)
+    db.delete(session)
+    metrics.increment("uploads.completed")
+    return register_document(db, background_tasks, current_user, filename, unique_filename, file_type)
+
+
+@router.delete("/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def cancel_upload(
+    session_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Abandon an upload and remove what was received"""
+    session = db.query(UploadSession).filter(
+        UploadSession.id == session_id,
+        UploadSession.user_id == current_user.id
+    ).first()
+
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+
+    db.delete(session)
+    db.commit()
+    file_purger.purge([resumable_uploads.part_path(session_id)])
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
@@ -55,6 +55,9 @@ class Document(DocumentBase):
     file_path: str
     file_size: int
     status: str
+    preview_pages: Optional[int] = None
+    processing_stage: Optional[str] = None
+    processing_progress: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime]
 
@@ -62,6 +65,32 @@ class Document(DocumentBase):
         from_attributes = True
 
 
+class BulkDeleteRequest(BaseModel):
+    document_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class BulkDeleteResponse(BaseModel):
+    deleted: List[int]
+    not_found: List[int]
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    content_type: str
+    size: int = Field(..., gt=0)
+    chunk_size: Optional[int] = Field(None, gt=0)  # Defaults to UPLOAD_CHUNK_SIZE
+
+
+class UploadSession(BaseModel):
+    id: str
+    filename: str
+    size: int
+    chunk_size: int
+    chunk_count: int
+    received_chunks: List[int]
+    expires_at: datetime
+
+
 class DocumentWithData(Document):
     extracted_data: Optional[Dict[str, Any]] = None
 
@@ -80,6 +109,8 @@ class ExtractedDataCreate(ExtractedDataBase):
 class ExtractedData(ExtractedDataBase):
     id: int
     document_id: int
+    version: int
+    provisional: bool = False
     created_at: datetime
     updated_at: Optional[datetime]
 
@@ -87,6 +118,91 @@ class ExtractedData(ExtractedDataBase):
         from_attributes = True
 
 
+class ExtractedDataEdit(BaseModel):
+    id: int
+    user_id: int
+    version: int
+    operations: List[Dict[str, Any]]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ExtractedDataUpdateResponse(BaseModel):
+    message: str
+    version: int
+
+
+# Structured Extraction Schemas
+def parse_amount(value: Any) -> Any:
+    """Accept amounts like "$1,234.50" or "(12.00)" as numbers"""
+    if isinstance(value, str):
+        cleaned = value.strip()
+        negative = cleaned.startswith("(") and cleaned.endswith(")")
+        cleaned = "".join(ch for ch in cleaned if ch.isdigit() or ch in ".-")
+        if not cleaned:
+            return None
+        try:
+            amount = float(cleaned)
+        except ValueError:
+            return None
+        return -amount if negative else amount
+    return value
+
+
+class LineItem(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    description: Optional[str] = None
+    quantity: Optional[float] = None
+    unit_price: Optional[float] = None
+    amount: Optional[float] = None
+
+    @field_validator("quantity", "unit_price", "amount", mode="before")
+    @classmethod
+    def _amounts_as_numbers(cls, value: Any) -> Any:
+        return parse_amount(value)
+
+
+class BillData(BaseModel):
+    """Fields extracted from utility bills, receipts and invoices"""
+    model_config = ConfigDict(extra="allow")
+
+    vendor_name: Optional[str] = None
+    vendor_address: Optional[str] = None
+    document_type: Optional[str] = None
+    document_number: Optional[str] = None
+    date: Optional[str] = None
+    due_date: Optional[str] = None
+    total_amount: Optional[float] = None
+    currency: Optional[str] = None
+    tax_amount: Optional[float] = None
+    subtotal: Optional[float] = None
+    line_items: Optional[List[LineItem]] = None
+    payment_method: Optional[str] = None
+    account_number: Optional[str] = None
+
+    @field_validator("total_amount", "tax_amount", "subtotal", mode="before")
+    @classmethod
+    def _amounts_as_numbers(cls, value: Any) -> Any:
+        return parse_amount(value)
+
+    @field_validator("document_number", "account_number", mode="before")
+    @classmethod
+    def _identifier_as_string(cls, value: Any) -> Any:
+        return str(value) if isinstance(value, (int, float)) else value
+
+    @field_validator("line_items", mode="before")
+    @classmethod
+    def _line_items_as_list(cls, value: Any) -> Any:
+        if isinstance(value, dict):
+            return [value]
+        if isinstance(value, list):
+            return [item if isinstance(item, dict) else {"description": str(item)} for item in value]
+        return value
+
+
 # Chat Schemas
 class ChatMessageBase(BaseModel):
     message: str
@@ -114,6 +230,22 @@ class ChatResponse(BaseModel):
     message_id: int
 
 
+class CrossDocumentChatRequest(BaseModel):
+    message: str
+    top_k: int = Field(8, ge=1, le=50)
+
+
+class ChatSource(BaseModel):
+    document_id: int
+    filename: str
+    score: float
+
+
+class CrossDocumentChatResponse(BaseModel):
+    response: str
+    sources: List[ChatSource]
+
+
 # Response Schemas
 class AuthResponse(BaseModel):
     token: str
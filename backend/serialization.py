@@ -0,0 +1,69 @@
+"""
+Direct-to-bytes JSON for the hot read endpoints.
+
+The document list and chat history endpoints select only the columns they
+return and serialize the rows with orjson in one call, skipping per-row
+Pydantic validation and jsonable_encoder. The output has the same fields,
+order and datetime format as the response schemas.
+"""
+from typing import Any, Dict, Iterable, Optional
+import orjson
+from fastapi.responses import Response
+from models import ChatMessage, Document, User
+
+# Same fields and order as schemas.Document
+DOCUMENT_COLUMNS = [
+    Document.filename,
+    Document.file_type,
+    Document.id,
+    Document.user_id,
+    Document.file_path,
+    Document.file_size,
+    Document.status,
+    Document.preview_pages,
+    Document.processing_stage,
+    Document.processing_progress,
+    Document.created_at,
+    Document.updated_at,
+]
+
+CHAT_HISTORY_COLUMNS = [
+    ChatMessage.id,
+    ChatMessage.sender,
+    ChatMessage.message,
+    ChatMessage.response,
+    ChatMessage.created_at,
+]
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Response for an already JSON-compatible value (dicts, lists, datetimes)"""
+    return Response(content=orjson.dumps(content), status_code=status_code, media_type="application/json",
+                    headers=headers)
+
+
+def documents_json(rows: Iterable) -> bytes:
+    """Serialize rows selected with DOCUMENT_COLUMNS"""
+    return orjson.dumps([row._asdict() for row in rows])
+
+
+def chat_history_json(rows: Iterable) -> bytes:
+    """Serialize rows selected with CHAT_HISTORY_COLUMNS in the frontend's message format"""
+    messages = []
+    for id, sender, message, response, created_at in rows:
+        text = message if sender == "user" else response if sender == "ai" else None
+        if text:
+            messages.append({"id": id, "text": text, "sender": sender, "timestamp": created_at})
+    return orjson.dumps(messages)
+
+
+def user_dict(user: User) -> Dict[str, Any]:
+    """Same fields as schemas.User, without model validation"""
+    return {
+        "email": user.email,
+        "name": user.name,
+        "id": user.id,
+        "is_active": user.is_active,
+        "created_at": user.created_at,
+        "updated_at": user.updated_at,
+    }
@@ -0,0 +1,133 @@
+"""
+Production server entry point.
+
+Usage:
+    python serve.py [--workers N] [--bind 0.0.0.0:8000]
+
+Runs the API under gunicorn with uvicorn workers. The app is imported once in
+the master (preload) and the database is initialized there before workers
+fork, so workers start quickly and never race on schema creation. On SIGTERM
+each worker stops accepting connections, finishes open requests and waits for
+running extractions for up to WEB_GRACEFUL_TIMEOUT seconds. Documents that
+were still processing are picked up again by the next launch.
+
+Where gunicorn is unavailable (Windows development) it falls back to
+uvicorn's own multi-process mode without preloading.
+"""
+import argparse
+import os
+import time
+from config import settings
+
+try:
+    from uvicorn.workers import UvicornWorker
+
+    class AppWorker(UvicornWorker):
+        """Uvicorn worker that bounds how long open connections may delay shutdown"""
+
+        CONFIG_KWARGS = {
+            **UvicornWorker.CONFIG_KWARGS,
+            "timeout_graceful_shutdown": settings.WEB_GRACEFUL_TIMEOUT // 2,
+        }
+except ImportError:
+    AppWorker = None
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring affinity masks and cgroup quotas"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as file:
+            quota, period = file.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def worker_count() -> int:
+    """Worker processes to run: WEB_WORKERS, or one per CPU within [2, WEB_MAX_WORKERS]"""
+    if settings.WEB_WORKERS > 0:
+        return settings.WEB_WORKERS
+    # Requests mostly wait on the model, so one event loop per CPU is enough;
+    # each worker also owns a PDF parsing pool of PDF_PARSE_WORKERS processes
+    return max(2, min(available_cpus(), settings.WEB_MAX_WORKERS))
+
+
+def prepare():
+    """One-time startup work in the master, before any worker exists"""
+    from database import engine, init_db
+
+    os.environ["APP_STARTED_AT"] = str(time.time())
+    init_db()
+    os.environ["APP_DB_INITIALIZED"] = "1"
+    # Connections opened here must not be shared with forked workers
+    engine.dispose()
+    print("Database initialized successfully")
+
+
+def run_gunicorn(bind: str, workers: int):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": bind,
+                "workers": workers,
+                "worker_class": "serve.AppWorker",
+                "preload_app": True,
+                "graceful_timeout": settings.WEB_GRACEFUL_TIMEOUT,
+                "timeout": 60,
+                "keepalive": settings.WEB_KEEPALIVE,
+                "max_requests": settings.WEB_MAX_REQUESTS,
+                "max_requests_jitter": settings.WEB_MAX_REQUESTS // 10,
+                "forwarded_allow_ips": "*",
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from main import app
+            return app
+
+    Application().run()
+
+
+def run_uvicorn(host: str, port: int, workers: int):
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        timeout_keep_alive=settings.WEB_KEEPALIVE,
+        timeout_graceful_shutdown=settings.WEB_GRACEFUL_TIMEOUT // 2,
+        limit_max_requests=settings.WEB_MAX_REQUESTS or None,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: sized from CPUs)")
+    parser.add_argument("--bind", default=f"{settings.WEB_HOST}:{settings.WEB_PORT}")
+    args = parser.parse_args()
+
+    workers = args.workers or worker_count()
+    host, _, port = args.bind.rpartition(":")
+    prepare()
+    print(f"Starting {workers} workers on {args.bind} (graceful timeout {settings.WEB_GRACEFUL_TIMEOUT}s)")
+    if AppWorker is not None:
+        run_gunicorn(args.bind, workers)
+    else:
+        run_uvicorn(host, int(port), workers)
+
+
+if __name__ == "__main__":
+    main()
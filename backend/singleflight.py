@@ -0,0 +1,85 @@
+"""
+Coalescing of identical in-flight model calls.
+
+A double-clicked upload, a retried chat request or two tabs open on one
+document all start the same model work at the same time. A SingleFlight
+group runs the first call for a key and makes every identical call that
+arrives while it is running wait for that result (or exception) instead of
+calling the model again. Nothing is kept once the call returns; repeated
+work after that is the caches' business.
+
+Keys: extraction uses the file's content hash, chat uses the document,
+its extracted data version, the chat history digest and the normalized
+question. Groups are per
+worker process.
+"""
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+from metrics import metrics
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs one call per key at a time and shares its outcome with concurrent callers"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, function: Callable, *args, **kwargs) -> Any:
+        """Return function(*args, **kwargs), or the result of the identical call already running"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            metrics.increment(f"singleflight.{self.name}.saved")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.increment(f"singleflight.{self.name}.calls")
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Later callers start a new call; waiters already hold this one
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+extraction_flight = SingleFlight("extraction")
+chat_flight = SingleFlight("chat")
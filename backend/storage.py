@@ -0,0 +1,124 @@
+"""
+Uploaded file storage helpers and the background file purger.
+
+Deleting a document only removes database rows in the request; its files are
+handed to the purger, which removes them on a background thread and retries
+with exponential backoff when removal fails (e.g. a file still open on
+Windows or a flaky network mount). Files that still cannot be removed are
+left for the storage sweeper to collect as orphans.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Iterable, List, Optional, Tuple
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+from config import settings
+from metrics import metrics
+from models import Document
+from answer_cache import answer_cache
+import previews
+
+
+def upload_path(file_path: str) -> str:
+    """Location on disk of a stored Document.file_path ('/uploads/<name>')"""
+    return os.path.join(settings.UPLOAD_DIR, os.path.basename(file_path))
+
+
+class FilePurger:
+    """Removes files on a background thread with retries"""
+
+    def __init__(self, max_attempts: int, retry_seconds: float):
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        # (due time, sequence, path, attempt)
+        self._queue: List[Tuple[float, int, str, int]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def purge(self, paths: Iterable[str]):
+        """Queue files for removal and return immediately"""
+        with self._condition:
+            for path in paths:
+                heapq.heappush(self._queue, (time.monotonic(), next(self._sequence), path, 1))
+            self._ensure_thread()
+            self._condition.notify()
+
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._queue)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="file-purger", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue or (self._queue[0][0] > time.monotonic() and not self._stopping):
+                    if self._stopping and not self._queue:
+                        return
+                    timeout = self._queue[0][0] - time.monotonic() if self._queue else None
+                    self._condition.wait(timeout)
+                _, _, path, attempt = heapq.heappop(self._queue)
+            self._remove(path, attempt)
+
+    def _remove(self, path: str, attempt: int):
+        try:
+            os.remove(path)
+            metrics.increment("storage.files_purged")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            if attempt >= self.max_attempts or self._stopping:
+                print(f"Giving up removing {path} after {attempt} attempts: {e}")
+                metrics.increment("storage.purge_failures")
+                return
+            delay = self.retry_seconds * 2 ** (attempt - 1)
+            with self._condition:
+                heapq.heappush(self._queue, (time.monotonic() + delay, next(self._sequence), path, attempt + 1))
+                self._condition.notify()
+
+    def shutdown(self, timeout: float = 5):
+        """Make one last attempt at every queued file, ignoring backoff"""
+        with self._condition:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join(timeout)
+        self._thread = None
+
+
+file_purger = FilePurger(
+    max_attempts=settings.FILE_PURGE_MAX_ATTEMPTS,
+    retry_seconds=settings.FILE_PURGE_RETRY_SECONDS
+)
+
+
+def delete_documents(db: Session, user_id: Optional[int], document_ids: List[int]) -> List[int]:
+    """
+    Delete documents with one statement and return the ids actually deleted.
+    Extracted data, chat messages, chunks and edits go with them through ON
+    DELETE CASCADE; files and previews are removed afterwards by the
+    background purger.
+    user_id=None skips the ownership check (retention and storage sweeps).
+    """
+    statement = delete(Document).where(Document.id.in_(document_ids))
+    if user_id is not None:
+        statement = statement.where(Document.user_id == user_id)
+    deleted = db.execute(statement.returning(Document.id, Document.file_path, Document.preview_pages)).all()
+    db.commit()
+    
+    for _, file_path, preview_pages in deleted:
+        source = upload_path(file_path)
+        file_purger.purge([source] + previews.preview_paths(source, preview_pages))
+    for document_id, _, _ in deleted:
+        answer_cache.invalidate_document(document_id)
+    return [document_id for document_id, _, _ in deleted]
@@ -0,0 +1,353 @@
+"""
+Storage sweeper: reconciles the upload directory with the documents table.
+
+Usage:
+    python storage_gc.py [--dry-run]
+
+Each sweep:
+  * streams the upload directory with os.scandir and removes files no
+    document references (e.g. saved by an upload whose commit failed),
+    including previews whose original has gone,
+  * removes documents whose file has disappeared and that can no longer be
+    processed (pending, processing or failed); processed ones are reported,
+  * applies retention: RETENTION_DAYS_BY_STATUS (e.g. failed uploads after
+    30 days) and RETENTION_DAYS_BY_USER,
+  * removes resumable uploads left unfinished for UPLOAD_SESSION_TTL_SECONDS,
+  * moves chat messages older than CHAT_ARCHIVE_DAYS to chat_messages_archive
+    (whole monthly partitions when chat_messages is partitioned),
+and reports what it found and the bytes reclaimed. Deletions are rate
+limited so a sweep never competes with user traffic. In the server a sweep
+runs every STORAGE_GC_INTERVAL_SECONDS in whichever worker takes the
+PostgreSQL advisory lock first.
+"""
+import argparse
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional
+from sqlalchemy import delete, func, insert, select, text
+from config import settings
+from database import SessionLocal, engine
+from metrics import metrics
+from models import ChatMessage, ChatMessageArchive, Document, UploadSession
+from storage import delete_documents, upload_path
+import partitions
+import previews
+import resumable_uploads
+
+# Arbitrary application-wide key for pg_try_advisory_lock
+SWEEP_LOCK_KEY = 7_310_042
+
+# Files the sweeper never touches (in-progress writes, dotfiles)
+IGNORED_SUFFIXES = (".part", ".tmp")
+
+ARCHIVE_COLUMNS = ["id", "user_id", "document_id", "message", "response", "sender", "created_at"]
+
+
+@dataclass
+class SweepReport:
+    files_scanned: int = 0
+    orphan_files: int = 0
+    dangling_rows: int = 0
+    dangling_processed: int = 0  # Processed documents without a file (kept)
+    retention_deleted: int = 0
+    expired_uploads: int = 0
+    archived_messages: int = 0
+    reclaimed_bytes: int = 0
+    seconds: float = 0.0
+
+
+class RateLimiter:
+    """Blocks so that at most per_second operations happen per second"""
+
+    def __init__(self, per_second: float):
+        self.interval = 1 / per_second if per_second > 0 else 0
+        self._next = time.monotonic()
+
+    def wait(self, count: int = 1):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self._next > now:
+            time.sleep(self._next - now)
+        self._next = max(self._next, now) + self.interval * count
+
+
+@contextmanager
+def sweep_lock() -> Iterator[bool]:
+    """Hold a cluster-wide lock for the sweep; yields False if another worker has it"""
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    with engine.connect() as connection:
+        acquired = connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": SWEEP_LOCK_KEY}).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SWEEP_LOCK_KEY})
+
+
+def _grace_cutoff() -> float:
+    return time.time() - settings.STORAGE_GC_GRACE_SECONDS
+
+
+def sweep_orphan_files(report: SweepReport, limiter: RateLimiter, dry_run: bool):
+    """Remove files in the upload directory that no document references"""
+    cutoff = _grace_cutoff()
+    batch: List[os.DirEntry] = []
+
+    def stored_path(entry: os.DirEntry) -> str:
+        # Previews belong to the document of their original
+        return f"/uploads/{previews.original_name(entry.name) or entry.name}"
+
+    def flush():
+        names = list({stored_path(entry) for entry in batch})
+        db = SessionLocal()
+        try:
+            referenced = {
+                path for (path,) in db.query(Document.file_path).filter(Document.file_path.in_(names))
+            }
+        finally:
+            db.close()
+        for entry in batch:
+            if stored_path(entry) in referenced:
+                continue
+            try:
+                size = entry.stat().st_size
+                if not dry_run:
+                    limiter.wait()
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"Could not remove orphan file {entry.path}: {e}")
+                continue
+            report.orphan_files += 1
+            report.reclaimed_bytes += size
+        batch.clear()
+
+    with os.scandir(settings.UPLOAD_DIR) as entries:
+        for entry in entries:
+            if entry.name.startswith(".") or entry.name.endswith(IGNORED_SUFFIXES) or not entry.is_file():
+                continue
+            report.files_scanned += 1
+            # Recent files may belong to an upload that has not committed yet
+            if entry.stat().st_mtime > cutoff:
+                continue
+            batch.append(entry)
+            if len(batch) >= settings.STORAGE_GC_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+
+
+def sweep_dangling_rows(report: SweepReport, limiter: RateLimiter, dry_run: bool):
+    """Remove unprocessed documents whose file is gone; count processed ones"""
+    created_before = datetime.now(timezone.utc) - timedelta(seconds=settings.STORAGE_GC_GRACE_SECONDS)
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(Document.id, Document.file_path, Document.status)
+            .where(Document.created_at < created_before)
+            .order_by(Document.id)
+            .execution_options(yield_per=settings.STORAGE_GC_BATCH_SIZE)
+        )
+        missing: List[int] = []
+        for document_id, file_path, status in rows:
+            if os.path.exists(upload_path(file_path)):
+                continue
+            if status == "processed":
+                report.dangling_processed += 1
+            else:
+                missing.append(document_id)
+    finally:
+        db.close()
+
+    report.dangling_rows += len(missing)
+    if not dry_run:
+        _delete_in_batches(missing, limiter)
+
+
+def sweep_retention(report: SweepReport, limiter: RateLimiter, dry_run: bool):
+    """Delete documents past their retention period, by status and by user"""
+    now = datetime.now(timezone.utc)
+    rules = [
+        (Document.status == status, days) for status, days in settings.RETENTION_DAYS_BY_STATUS.items()
+    ] + [
+        (Document.user_id == int(user_id), days) for user_id, days in settings.RETENTION_DAYS_BY_USER.items()
+    ]
+    for condition, days in rules:
+        if not days or days <= 0:
+            continue
+        db = SessionLocal()
+        try:
+            expired = db.query(Document.id, Document.file_size).filter(
+                condition, Document.created_at < now - timedelta(days=days)
+            ).all()
+        finally:
+            db.close()
+        report.retention_deleted += len(expired)
+        report.reclaimed_bytes += sum(size or 0 for _, size in expired)
+        if not dry_run:
+            _delete_in_batches([document_id for document_id, _ in expired], limiter)
+
+
+def _delete_in_batches(document_ids: List[int], limiter: RateLimiter):
+    for start in range(0, len(document_ids), settings.STORAGE_GC_BATCH_SIZE):
+        batch = document_ids[start:start + settings.STORAGE_GC_BATCH_SIZE]
+        limiter.wait(len(batch))
+        db = SessionLocal()
+        try:
+            delete_documents(db, None, batch)
+        finally:
+            db.close()
+
+
+def sweep_upload_sessions(report: SweepReport, limiter: RateLimiter, dry_run: bool):
+    """Remove expired resumable uploads and their .part files"""
+    created_before = datetime.now(timezone.utc) - timedelta(seconds=settings.UPLOAD_SESSION_TTL_SECONDS)
+    db = SessionLocal()
+    try:
+        expired = db.query(UploadSession.id, UploadSession.file_size).filter(
+            UploadSession.created_at < created_before
+        ).all()
+        report.expired_uploads += len(expired)
+        report.reclaimed_bytes += sum(size for _, size in expired)
+        if dry_run:
+            return
+        for start in range(0, len(expired), settings.STORAGE_GC_BATCH_SIZE):
+            batch = [session_id for session_id, _ in expired[start:start + settings.STORAGE_GC_BATCH_SIZE]]
+            limiter.wait(len(batch))
+            db.execute(delete(UploadSession).where(UploadSession.id.in_(batch)))
+            db.commit()
+            for session_id in batch:
+                try:
+                    os.remove(resumable_uploads.part_path(session_id))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Could not remove upload {session_id}: {e}")
+    finally:
+        db.close()
+
+
+def archive_chat_history(report: SweepReport, limiter: RateLimiter, dry_run: bool):
+    """Move chat messages older than CHAT_ARCHIVE_DAYS into chat_messages_archive"""
+    if settings.CHAT_ARCHIVE_DAYS <= 0:
+        return
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.CHAT_ARCHIVE_DAYS)
+    columns = [getattr(ChatMessage, name) for name in ARCHIVE_COLUMNS]
+    if partitions.ensure_chat_partitions():
+        # Whole months move by detaching partitions; no rows are copied
+        if not dry_run:
+            report.archived_messages += partitions.archive_chat_partitions(cutoff)
+        return
+    if dry_run:
+        db = SessionLocal()
+        try:
+            report.archived_messages += db.query(func.count(ChatMessage.id)).filter(
+                ChatMessage.created_at < cutoff
+            ).scalar()
+        finally:
+            db.close()
+        return
+    while True:
+        db = SessionLocal()
+        try:
+            ids = [message_id for (message_id,) in db.query(ChatMessage.id).filter(
+                ChatMessage.created_at < cutoff
+            ).order_by(ChatMessage.id).limit(settings.STORAGE_GC_BATCH_SIZE)]
+            if not ids:
+                return
+            limiter.wait(len(ids))
+            # Copy and delete in one transaction so a message is never in both or neither
+            db.execute(insert(ChatMessageArchive).from_select(
+                ARCHIVE_COLUMNS, select(*columns).where(ChatMessage.id.in_(ids))
+            ))
+            db.execute(delete(ChatMessage).where(ChatMessage.id.in_(ids)))
+            db.commit()
+            report.archived_messages += len(ids)
+        finally:
+            db.close()
+
+
+def run_sweep(dry_run: bool = False) -> Optional[SweepReport]:
+    """Run every sweep step once; returns None if another worker is sweeping"""
+    with sweep_lock() as acquired:
+        if not acquired:
+            return None
+        started = time.perf_counter()
+        report = SweepReport()
+        limiter = RateLimiter(settings.STORAGE_GC_MAX_DELETES_PER_SECOND)
+        for step in (sweep_orphan_files, sweep_dangling_rows, sweep_retention, sweep_upload_sessions,
+                     archive_chat_history):
+            try:
+                step(report, limiter, dry_run)
+            except Exception as e:
+                print(f"Storage sweep step {step.__name__} failed: {e}")
+        report.seconds = round(time.perf_counter() - started, 3)
+
+    if not dry_run:
+        for name, value in asdict(report).items():
+            if name != "seconds":
+                metrics.increment(f"storage_gc.{name}", value)
+        metrics.increment("storage_gc.sweeps")
+    print(f"Storage sweep{' (dry run)' if dry_run else ''}: {format_report(report)}")
+    return report
+
+
+def format_report(report: SweepReport) -> str:
+    return (
+        f"{report.files_scanned} files scanned, {report.orphan_files} orphan files, "
+        f"{report.dangling_rows} dangling rows ({report.dangling_processed} processed kept), "
+        f"{report.retention_deleted} expired documents, {report.expired_uploads} expired uploads, "
+        f"{report.archived_messages} messages archived, "
+        f"{report.reclaimed_bytes / 1024 / 1024:.1f} MB reclaimed in {report.seconds:.1f}s"
+    )
+
+
+_thread: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def _loop():
+    # First sweep one interval after startup rather than during it
+    while not _stop.wait(settings.STORAGE_GC_INTERVAL_SECONDS):
+        try:
+            run_sweep()
+        except Exception as e:
+            print(f"Storage sweep failed: {e}")
+
+
+def start_storage_gc():
+    """Start periodic sweeps in this worker (called on application startup)"""
+    global _thread
+    if settings.STORAGE_GC_INTERVAL_SECONDS <= 0 or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="storage-gc", daemon=True)
+    _thread.start()
+
+
+def stop_storage_gc():
+    global _thread
+    _stop.set()
+    _thread = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be removed without removing it")
+    args = parser.parse_args()
+
+    report = run_sweep(dry_run=args.dry_run)
+    if report is None:
+        print("⚠️  Another process is sweeping, try again later")
+
+
+if __name__ == "__main__":
+    main()
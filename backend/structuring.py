@@ -0,0 +1,84 @@
+"""
+Helpers for structuring long documents with map-reduce.
+
+Long texts are split into page-aligned chunks that fit a token budget, each
+chunk is structured on its own, and the partial results are merged back into
+a single record.
+"""
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+
+def chunk_pages(pages: List[str], max_tokens: int, estimate_tokens: Callable[[str], int]) -> List[List[str]]:
+    """Greedily pack consecutive pages into chunks of at most max_tokens"""
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for page in pages:
+        page_tokens = estimate_tokens(page)
+        if current and current_tokens + page_tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        # A single page larger than the budget still becomes its own chunk
+        current.append(page)
+        current_tokens += page_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _normalize(value: Any) -> str:
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def _line_item_key(item: Any) -> tuple:
+    if not isinstance(item, dict):
+        return (_normalize(item),)
+    return (
+        _normalize(item.get("description")),
+        _normalize(item.get("quantity")),
+        _normalize(item.get("amount")),
+    )
+
+
+def merge_structured_chunks(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge per-chunk extraction results.
+
+    Header fields take the value most chunks agree on (first chunk wins ties),
+    line items are concatenated in page order with cross-chunk duplicates dropped.
+    """
+    successful = [result for result in results if "error" not in result]
+    if not successful:
+        return results[0] if results else {"error": "Could not extract structured data"}
+    if len(successful) < len(results):
+        print(f"Merging {len(successful)} of {len(results)} chunks; the others failed")
+
+    merged: Dict[str, Any] = {}
+    fields = []
+    for result in successful:
+        fields.extend(key for key in result if key not in fields and key != "line_items")
+
+    for field in fields:
+        values = [result[field] for result in successful if result.get(field) not in (None, "", [])]
+        if not values:
+            merged[field] = None
+            continue
+        counts = Counter(_normalize(value) for value in values)
+        best = max(counts.values())
+        merged[field] = next(value for value in values if counts[_normalize(value)] == best)
+
+    # Only drop items already reported by an earlier chunk (e.g. a summary page
+    # repeating charges); identical items within one chunk are real repeats
+    line_items = []
+    seen = set()
+    for result in successful:
+        chunk_items = result.get("line_items") or []
+        line_items.extend(item for item in chunk_items if _line_item_key(item) not in seen)
+        seen.update(_line_item_key(item) for item in chunk_items)
+    merged["line_items"] = line_items
+    return merged
@@ -0,0 +1,128 @@
+"""
+Tolerant, incremental JSON parsing for model responses.
+
+Model output may be wrapped in markdown fences, followed by prose, cut off
+by the output token limit or simply far too long. IncrementalJSONParser is
+fed the response chunk by chunk, stops as soon as the top-level value is
+complete (or the size limit is hit) and repairs truncated output by closing
+open strings and containers.
+"""
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class IncrementalJSONParser:
+    """Incrementally scan a streamed response for the first JSON object or array"""
+
+    def __init__(self, max_chars: int = 200000):
+        self.max_chars = max_chars
+        self.buffer = ""
+        self.truncated = False
+        self._start: Optional[int] = None
+        self._end: Optional[int] = None
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._safe_point: Optional[Tuple[int, List[str]]] = None
+        self._scanned = 0
+
+    @property
+    def done(self) -> bool:
+        """True once the top-level value is complete or the size limit was reached"""
+        return self._end is not None or self.truncated
+
+    def feed(self, chunk: str) -> bool:
+        """Consume a chunk of text; returns True when no more input is needed"""
+        if self.done:
+            return True
+        room = self.max_chars - len(self.buffer)
+        if len(chunk) > room:
+            chunk = chunk[:room]
+            self.truncated = True
+        self.buffer += chunk
+        self._scan()
+        return self.done
+
+    def _scan(self):
+        buffer = self.buffer
+        for index in range(self._scanned, len(buffer)):
+            char = buffer[index]
+            if self._start is None:
+                if char in _CLOSERS:
+                    self._start = index
+                    self._stack.append(char)
+                    self._safe_point = (index + 1, list(self._stack))
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in _CLOSERS:
+                self._stack.append(char)
+                self._safe_point = (index + 1, list(self._stack))
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self._end = index + 1
+                    self._scanned = index + 1
+                    return
+                self._safe_point = (index + 1, list(self._stack))
+            elif char == ",":
+                # Everything before a comma is a complete member/element
+                self._safe_point = (index, list(self._stack))
+        self._scanned = len(buffer)
+
+    def result(self) -> Any:
+        """Return the parsed value, repairing truncated output if needed"""
+        if self._start is None:
+            raise ValueError("No JSON object found in response")
+
+        if self._end is not None:
+            return _loads(self.buffer[self._start:self._end])
+
+        # Truncated: first try closing everything that is currently open
+        text = self.buffer[self._start:]
+        if self._in_string:
+            text += '"'
+        try:
+            return _loads(text + _closing(self._stack))
+        except ValueError:
+            pass
+
+        # Fall back to the last point where every value was complete
+        if self._safe_point is not None:
+            position, stack = self._safe_point
+            return _loads(self.buffer[self._start:position] + _closing(stack))
+        raise ValueError("Could not repair JSON response")
+
+
+def _closing(stack: List[str]) -> str:
+    return "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # Models occasionally leave trailing commas before a closing bracket
+        return json.loads(_TRAILING_COMMA.sub(r"\1", text))
+
+
+def parse_json_response(text: str, max_chars: int = 200000) -> Any:
+    """Parse a complete (possibly fenced, wrapped or truncated) model response"""
+    parser = IncrementalJSONParser(max_chars=max_chars)
+    parser.feed(text)
+    return parser.result()
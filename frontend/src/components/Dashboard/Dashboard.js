@@ -20,7 +20,8 @@ import {
 } from 'reactstrap';
 import { FiUpload, FiSearch, FiFile, FiTrash2, FiEye } from 'react-icons/fi';
 import Navbar from '../Layout/Navbar';
-import { documentAPI } from '../../services/api';
+import { documentAPI, RESUMABLE_UPLOAD_THRESHOLD } from '../../services/api';
+import PreviewImage from '../Workspace/PreviewImage';
 import {
   fetchDocumentsStart,
   fetchDocumentsSuccess,
@@ -85,7 +86,9 @@ const Dashboard = () => {
     formData.append('file', selectedFile);
 
     try {
-      const response = await documentAPI.upload(formData);
+      const response = selectedFile.size > RESUMABLE_UPLOAD_THRESHOLD
+        ? await documentAPI.uploadResumable(selectedFile)
+        : await documentAPI.upload(formData);
       dispatch(uploadDocumentSuccess(response.data));
       setUploadModal(false);
       setSelectedFile(null);
@@ -205,7 +208,17 @@ const Dashboard = () => {
                         {filteredDocuments.map((doc) => (
                           <tr key={doc.id}>
                             <td>
-                              <FiFile className="me-2" />
+                              {doc.preview_pages === 0 ? (
+                                <FiFile className="me-2" />
+                              ) : (
+                                <PreviewImage
+                                  documentId={doc.id}
+                                  name="thumbnail"
+                                  alt=""
+                                  className="document-thumbnail me-2"
+                                  fallback={<FiFile className="me-2" />}
+                                />
+                              )}
                               {doc.filename}
                             </td>
                             <td>
@@ -12,17 +12,19 @@ import {
   Badge,
   Spinner,
   ButtonGroup,
+  Alert,
 } from 'reactstrap';
 import { FiSave, FiDownload, FiCheckCircle, FiAlertCircle } from 'react-icons/fi';
 import { documentAPI } from '../../services/api';
 import { updateExtractedField } from '../../redux/slices/documentSlice';
 import './DataViewer.css';
 
-const DataViewer = ({ documentId, data }) => {
+const DataViewer = ({ documentId, data, etag, onSaved, onReload }) => {
   const dispatch = useDispatch();
   const [editedData, setEditedData] = useState({});
   const [saving, setSaving] = useState(false);
   const [saveSuccess, setSaveSuccess] = useState(false);
+  const [conflict, setConflict] = useState(false);
 
   const handleFieldChange = (field, value) => {
     setEditedData({
@@ -30,6 +32,7 @@ const DataViewer = ({ documentId, data }) => {
       [field]: value,
     });
     setSaveSuccess(false);
+    setConflict(false);
   };
 
   const handleSave = async () => {
@@ -37,8 +40,15 @@ const DataViewer = ({ documentId, data }) => {
 
     setSaving(true);
     try {
-      await documentAPI.updateExtractedData(documentId, editedData);
-      
+      // Send only the edited fields; the server applies them to its copy
+      const operations = Object.entries(editedData).map(([field, value]) => ({
+        op: 'add',
+        path: `/${field.replace(/~/g, '~0').replace(/\//g, '~1')}`,
+        value,
+      }));
+      const response = await documentAPI.patchExtractedData(documentId, operations, etag);
+      onSaved?.(response.headers.etag || null);
+
       // Update Redux store
       Object.entries(editedData).forEach(([field, value]) => {
         dispatch(updateExtractedField({ field, value }));
@@ -48,7 +58,14 @@ const DataViewer = ({ documentId, data }) => {
       setSaveSuccess(true);
       setTimeout(() => setSaveSuccess(false), 3000);
     } catch (error) {
-      alert('Failed to save changes');
+      if (error.response?.status === 412) {
+        // Saved elsewhere since it was loaded: show the current data instead of overwriting it
+        setEditedData({});
+        setConflict(true);
+        await onReload?.();
+      } else {
+        alert('Failed to save changes');
+      }
     } finally {
       setSaving(false);
     }
@@ -113,6 +130,13 @@ const DataViewer = ({ documentId, data }) => {
         </ButtonGroup>
       </CardHeader>
       <CardBody className="data-viewer-body">
+        {conflict && (
+          <Alert color="warning" toggle={() => setConflict(false)}>
+            <FiAlertCircle className="me-2" />
+            This data was changed elsewhere since you opened it. The latest version has been
+            loaded; please make your edits again.
+          </Alert>
+        )}
         {!data ? (
           <div className="text-center text-muted py-5">
             <Spinner color="primary" className="mb-3" />
@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { Card, CardBody, CardHeader, Button, ButtonGroup } from 'reactstrap';
-import { FiZoomIn, FiZoomOut, FiRotateCw } from 'react-icons/fi';
+import { FiZoomIn, FiZoomOut, FiRotateCw, FiExternalLink } from 'react-icons/fi';
+import PreviewImage from './PreviewImage';
 import './DocumentViewer.css';
 
 const DocumentViewer = ({ document }) => {
@@ -26,6 +27,8 @@ const DocumentViewer = ({ document }) => {
 
   const isImage = document?.file_type === 'image';
   const isPDF = document?.file_type === 'pdf';
+  // Low-resolution page renders load far faster than the original file
+  const previewPages = document?.preview_pages || 0;
 
   return (
     <Card className="document-viewer-card h-100">
@@ -44,6 +47,11 @@ const DocumentViewer = ({ document }) => {
           <Button color="light" onClick={handleRotate} title="Rotate">
             <FiRotateCw />
           </Button>
+          {document && (
+            <Button color="light" href={getDocumentUrl()} target="_blank" title="Open Original">
+              <FiExternalLink />
+            </Button>
+          )}
         </ButtonGroup>
       </CardHeader>
       <CardBody className="document-viewer-body">
@@ -53,7 +61,26 @@ const DocumentViewer = ({ document }) => {
           </div>
         ) : (
           <div className="document-container">
-            {isImage && (
+            {previewPages > 0 && (
+              <div className="preview-pages">
+                {Array.from({ length: previewPages }, (_, index) => (
+                  <PreviewImage
+                    key={index}
+                    documentId={document.id}
+                    name={`page-${index + 1}`}
+                    alt={`${document.filename} page ${index + 1}`}
+                    className="preview-page"
+                    lazy={index > 0}
+                    placeholderClassName="preview-page-placeholder"
+                    style={{
+                      transform: `scale(${zoom / 100}) rotate(${rotation}deg)`,
+                      transition: 'transform 0.3s ease',
+                    }}
+                  />
+                ))}
+              </div>
+            )}
+            {previewPages === 0 && isImage && (
               <img
                 src={getDocumentUrl()}
                 alt={document.filename}
@@ -64,7 +91,7 @@ const DocumentViewer = ({ document }) => {
                 }}
               />
             )}
-            {isPDF && (
+            {previewPages === 0 && isPDF && (
               <div className="pdf-viewer">
                 <iframe
                   src={`${getDocumentUrl()}#toolbar=1&navpanes=1&scrollbar=1`}
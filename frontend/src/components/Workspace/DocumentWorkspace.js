@@ -1,7 +1,7 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useDispatch, useSelector } from 'react-redux';
-import { Container, Row, Col, Spinner, Alert, Button } from 'reactstrap';
+import { Container, Row, Col, Spinner, Alert, Button, Progress } from 'reactstrap';
 import { FiArrowLeft } from 'react-icons/fi';
 import Navbar from '../Layout/Navbar';
 import DocumentViewer from './DocumentViewer';
@@ -12,6 +12,19 @@ import { selectDocument, setExtractedData } from '../../redux/slices/documentSli
 import { setCurrentConversation } from '../../redux/slices/chatSlice';
 import './DocumentWorkspace.css';
 
+// How often a document that is still being processed is checked again
+const PROGRESS_POLL_INTERVAL_MS = 2000;
+
+const STAGE_LABELS = {
+  previews: 'Rendering previews',
+  text: 'Reading pages',
+  structuring: 'Extracting fields',
+  indexing: 'Indexing for chat',
+};
+
+const isInProgress = (document) =>
+  document && (document.status === 'pending' || document.status === 'processing');
+
 const DocumentWorkspace = () => {
   const { documentId } = useParams();
   const navigate = useNavigate();
@@ -19,11 +32,44 @@ const DocumentWorkspace = () => {
   const { currentDocument, extractedData } = useSelector((state) => state.document);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  // Version of the extracted data being shown, sent back with edits
+  const [dataEtag, setDataEtag] = useState(null);
+  const pollTimer = useRef(null);
 
   useEffect(() => {
     loadDocument();
+    return () => clearTimeout(pollTimer.current);
   }, [documentId]);
 
+  const loadExtractedData = async () => {
+    try {
+      const dataResponse = await documentAPI.getExtractedData(documentId);
+      dispatch(setExtractedData(dataResponse.data));
+      setDataEtag(dataResponse.headers.etag || null);
+    } catch (err) {
+      // Extracted data might not be available yet
+      console.log('Extracted data not available yet');
+    }
+  };
+
+  // While the document is processed, follow its progress and pick up the
+  // first-page fields, which are saved before the full extraction finishes
+  const pollProgress = () => {
+    clearTimeout(pollTimer.current);
+    pollTimer.current = setTimeout(async () => {
+      try {
+        const docResponse = await documentAPI.getById(documentId);
+        dispatch(selectDocument(docResponse.data));
+        await loadExtractedData();
+        if (isInProgress(docResponse.data)) {
+          pollProgress();
+        }
+      } catch (err) {
+        console.log('Failed to refresh document progress');
+      }
+    }, PROGRESS_POLL_INTERVAL_MS);
+  };
+
   const loadDocument = async () => {
     try {
       setLoading(true);
@@ -34,12 +80,9 @@ const DocumentWorkspace = () => {
       dispatch(selectDocument(docResponse.data));
 
       // Fetch extracted data
-      try {
-        const dataResponse = await documentAPI.getExtractedData(documentId);
-        dispatch(setExtractedData(dataResponse.data));
-      } catch (err) {
-        // Extracted data might not be available yet
-        console.log('Extracted data not available yet');
+      await loadExtractedData();
+      if (isInProgress(docResponse.data)) {
+        pollProgress();
       }
 
       // Set current conversation for chat
@@ -89,6 +132,19 @@ const DocumentWorkspace = () => {
           Back to Dashboard
         </Button>
         <h5 className="mb-0 ms-3">{currentDocument?.filename}</h5>
+        {isInProgress(currentDocument) && (
+          <div className="processing-progress ms-auto">
+            <small className="text-muted">
+              {STAGE_LABELS[currentDocument.processing_stage] || 'Waiting to be processed'}
+            </small>
+            <Progress
+              animated
+              color="info"
+              value={currentDocument.processing_progress || 0}
+              className="mt-1"
+            />
+          </div>
+        )}
       </div>
       <Container fluid className="workspace-container">
         <Row className="g-3 h-100">
@@ -99,7 +155,13 @@ const DocumentWorkspace = () => {
 
           {/* Panel 2: Extracted Data Viewer (Middle - 30%) */}
           <Col lg={3} md={12} className="workspace-panel">
-            <DataViewer documentId={documentId} data={extractedData} />
+            <DataViewer
+              documentId={documentId}
+              data={extractedData}
+              etag={dataEtag}
+              onSaved={setDataEtag}
+              onReload={loadExtractedData}
+            />
           </Col>
 
           {/* Panel 3: Chat Interface (Right - 35%) */}
@@ -0,0 +1,47 @@
+import React, { useEffect, useRef, useState } from 'react';
+import { documentAPI } from '../../services/api';
+
+// Loads a document preview through the API (it needs the auth header) and
+// shows `fallback` until it arrives or if the document has none. With
+// `lazy`, nothing is fetched until the placeholder scrolls into view.
+const PreviewImage = ({ documentId, name, alt, fallback = null, lazy = false, placeholderClassName, ...props }) => {
+  const [src, setSrc] = useState(null);
+  const [visible, setVisible] = useState(!lazy || !('IntersectionObserver' in window));
+  const placeholder = useRef(null);
+
+  useEffect(() => {
+    if (visible || !placeholder.current) return undefined;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries.some((entry) => entry.isIntersecting)) {
+        setVisible(true);
+        observer.disconnect();
+      }
+    }, { rootMargin: '200px' });
+    observer.observe(placeholder.current);
+    return () => observer.disconnect();
+  }, [visible]);
+
+  useEffect(() => {
+    if (!visible) return undefined;
+    let url = null;
+    let cancelled = false;
+    setSrc(null);
+    documentAPI.getPreview(documentId, name)
+      .then((response) => {
+        if (cancelled) return;
+        url = URL.createObjectURL(response.data);
+        setSrc(url);
+      })
+      .catch(() => {});
+    return () => {
+      cancelled = true;
+      if (url) URL.revokeObjectURL(url);
+    };
+  }, [documentId, name, visible]);
+
+  if (src) return <img src={src} alt={alt} {...props} />;
+  if (lazy) return <div ref={placeholder} className={placeholderClassName}>{fallback}</div>;
+  return fallback;
+};
+
+export default PreviewImage;
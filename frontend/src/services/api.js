@@ -46,6 +46,81 @@ export const authAPI = {
   updateProfile: (data) => api.put('/auth/profile', data),
 };
 
+// Files above this size are sent with the resumable upload API
+export const RESUMABLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024;
+const CHUNK_CONCURRENCY = 3;
+const CHUNK_ATTEMPTS = 4;
+
+const chunkChecksum = async (blob) => {
+  // crypto.subtle is only available on https and localhost
+  if (!window.crypto?.subtle) return undefined;
+  const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+  return `sha256 ${btoa(String.fromCharCode(...new Uint8Array(digest)))}`;
+};
+
+// Chunked upload that resumes where it stopped if the same file is uploaded again
+const uploadResumable = async (file, onProgress) => {
+  const key = `upload:${file.name}:${file.size}:${file.lastModified}`;
+  let session = null;
+  const savedId = localStorage.getItem(key);
+  if (savedId) {
+    try {
+      session = (await api.get(`/documents/uploads/${savedId}`)).data;
+    } catch (error) {
+      localStorage.removeItem(key);
+    }
+  }
+  if (!session) {
+    session = (await api.post('/documents/uploads', {
+      filename: file.name,
+      content_type: file.type,
+      size: file.size,
+    })).data;
+    localStorage.setItem(key, session.id);
+  }
+
+  const received = new Set(session.received_chunks);
+  const pending = [];
+  for (let index = 0; index < session.chunk_count; index += 1) {
+    if (!received.has(index)) pending.push(index);
+  }
+  let done = received.size;
+
+  const sendChunk = async (index) => {
+    const offset = index * session.chunk_size;
+    const blob = file.slice(offset, offset + session.chunk_size);
+    const checksum = await chunkChecksum(blob);
+    for (let attempt = 1; ; attempt += 1) {
+      try {
+        await api.patch(`/documents/uploads/${session.id}`, blob, {
+          headers: {
+            'Content-Type': 'application/offset+octet-stream',
+            'Upload-Offset': String(offset),
+            ...(checksum ? { 'Upload-Checksum': checksum } : {}),
+          },
+        });
+        break;
+      } catch (error) {
+        // Retry network errors, server errors and corrupted chunks (460)
+        const status = error.response?.status;
+        if (attempt >= CHUNK_ATTEMPTS || (status && status < 500 && status !== 460)) throw error;
+        await new Promise((resolve) => setTimeout(resolve, 1000 * 2 ** (attempt - 1)));
+      }
+    }
+    done += 1;
+    if (onProgress) onProgress(done / session.chunk_count);
+  };
+
+  const worker = async () => {
+    while (pending.length) await sendChunk(pending.shift());
+  };
+  await Promise.all(Array.from({ length: Math.min(CHUNK_CONCURRENCY, pending.length) }, worker));
+
+  const response = await api.post(`/documents/uploads/${session.id}/finalize`);
+  localStorage.removeItem(key);
+  return response;
+};
+
 // Document APIs
 export const documentAPI = {
   getAll: (params) => api.get('/documents', { params }),
@@ -57,12 +132,30 @@ export const documentAPI = {
       },
     });
   },
+  uploadResumable,
   delete: (id) => api.delete(`/documents/${id}`),
+  bulkDelete: (ids) => api.post('/documents/bulk-delete', { document_ids: ids }),
   updateExtractedData: (id, data) => api.put(`/documents/${id}/extracted-data`, data),
+  // operations: RFC 6902 JSON Patch; etag: ETag from getExtractedData for optimistic concurrency
+  patchExtractedData: (id, operations, etag) => api.patch(`/documents/${id}/extracted-data`, operations, {
+    headers: {
+      'Content-Type': 'application/json-patch+json',
+      ...(etag ? { 'If-Match': etag } : {}),
+    },
+  }),
+  getExtractedDataEdits: (id) => api.get(`/documents/${id}/extracted-data/edits`),
   getExtractedData: (id) => api.get(`/documents/${id}/extracted-data`),
+  // name: 'thumbnail' or 'page-1', 'page-2', ... (WebP, cached by the browser)
+  getPreview: (id, name) => api.get(`/documents/${id}/previews/${name}`, {
+    responseType: 'blob',
+  }),
   exportData: (id, format) => api.get(`/documents/${id}/export/${format}`, {
     responseType: 'blob',
   }),
+  exportBulk: (format, params) => api.get(`/documents/export/${format}`, {
+    params,
+    responseType: 'blob',
+  }),
 };
 
 // Chat APIs
@@ -73,6 +166,10 @@ export const chatAPI = {
     message,
   }),
   clearHistory: (documentId) => api.delete(`/chat/history/${documentId}`),
+  askAllDocuments: (message, topK) => api.post('/chat/ask', {
+    message,
+    top_k: topK,
+  }),
 };
 
 export default api;